@@ -1,22 +1,227 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 import numpy as np
 import soundfile as sf
-from typing import Dict, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
 import warnings
 warnings.filterwarnings('ignore')
 
 try:
-    from .gain_predictor import GainPredictor, CNNGainPredictor
-    HAS_PREDICTOR = True
+    from .gain_predictor import GainPredictor, CNNGainPredictor, HAS_LIBROSA as HAS_PREDICTOR
 except ImportError:
     HAS_PREDICTOR = False
 
+from .parallel import EXECUTOR_KINDS, map_stems
+from .resampling import Resampler, SoxrResampler, get_resampler
+from .stem_cache import StemCache, StemCacheWriter
+from .instrumentation import add_span, log, span
+from .loudness import DEFAULT_TRUE_PEAK_DB, LoudnessMeter, TruePeakLimiter, integrated_loudness
+from .buses import BusSpec, mix_block, mix_matrix, mixing_matrix, stack_stems
+from .waveform import PeakBuilder
+
+NORMALIZE_MODES = ('memmap', 'float_wav')
+
+# output format -> (libsndfile container, subtype, file extension)
+OUTPUT_FORMATS = {
+    'wav16': ('WAV', 'PCM_16', '.wav'),
+    'wav24': ('WAV', 'PCM_24', '.wav'),
+    'flac': ('FLAC', 'PCM_16', '.flac'),
+    'flac24': ('FLAC', 'PCM_24', '.flac'),
+}
+
+PRECISIONS = ('float32', 'float64')
+
+# Frames per chunk when accumulating stems into the output buffer
+MIX_CHUNK_FRAMES = 65536
+
+# Share of streaming progress spent in the mixing pass when a rescale pass follows
+STREAM_MIX_PROGRESS = 0.8
+
+# Incremental remixes between full rebuilds of a session's accumulator, bounding float drift
+REMIX_REBUILD_EVERY = 32
+
+
+class _StemBlockReader:
+    def __init__(self, file_path: str, target_sr: int, block_size: int, resampler: Resampler,
+                 dtype: np.dtype = np.dtype(np.float64)):
+        self._file = sf.SoundFile(file_path)
+        self._dtype = np.dtype(dtype)
+        self._blocks = self._file.blocks(blocksize=block_size, dtype=self._dtype.name, always_2d=True)
+        self._mono = self._file.channels == 1
+        self.channels = 2 if self._mono else self._file.channels
+        self.sr = self._file.samplerate
+        self.frames = int(self._file.frames * target_sr / self.sr)
+        self.cache_writer: Optional[StemCacheWriter] = None
+        
+        self._stream = None
+        if self.sr != target_sr:
+            self._stream = resampler.open_stream(self.sr, target_sr, self._file.channels, self._dtype)
+        
+        self._pending: List[np.ndarray] = []
+        self._pending_frames = 0
+        self._exhausted = False
+        self.decode_seconds = 0.0
+        self.resample_seconds = 0.0
+        self.decoded_bytes = 0
+    
+    def _pull(self) -> bool:
+        start = time.perf_counter()
+        try:
+            block = next(self._blocks)
+            last = False
+        except StopIteration:
+            block = np.zeros((0, self._file.channels), dtype=self._dtype)
+            last = True
+        self.decode_seconds += time.perf_counter() - start
+        self.decoded_bytes += block.nbytes
+        
+        if self._stream is not None:
+            start = time.perf_counter()
+            block = self._stream.resample_chunk(block, last=last)
+            self.resample_seconds += time.perf_counter() - start
+        
+        if self._mono:
+            block = np.column_stack([block[:, 0], block[:, 0]])
+        
+        if len(block):
+            self._pending.append(block)
+            self._pending_frames += len(block)
+            if self.cache_writer is not None:
+                self.cache_writer.write(block)
+        
+        if last and self.cache_writer is not None:
+            self.cache_writer.commit()
+            self.cache_writer = None
+        
+        return not last
+    
+    def read_into(self, out: np.ndarray) -> int:
+        wanted = len(out)
+        while self._pending_frames < wanted and not self._exhausted:
+            self._exhausted = not self._pull()
+        
+        filled = 0
+        while filled < wanted and self._pending:
+            block = self._pending[0]
+            n = min(len(block), wanted - filled)
+            out[filled:filled + n] = block[:n]
+            
+            if n == len(block):
+                self._pending.pop(0)
+            else:
+                self._pending[0] = block[n:]
+            self._pending_frames -= n
+            filled += n
+        
+        return filled
+    
+    def close(self):
+        if self.cache_writer is not None:
+            self.cache_writer.abort()
+            self.cache_writer = None
+        self._file.close()
+
+
+class _ArrayBlockReader:
+    def __init__(self, audio: np.ndarray):
+        self._audio = audio
+        self._position = 0
+        self.channels = audio.shape[1]
+        self.frames = len(audio)
+    
+    def read_into(self, out: np.ndarray) -> int:
+        n = min(len(out), len(self._audio) - self._position)
+        out[:n] = self._audio[self._position:self._position + n]
+        self._position += n
+        return n
+    
+    def close(self):
+        pass
+    
+    decode_seconds = 0.0
+    resample_seconds = 0.0
+    decoded_bytes = 0
+
+
+def output_extension(output_format: str) -> str:
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {tuple(OUTPUT_FORMATS)}")
+    return OUTPUT_FORMATS[output_format][2]
+
+
+def _stems_signature(stems: Dict[str, str]) -> Dict[str, Tuple[str, int, int]]:
+    # Path plus size and mtime, so a stem re-uploaded under the same name forces a rebuild
+    signature = {}
+    for name, file_path in stems.items():
+        stat = os.stat(file_path)
+        signature[name] = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    return signature
+
+
+class RemixSession:
+    """
+    State kept between remixes of the same stems: the un-normalized sum of the
+    last mix and each stem's gain/pan coefficients. StemMixer.remix_incremental
+    subtracts and re-adds only the stems whose coefficients changed.
+    """
+    
+    def __init__(self):
+        self.signature: Dict[str, Tuple[str, int, int]] = {}
+        self.stem_data: Dict[str, np.ndarray] = {}
+        self.accumulator: Optional[np.ndarray] = None
+        self.coefficients: Dict[str, Optional[np.ndarray]] = {}
+        self.updates = 0
+        # Held by callers for the duration of a remix; the accumulator is updated in place
+        self.lock = threading.Lock()
+    
+    @property
+    def nbytes(self) -> int:
+        return self.accumulator.nbytes if self.accumulator is not None else 0
+
 
 class StemMixer:
-    def __init__(self, sample_rate: int = 44100):
+    def __init__(
+        self,
+        sample_rate: int = 44100,
+        stem_cache: Optional[StemCache] = None,
+        executor: str = 'serial',
+        max_workers: Optional[int] = None,
+        progress_callback: Optional[Callable[[float], None]] = None,
+        resampler: Union[str, Resampler] = 'polyphase',
+        resample_quality: str = 'high',
+        precision: str = 'float64',
+        cnn_model_path: Optional[str] = None
+    ):
+        if executor not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor '{executor}', expected one of {EXECUTOR_KINDS}")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}")
         self.sample_rate = sample_rate
+        self.stem_cache = stem_cache
+        self.executor = executor
+        self.max_workers = max_workers
+        self.progress_callback = progress_callback
+        self.resampler = get_resampler(resampler, resample_quality)
+        # Block streaming needs a stateful resampler; fall back to soxr at the same quality
+        self.stream_resampler = self.resampler if self.resampler.supports_streaming else SoxrResampler(self.resampler.quality)
+        self.dtype = np.dtype(precision)
+        self.cnn_model_path = cnn_model_path
+        self.last_timings: Dict[str, float] = {}
+        # Measured/applied loudness of the last mix when a target LUFS was requested
+        self.last_loudness: Optional[Dict[str, float]] = None
+    
+    def __getstate__(self):
+        # Process-pool fan-out pickles bound methods, and with them the mixer. The
+        # progress callback is typically a closure over a job and stays in the parent.
+        state = self.__dict__.copy()
+        state['progress_callback'] = None
+        return state
         
     def load_audio(self, file_path: str) -> Tuple[np.ndarray, int]:
-        data, sr = sf.read(file_path)
+        data, sr = sf.read(file_path, dtype=self.dtype.name)
         
         if len(data.shape) == 1:
             data = np.column_stack([data, data])
@@ -24,47 +229,90 @@ class StemMixer:
         return data, sr
     
     def resample_audio(self, audio: np.ndarray, sr_original: int, sr_target: int) -> np.ndarray:
-        import librosa
-        
         if sr_original == sr_target:
             return audio
         
-        resampled = np.zeros((int(len(audio) * sr_target / sr_original), audio.shape[1]))
-        for ch in range(audio.shape[1]):
-            resampled[:, ch] = librosa.resample(
-                audio[:, ch], 
-                orig_sr=sr_original, 
-                target_sr=sr_target
-            )
-        
-        return resampled
+        return self.resampler.resample(audio, sr_original, sr_target).astype(self.dtype, copy=False)
     
-    def normalize_length(self, audio: np.ndarray, target_length: int) -> np.ndarray:
-        current_length = len(audio)
-        
-        if current_length > target_length:
-            return audio[:target_length]
-        elif current_length < target_length:
-            padding = np.zeros((target_length - current_length, audio.shape[1]))
-            return np.vstack([audio, padding])
-        else:
-            return audio
+    def _cache_variant(self, file_path: str, resampler: Resampler) -> str:
+        # Stems already at the target rate are cached independently of the resampler
+        if sf.info(file_path).samplerate == self.sample_rate:
+            return ''
+        return resampler.tag
     
-    def apply_gain(self, audio: np.ndarray, gain_db: float) -> np.ndarray:
-        gain_linear = 10 ** (gain_db / 20.0)
-        return audio * gain_linear
+    def _load_stem(self, file_path: str) -> Tuple[np.ndarray, Dict[str, float], bool]:
+        timings = {}
+        
+        if self.stem_cache is not None:
+            with span('cache', file=os.path.basename(file_path)) as info:
+                variant = self._cache_variant(file_path, self.resampler)
+                audio = self.stem_cache.lookup(file_path, self.sample_rate, variant)
+                info['hit'] = audio is not None
+                info['bytes'] = audio.nbytes if audio is not None else 0
+            timings['cache'] = info['seconds']
+            if audio is not None:
+                return audio, timings, True
+        
+        with span('decode', file=os.path.basename(file_path)) as info:
+            audio, sr = self.load_audio(file_path)
+            info['bytes'] = audio.nbytes
+        timings['decode'] = info['seconds']
+        
+        with span('resample', sr_from=sr, sr_to=self.sample_rate) as info:
+            audio = self.resample_audio(audio, sr, self.sample_rate)
+            info['bytes'] = audio.nbytes
+        timings['resample'] = info['seconds']
+        
+        if self.stem_cache is not None:
+            audio = self.stem_cache.put(file_path, self.sample_rate, audio, variant)
+        
+        return audio, timings, False
     
-    def apply_pan(self, audio: np.ndarray, pan: float) -> np.ndarray:
-        if audio.shape[1] != 2:
-            return audio
+    def _load_stems(self, stems: Dict[str, str]) -> Tuple[Dict[str, np.ndarray], int]:
+        start = time.perf_counter()
+        results = map_stems(
+            self._load_stem,
+            {name: (file_path,) for name, file_path in stems.items()},
+            self.executor,
+            self.max_workers
+        )
+        if self.executor != 'serial':
+            self._add_timing('load_wall', time.perf_counter() - start)
         
-        left_gain = np.cos((pan + 1) * np.pi / 4)
-        right_gain = np.sin((pan + 1) * np.pi / 4)
+        stem_data = {}
+        max_length = 0
         
-        audio[:, 0] *= left_gain
-        audio[:, 1] *= right_gain
+        for name, (audio, timings, cached) in results.items():
+            if cached:
+                log(f"Loading {name} from stem cache...")
+            else:
+                log(f"Loading {name} from {stems[name]}...")
+            for stage, seconds in timings.items():
+                self._add_timing(stage, seconds)
+            
+            stem_data[name] = audio
+            max_length = max(max_length, len(audio))
         
-        return audio
+        return stem_data, max_length
+    
+    def _add_timing(self, stage: str, seconds: float):
+        self.last_timings[stage] = self.last_timings.get(stage, 0.0) + seconds
+    
+    @contextmanager
+    def _stage(self, stage: str, bytes: int = 0, **extra) -> Iterator[Dict[str, Any]]:
+        with span(stage, bytes, **extra) as info:
+            yield info
+        self._add_timing(stage, info['seconds'])
+    
+    def _report_progress(self, fraction: float):
+        # The callback may raise to abort the mix (e.g. a cancelled job)
+        if self.progress_callback is not None:
+            self.progress_callback(min(max(fraction, 0.0), 1.0))
+    
+    def _print_timings(self):
+        log("\n=== TIMING BREAKDOWN ===")
+        for stage, seconds in self.last_timings.items():
+            log(f"  {stage}: {seconds * 1000:.1f} ms")
     
     def mix_stems(
         self,
@@ -73,82 +321,300 @@ class StemMixer:
         pans: Optional[Dict[str, float]] = None,
         normalize_output: bool = True,
         auto_gain: bool = False,
-        use_cnn: bool = False
+        use_cnn: bool = False,
+        target_lufs: Optional[float] = None,
+        true_peak_db: float = DEFAULT_TRUE_PEAK_DB
     ) -> Tuple[np.ndarray, Dict[str, float]]:
+        # target_lufs replaces peak normalization with loudness normalization + true-peak limiting
         gains = gains or {}
         pans = pans or {}
+        self.last_timings = {}
+        self.last_loudness = None
+        self._report_progress(0.0)
         
         if auto_gain and HAS_PREDICTOR:
-            print("\n=== AUTOMATIC GAIN PREDICTION ENABLED ===")
-            return self._mix_with_auto_gain(
-                stems, pans, normalize_output, use_cnn, gains
+            log("\n=== AUTOMATIC GAIN PREDICTION ENABLED ===")
+            result = self._mix_with_auto_gain(
+                stems, pans, normalize_output, use_cnn, gains, target_lufs, true_peak_db
+            )
+        else:
+            stem_data, max_length = self._load_stems(stems)
+            self._report_progress(0.5)
+            result = self._mix_loaded(
+                stem_data, max_length, gains, pans, normalize_output,
+                target_lufs=target_lufs, true_peak_db=true_peak_db
             )
         
-        stem_data = {}
-        max_length = 0
+        self._report_progress(1.0)
+        self._print_timings()
+        return result
+    
+    def _stem_coefficients(self, gain: float, pan: float, n_channels: int) -> Optional[np.ndarray]:
+        # Combined per-channel gain * pan law; None means the stem passes through unscaled
+        if gain == 0.0 and (pan == 0.0 or n_channels != 2):
+            return None
         
-        for name, file_path in stems.items():
-            print(f"Loading {name} from {file_path}...")
-            audio, sr = self.load_audio(file_path)
-            audio = self.resample_audio(audio, sr, self.sample_rate)
-            stem_data[name] = audio
-            max_length = max(max_length, len(audio))
+        coeff = np.ones(n_channels)
+        if gain != 0.0:
+            coeff *= 10 ** (gain / 20.0)
+            log(f"  Applied gain: {gain} dB")
+        
+        if pan != 0.0 and n_channels == 2:
+            coeff[0] *= np.cos((pan + 1) * np.pi / 4)
+            coeff[1] *= np.sin((pan + 1) * np.pi / 4)
+            log(f"  Applied pan: {pan}")
+        
+        return coeff.astype(self.dtype)
+    
+    def _mix_loaded(
+        self,
+        stem_data: Dict[str, np.ndarray],
+        max_length: int,
+        gains: Dict[str, float],
+        pans: Dict[str, float],
+        normalize_output: bool,
+        coefficients: Optional[Dict[str, Optional[np.ndarray]]] = None,
+        target_lufs: Optional[float] = None,
+        true_peak_db: float = DEFAULT_TRUE_PEAK_DB
+    ) -> Tuple[np.ndarray, Dict[str, float]]:
+        # coefficients, if given, receives each stem's gain/pan coefficients
+        if not stem_data:
+            return None, {}
         
-        mixed_audio = None
         final_gains = {}
         
-        for name, audio in stem_data.items():
-            print(f"Processing {name}...")
-            
-            audio = self.normalize_length(audio, max_length)
-            
-            gain = gains.get(name, 0.0)
-            final_gains[name] = gain
-            if gain != 0.0:
-                audio = self.apply_gain(audio, gain)
-                print(f"  Applied gain: {gain} dB")
-            
-            pan = pans.get(name, 0.0)
-            if pan != 0.0:
-                audio = self.apply_pan(audio, pan)
-                print(f"  Applied pan: {pan} (Shape: {audio.shape})")
+        channels = {audio.shape[1] for audio in stem_data.values()}
+        if len(channels) > 1:
+            raise ValueError(f"Stems have mismatched channel counts: {sorted(channels)}")
+        n_channels = channels.pop()
+        
+        with self._stage('mix', stems=len(stem_data)) as info:
+            # One output buffer; every stem is scaled chunk by chunk into a small
+            # scratch buffer and accumulated in place.
+            mixed_audio = np.zeros((max_length, n_channels), dtype=self.dtype)
+            scratch = np.empty((min(MIX_CHUNK_FRAMES, max_length), n_channels), dtype=self.dtype)
             
-            if mixed_audio is None:
-                mixed_audio = audio
-            else:
-                mixed_audio = mixed_audio + audio
+            for index, (name, audio) in enumerate(stem_data.items()):
+                self._report_progress(0.7 + 0.2 * index / len(stem_data))
+                log(f"Processing {name}...")
+                
+                gain = gains.get(name, 0.0)
+                final_gains[name] = gain
+                coeff = self._stem_coefficients(gain, pans.get(name, 0.0), n_channels)
+                if coefficients is not None:
+                    coefficients[name] = coeff
+                
+                self._accumulate(mixed_audio, audio, coeff, scratch)
+            info['bytes'] = mixed_audio.nbytes
         
-        if normalize_output and mixed_audio is not None:
-            max_val = np.abs(mixed_audio).max()
-            if max_val > 1.0:
-                print(f"Normalizing output (max value: {max_val:.3f})")
-                mixed_audio = mixed_audio / max_val
+        if target_lufs is not None:
+            mixed_audio = self._master(mixed_audio, target_lufs, true_peak_db)
+        elif normalize_output:
+            with self._stage('normalize', bytes=mixed_audio.nbytes):
+                max_val = max(float(mixed_audio.max()), -float(mixed_audio.min()))
+                if max_val > 1.0:
+                    log(f"Normalizing output (max value: {max_val:.3f})")
+                    mixed_audio /= max_val
         
         return mixed_audio, final_gains
     
-    def _create_smart_mix_stems(self, stems: Dict[str, str], use_cnn: bool) -> Tuple[np.ndarray, Dict[str, float]]:
-        stem_data = {}
-        max_length = 0
+    def _accumulate(self, target: np.ndarray, audio: np.ndarray, coeff: Optional[np.ndarray], scratch: np.ndarray):
+        # target += audio * coeff, chunk by chunk through the scratch buffer
+        frames = min(len(audio), len(target))
+        for offset in range(0, frames, MIX_CHUNK_FRAMES):
+            end = min(offset + MIX_CHUNK_FRAMES, frames)
+            if coeff is None:
+                target[offset:end] += audio[offset:end]
+            else:
+                chunk = scratch[:end - offset]
+                np.multiply(audio[offset:end], coeff, out=chunk, casting='same_kind')
+                target[offset:end] += chunk
+    
+    def _master(self, audio: np.ndarray, target_lufs: float, true_peak_db: float) -> np.ndarray:
+        # Gain to the target integrated loudness, then true-peak limit; returns a new array
+        with self._stage('loudness', bytes=audio.nbytes):
+            input_lufs = integrated_loudness(audio, self.sample_rate)
         
-        for name, file_path in stems.items():
-            print(f"Loading {name} from {file_path}...")
-            audio, sr = self.load_audio(file_path)
-            audio = self.resample_audio(audio, sr, self.sample_rate)
-            stem_data[name] = audio
-            max_length = max(max_length, len(audio))
-            
-        if use_cnn:
-            predictor = CNNGainPredictor()
-        else:
-            predictor = GainPredictor()
-        predictor.sr = self.sample_rate
+        limiter = self._limiter(input_lufs, target_lufs, true_peak_db)
+        meter = LoudnessMeter(self.sample_rate, audio.shape[1])
+        with self._stage('limit', bytes=audio.nbytes):
+            output = limiter.process(audio)
+            for offset in range(0, len(output), MIX_CHUNK_FRAMES):
+                meter.update(output[offset:offset + MIX_CHUNK_FRAMES])
         
-        if use_cnn:
-             predicted_gains = predictor.predict_gains_cnn(stem_data)
+        self._record_loudness(input_lufs, target_lufs, limiter, meter)
+        return output
+    
+    def _limiter(self, input_lufs: float, target_lufs: float, true_peak_db: float) -> TruePeakLimiter:
+        # Silence has no measurable loudness and is left as is
+        gain_db = target_lufs - input_lufs if np.isfinite(input_lufs) else 0.0
+        log(f"Loudness: {input_lufs:.1f} LUFS, applying {gain_db:+.1f} dB for {target_lufs:.1f} LUFS "
+            f"(true-peak ceiling {true_peak_db:.1f} dBTP)")
+        return TruePeakLimiter(self.sample_rate, true_peak_db, input_gain=10 ** (gain_db / 20.0))
+    
+    def _record_loudness(self, input_lufs: float, target_lufs: float, limiter: TruePeakLimiter,
+                         meter: LoudnessMeter) -> Dict[str, float]:
+        self.last_loudness = {
+            'input_lufs': input_lufs,
+            'target_lufs': target_lufs,
+            'gain_db': float(20.0 * np.log10(limiter.input_gain)),
+            'true_peak_db': float(20.0 * np.log10(limiter.ceiling)),
+            'limiter_reduction_db': limiter.max_reduction_db,
+            'limited_seconds': limiter.limited_frames / self.sample_rate,
+            'output_lufs': meter.integrated(),
+        }
+        log(f"Limiter: up to {limiter.max_reduction_db:.1f} dB reduction over "
+            f"{self.last_loudness['limited_seconds']:.2f}s, output {self.last_loudness['output_lufs']:.1f} LUFS")
+        return self.last_loudness
+    
+    def remix_incremental(
+        self,
+        session: 'RemixSession',
+        stems: Dict[str, str],
+        gains: Optional[Dict[str, float]] = None,
+        pans: Optional[Dict[str, float]] = None,
+        normalize_output: bool = True,
+        target_lufs: Optional[float] = None,
+        true_peak_db: float = DEFAULT_TRUE_PEAK_DB
+    ) -> Tuple[np.ndarray, Dict[str, float], Dict[str, Any]]:
+        gains = gains or {}
+        pans = pans or {}
+        self.last_timings = {}
+        self.last_loudness = None
+        self._report_progress(0.0)
+        
+        signature = _stems_signature(stems)
+        rebuild = (
+            session.accumulator is None
+            or session.signature != signature
+            or session.accumulator.dtype != self.dtype
+            or session.updates >= REMIX_REBUILD_EVERY
+        )
+        if rebuild:
+            log("Building remix session accumulator...")
+            session.stem_data, max_length = self._load_stems(stems)
+            self._report_progress(0.5)
+            session.coefficients = {}
+            session.accumulator, final_gains = self._mix_loaded(
+                session.stem_data, max_length, gains, pans, normalize_output=False,
+                coefficients=session.coefficients
+            )
+            session.signature = signature
+            session.updates = 0
+            changed = list(session.stem_data)
         else:
-             predicted_gains = predictor.predict_gains(stem_data)
+            accumulator = session.accumulator
+            n_channels = accumulator.shape[1]
+            final_gains = {}
+            changed = []
+            scratch = np.empty((min(MIX_CHUNK_FRAMES, len(accumulator)), n_channels), dtype=self.dtype)
+            
+            with self._stage('mix', stems=len(session.stem_data), incremental=True) as info:
+                for name, audio in session.stem_data.items():
+                    gain = gains.get(name, 0.0)
+                    final_gains[name] = gain
+                    old = session.coefficients[name]
+                    new = self._stem_coefficients(gain, pans.get(name, 0.0), n_channels)
+                    
+                    # Passthrough (None) is a unit coefficient
+                    delta = (np.ones(n_channels, dtype=self.dtype) if new is None else new) \
+                        - (np.ones(n_channels, dtype=self.dtype) if old is None else old)
+                    if not np.any(delta):
+                        continue
+                    
+                    log(f"Updating {name}...")
+                    self._accumulate(accumulator, audio, delta, scratch)
+                    session.coefficients[name] = new
+                    changed.append(name)
+                info['bytes'] = sum(min(len(session.stem_data[name]), len(accumulator)) for name in changed) \
+                    * n_channels * self.dtype.itemsize
+            session.updates += 1
+            log(f"Remixed {len(changed)} of {len(session.stem_data)} stems incrementally")
+        
+        mixed_audio = session.accumulator
+        if mixed_audio is not None and target_lufs is not None:
+            mixed_audio = self._master(mixed_audio, target_lufs, true_peak_db)
+        elif mixed_audio is not None:
+            # The session keeps the un-normalized sum; normalization works on a copy
+            with self._stage('normalize', bytes=mixed_audio.nbytes):
+                max_val = max(float(mixed_audio.max()), -float(mixed_audio.min())) if normalize_output else 0.0
+                if max_val > 1.0:
+                    log(f"Normalizing output (max value: {max_val:.3f})")
+                    mixed_audio = mixed_audio / max_val
+                else:
+                    mixed_audio = mixed_audio.copy()
+        
+        self._report_progress(1.0)
+        self._print_timings()
+        return mixed_audio, final_gains, {'rebuilt': rebuild, 'changed_stems': changed}
+    
+    def render_preview(
+        self,
+        stems: Dict[str, str],
+        gains: Optional[Dict[str, float]] = None,
+        pans: Optional[Dict[str, float]] = None,
+        start: float = 0.0,
+        duration: float = 10.0,
+        mono: bool = False
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        # Meant for a mixer built at a low sample_rate: stems then come from the
+        # stem cache as low-rate proxies, and only the requested window is read
+        # from their memory maps and mixed.
+        gains = gains or {}
+        pans = pans or {}
+        self.last_timings = {}
+        
+        stem_data, max_length = self._load_stems(stems)
+        first = min(max(int(start * self.sample_rate), 0), max_length)
+        last = min(first + max(int(duration * self.sample_rate), 0), max_length)
+        
+        channels = {audio.shape[1] for audio in stem_data.values()}
+        if len(channels) > 1:
+            raise ValueError(f"Stems have mismatched channel counts: {sorted(channels)}")
+        n_channels = channels.pop() if channels else 2
+        
+        with self._stage('mix', stems=len(stem_data), preview=True) as info:
+            window = np.zeros((last - first, n_channels), dtype=self.dtype)
+            scratch = np.empty((min(MIX_CHUNK_FRAMES, len(window)), n_channels), dtype=self.dtype)
+            for name, audio in stem_data.items():
+                coeff = self._stem_coefficients(gains.get(name, 0.0), pans.get(name, 0.0), n_channels)
+                self._accumulate(window, audio[first:last], coeff, scratch)
+            info['bytes'] = window.nbytes
+        
+        if mono:
+            window = window.mean(axis=1, keepdims=True)
+        
+        # The full-mix peak is unknown here, so the window is only scaled down if it would clip
+        peak = float(np.abs(window).max()) if len(window) else 0.0
+        if peak > 1.0:
+            window /= peak
+        
+        return window, {
+            'start': first / self.sample_rate,
+            'duration': len(window) / self.sample_rate,
+            'total_duration': max_length / self.sample_rate,
+            'sample_rate': self.sample_rate,
+            'peak': peak,
+        }
+    
+    def _create_smart_mix_stems(self, stems: Dict[str, str], use_cnn: bool) -> Tuple[Dict[str, np.ndarray], int, Dict[str, float]]:
+        stem_data, max_length = self._load_stems(stems)
+        self._report_progress(0.4)
+        
+        with self._stage('predict', stems=len(stem_data), cnn=use_cnn):
+            if use_cnn:
+                predictor = CNNGainPredictor(model_path=self.cnn_model_path, executor=self.executor,
+                                             max_workers=self.max_workers)
+            else:
+                predictor = GainPredictor(executor=self.executor, max_workers=self.max_workers)
+            predictor.sr = self.sample_rate
+            
+            if use_cnn:
+                 predicted_gains = predictor.predict_gains_cnn(stem_data)
+            else:
+                 predicted_gains = predictor.predict_gains(stem_data)
              
-        return None, predicted_gains
+        return stem_data, max_length, predicted_gains
 
 
     def _mix_with_auto_gain(
@@ -157,25 +623,529 @@ class StemMixer:
         pans: Dict[str, float],
         normalize_output: bool,
         use_cnn: bool,
-        manual_gains: Dict[str, float]
+        manual_gains: Dict[str, float],
+        target_lufs: Optional[float] = None,
+        true_peak_db: float = DEFAULT_TRUE_PEAK_DB
     ) -> Tuple[np.ndarray, Dict[str, float]]:
         
-        _, predicted_gains = self._create_smart_mix_stems(stems, use_cnn)
+        stem_data, max_length, predicted_gains = self._create_smart_mix_stems(stems, use_cnn)
+        self._report_progress(0.7)
         
-        print("\n=== PREDICTED GAIN SUMMARY ===")
+        log("\n=== PREDICTED GAIN SUMMARY ===")
         for name, gain in predicted_gains.items():
-            print(f"  {name}: {gain:.2f} dB")
-            
-        return self.mix_stems(
-            stems=stems,
-            gains=predicted_gains,
-            pans=pans,
-            normalize_output=normalize_output,
-            auto_gain=False, 
-            use_cnn=False
+            log(f"  {name}: {gain:.2f} dB")
+            
+        return self._mix_loaded(
+            stem_data, max_length, predicted_gains, pans, normalize_output,
+            target_lufs=target_lufs, true_peak_db=true_peak_db
         )
     
-    def save_audio(self, audio: np.ndarray, output_path: str):
-        print(f"Saving audio with shape: {audio.shape}")
-        sf.write(output_path, audio, self.sample_rate)
-        print(f"Saved mixed audio to {output_path}")
+    def _iter_mix_blocks(
+        self,
+        readers: Dict[str, _StemBlockReader],
+        coefficients: Dict[str, Optional[np.ndarray]],
+        block_size: int,
+        n_channels: int,
+        progress_weight: float = 1.0
+    ) -> Iterator[np.ndarray]:
+        accumulator = np.zeros((block_size, n_channels), dtype=self.dtype)
+        scratch = np.zeros((block_size, n_channels), dtype=self.dtype)
+        expected_frames = max([reader.frames for reader in readers.values()] + [1])
+        frames_done = 0
+        
+        while True:
+            accumulator.fill(0.0)
+            block_frames = 0
+            
+            for name, reader in readers.items():
+                n = reader.read_into(scratch)
+                if n == 0:
+                    continue
+                if coefficients[name] is not None:
+                    np.multiply(scratch[:n], coefficients[name], out=scratch[:n])
+                accumulator[:n] += scratch[:n]
+                block_frames = max(block_frames, n)
+            
+            if block_frames == 0:
+                return
+            
+            yield accumulator[:block_frames]
+            frames_done += block_frames
+            self._report_progress(progress_weight * frames_done / expected_frames)
+    
+    def _write_normalized(
+        self,
+        blocks: Iterator[np.ndarray],
+        output_path: str,
+        n_channels: int,
+        block_size: int,
+        normalize_mode: str,
+        output_format: str = 'wav16',
+        peak_builder: Optional[PeakBuilder] = None,
+        target_lufs: Optional[float] = None,
+        true_peak_db: float = DEFAULT_TRUE_PEAK_DB
+    ) -> Tuple[int, float, float]:
+        if normalize_mode not in NORMALIZE_MODES:
+            raise ValueError(f"Unknown normalize mode '{normalize_mode}', expected one of {NORMALIZE_MODES}")
+        
+        suffix = '.f32' if normalize_mode == 'memmap' else '.wav'
+        fd, temp_path = tempfile.mkstemp(suffix=suffix, dir=os.path.dirname(os.path.abspath(output_path)))
+        os.close(fd)
+        
+        peak = 0.0
+        frames = 0
+        # Loudness is measured on the first pass, while the mix is spooled to the intermediate
+        input_meter = LoudnessMeter(self.sample_rate, n_channels) if target_lufs is not None else None
+        meter_seconds = 0.0
+        
+        def measure(block: np.ndarray):
+            nonlocal meter_seconds
+            if input_meter is not None:
+                meter_start = time.perf_counter()
+                input_meter.update(block)
+                meter_seconds += time.perf_counter() - meter_start
+        
+        try:
+            with self._stage('mix') as info:
+                if normalize_mode == 'memmap':
+                    with open(temp_path, 'wb') as tmp:
+                        for block in blocks:
+                            peak = max(peak, float(np.abs(block).max()))
+                            measure(block)
+                            tmp.write(block.astype(np.float32).tobytes())
+                            frames += len(block)
+                    
+                    if frames:
+                        intermediate = np.memmap(temp_path, dtype=np.float32, mode='r', shape=(frames, n_channels))
+                        source = (intermediate[i:i + block_size] for i in range(0, frames, block_size))
+                    else:
+                        source = iter(())
+                else:
+                    with sf.SoundFile(temp_path, 'w', samplerate=self.sample_rate, channels=n_channels,
+                                      format='WAV', subtype='FLOAT') as tmp:
+                        for block in blocks:
+                            peak = max(peak, float(np.abs(block).max()))
+                            measure(block)
+                            tmp.write(block)
+                            frames += len(block)
+                    
+                    source = sf.blocks(temp_path, blocksize=block_size, dtype='float32', always_2d=True)
+                info['bytes'] = frames * n_channels * self.dtype.itemsize
+            
+            scale = 1.0
+            limiter = None
+            if input_meter is not None:
+                self._record_meter_time(meter_seconds, frames * n_channels * self.dtype.itemsize)
+                input_lufs = input_meter.integrated()
+                limiter = self._limiter(input_lufs, target_lufs, true_peak_db)
+            elif peak > 1.0:
+                scale = 1.0 / peak
+                log(f"Normalizing output (max value: {peak:.3f})")
+            
+            output_meter = self._write_pass(
+                source, frames, output_path, n_channels, output_format, peak_builder, scale, limiter,
+                mode=normalize_mode
+            )
+            if limiter is not None:
+                self._record_loudness(input_lufs, target_lufs, limiter, output_meter)
+                scale = limiter.input_gain
+        finally:
+            os.remove(temp_path)
+        
+        return frames, peak, scale
+    
+    def _record_meter_time(self, seconds: float, bytes: int):
+        # Metering runs interleaved with the mixing pass (also included in the 'mix' span)
+        add_span('loudness', seconds, bytes, streamed=True)
+        self._add_timing('loudness', seconds)
+    
+    def _write_pass(
+        self,
+        source: Iterator[np.ndarray],
+        frames: int,
+        output_path: str,
+        n_channels: int,
+        output_format: str,
+        peak_builder: Optional[PeakBuilder],
+        scale: float = 1.0,
+        limiter: Optional[TruePeakLimiter] = None,
+        progress_start: float = STREAM_MIX_PROGRESS,
+        progress_end: float = 1.0,
+        **extra
+    ) -> Optional[LoudnessMeter]:
+        # Second streaming pass: scales (or limits) the spooled mix and encodes it.
+        # Returns the output loudness meter when limiting.
+        output_meter = None
+        if limiter is not None:
+            output_meter = LoudnessMeter(self.sample_rate, n_channels)
+            source = limiter.process_blocks(source)
+        
+        write_seconds = 0.0
+        stage = 'limit' if limiter is not None else 'normalize'
+        with self._stage(stage, frames * n_channels * 4, **extra):
+            with self._open_output(output_path, n_channels, output_format) as out:
+                written = 0
+                for block in source:
+                    if limiter is None:
+                        block = block * scale
+                    else:
+                        output_meter.update(block)
+                    write_start = time.perf_counter()
+                    out.write(block)
+                    write_seconds += time.perf_counter() - write_start
+                    if peak_builder is not None:
+                        peak_builder.update(block)
+                    written += len(block)
+                    self._report_progress(progress_start + (progress_end - progress_start) * written / frames)
+        self._record_write(write_seconds, output_path)
+        return output_meter
+    
+    def _open_readers(self, stems: Dict[str, str], block_size: int, readers: Dict[str, Any]) -> int:
+        # Fills readers in place so the caller can close whatever opened if a later stem fails;
+        # returns the shared channel count
+        for name, file_path in stems.items():
+            cached = None
+            if self.stem_cache is not None:
+                variant = self._cache_variant(file_path, self.stream_resampler)
+                cached = self.stem_cache.lookup(file_path, self.sample_rate, variant)
+            
+            if cached is not None:
+                log(f"Streaming {name} from stem cache...")
+                readers[name] = _ArrayBlockReader(cached)
+            else:
+                log(f"Opening {name} from {file_path}...")
+                reader = _StemBlockReader(
+                    file_path, self.sample_rate, block_size, self.stream_resampler, self.dtype
+                )
+                if self.stem_cache is not None:
+                    reader.cache_writer = self.stem_cache.writer(
+                        file_path, self.sample_rate, reader.channels, variant
+                    )
+                readers[name] = reader
+        
+        channels = {reader.channels for reader in readers.values()}
+        if len(channels) > 1:
+            raise ValueError(f"Stems have mismatched channel counts: {sorted(channels)}")
+        return channels.pop() if channels else 2
+    
+    def _all_coefficients(
+        self,
+        names: Iterable[str],
+        gains: Dict[str, float],
+        pans: Dict[str, float],
+        n_channels: int
+    ) -> Tuple[Dict[str, float], Dict[str, Optional[np.ndarray]]]:
+        final_gains = {}
+        coefficients = {}
+        for name in names:
+            log(f"Processing {name}...")
+            gain = gains.get(name, 0.0)
+            final_gains[name] = gain
+            coefficients[name] = self._stem_coefficients(gain, pans.get(name, 0.0), n_channels)
+        return final_gains, coefficients
+    
+    def _record_stream_io(self, readers: Dict[str, Any]):
+        # Decode and resample run interleaved with mixing, so they are reported
+        # as accumulated totals per stem (also included in the 'mix' span).
+        for name, reader in readers.items():
+            if reader.decoded_bytes:
+                add_span('decode', reader.decode_seconds, reader.decoded_bytes, stem=name, streamed=True)
+                self._add_timing('decode', reader.decode_seconds)
+            if reader.resample_seconds:
+                add_span('resample', reader.resample_seconds, stem=name, streamed=True)
+                self._add_timing('resample', reader.resample_seconds)
+    
+    def mix_stems_streaming(
+        self,
+        stems: Dict[str, str],
+        output_path: str,
+        gains: Optional[Dict[str, float]] = None,
+        pans: Optional[Dict[str, float]] = None,
+        normalize_output: bool = True,
+        normalize_mode: str = 'memmap',
+        block_size: int = 65536,
+        output_format: str = 'wav16',
+        peaks_path: Optional[str] = None,
+        target_lufs: Optional[float] = None,
+        true_peak_db: float = DEFAULT_TRUE_PEAK_DB
+    ) -> Tuple[Dict[str, float], Dict[str, Any]]:
+        output_extension(output_format)
+        gains = gains or {}
+        pans = pans or {}
+        self.last_timings = {}
+        self.last_loudness = None
+        # Loudness targeting needs the measuring pass, so it always goes through the intermediate
+        two_pass = normalize_output or target_lufs is not None
+        self._report_progress(0.0)
+        
+        readers = {}
+        try:
+            n_channels = self._open_readers(stems, block_size, readers)
+            final_gains, coefficients = self._all_coefficients(readers, gains, pans, n_channels)
+            
+            # Waveform peaks are taken from the final blocks as they are written
+            peak_builder = PeakBuilder(self.sample_rate, n_channels) if peaks_path else None
+            
+            log(f"Streaming mix to {output_path} (block size: {block_size})...")
+            blocks = self._iter_mix_blocks(
+                readers, coefficients, block_size, n_channels,
+                STREAM_MIX_PROGRESS if two_pass else 1.0
+            )
+            
+            if two_pass:
+                total_frames, peak, scale = self._write_normalized(
+                    blocks, output_path, n_channels, block_size, normalize_mode, output_format, peak_builder,
+                    target_lufs, true_peak_db
+                )
+            else:
+                total_frames, peak, scale = 0, 0.0, 1.0
+                write_seconds = 0.0
+                with self._stage('mix') as mix_info:
+                    with self._open_output(output_path, n_channels, output_format) as out:
+                        for block in blocks:
+                            peak = max(peak, float(np.abs(block).max()))
+                            write_start = time.perf_counter()
+                            out.write(block)
+                            write_seconds += time.perf_counter() - write_start
+                            if peak_builder is not None:
+                                peak_builder.update(block)
+                            total_frames += len(block)
+                    mix_info['bytes'] = total_frames * n_channels * self.dtype.itemsize
+                self._record_write(write_seconds, output_path)
+            
+            if peak_builder is not None:
+                peak_builder.save(peaks_path)
+        finally:
+            for reader in readers.values():
+                reader.close()
+        
+        self._record_stream_io(readers)
+        info = {
+            'frames': total_frames,
+            'duration': total_frames / self.sample_rate,
+            'block_size': block_size,
+            'peak': peak,
+            'scale': scale,
+            'normalize_mode': normalize_mode if two_pass else None,
+            'output_format': output_format,
+            'loudness': self.last_loudness,
+        }
+        log(f"Saved mixed audio to {output_path} ({info['duration']:.2f}s)")
+        self._report_progress(1.0)
+        self._print_timings()
+        
+        return final_gains, info
+    
+    def mix_buses(
+        self,
+        stems: Dict[str, str],
+        buses: Mapping[str, BusSpec],
+        gains: Optional[Dict[str, float]] = None,
+        pans: Optional[Dict[str, float]] = None,
+        normalize_output: bool = True,
+        target_lufs: Optional[float] = None,
+        true_peak_db: float = DEFAULT_TRUE_PEAK_DB,
+        stack_path: Optional[str] = None
+    ) -> Tuple[Dict[str, np.ndarray], Dict[str, float]]:
+        """
+        Renders several output buses (full mix, instrumental, a cappella, group
+        submixes) from one load of the stems. The stems are stacked into a
+        (stems, frames, channels) array, or a memmap at stack_path, and every bus
+        comes out of one matmul per block. Peak normalization uses one scale for
+        all buses so they stay level-matched; a loudness target masters each bus
+        on its own.
+        """
+        gains = gains or {}
+        pans = pans or {}
+        self.last_timings = {}
+        self.last_loudness = None
+        self._report_progress(0.0)
+        
+        stem_data, max_length = self._load_stems(stems)
+        self._report_progress(0.5)
+        if not stem_data:
+            return {}, {}
+        
+        with self._stage('mix', stems=len(stem_data), buses=len(buses)) as info:
+            stack = stack_stems(stem_data, max_length, self.dtype, stack_path)
+            n_channels = stack.shape[2]
+            final_gains, coefficients = self._all_coefficients(stem_data, gains, pans, n_channels)
+            matrix = mixing_matrix(list(stem_data), coefficients, buses, n_channels, self.dtype)
+            mixed = mix_matrix(stack, matrix, MIX_CHUNK_FRAMES)
+            info['bytes'] = stack.nbytes + mixed.nbytes
+        self._report_progress(0.9)
+        
+        outputs = dict(zip(buses, mixed))
+        if target_lufs is not None:
+            loudness = {}
+            for name in outputs:
+                log(f"Mastering bus {name}...")
+                outputs[name] = self._master(outputs[name], target_lufs, true_peak_db)
+                loudness[name] = self.last_loudness
+            self.last_loudness = loudness
+        elif normalize_output:
+            with self._stage('normalize', bytes=mixed.nbytes):
+                max_val = max(float(mixed.max()), -float(mixed.min()))
+                if max_val > 1.0:
+                    log(f"Normalizing all buses (max value: {max_val:.3f})")
+                    mixed /= max_val
+        
+        self._report_progress(1.0)
+        self._print_timings()
+        return outputs, final_gains
+    
+    def mix_buses_streaming(
+        self,
+        stems: Dict[str, str],
+        buses: Mapping[str, BusSpec],
+        output_paths: Mapping[str, str],
+        gains: Optional[Dict[str, float]] = None,
+        pans: Optional[Dict[str, float]] = None,
+        normalize_output: bool = True,
+        block_size: int = 65536,
+        output_format: str = 'wav16',
+        peaks_paths: Optional[Mapping[str, str]] = None,
+        target_lufs: Optional[float] = None,
+        true_peak_db: float = DEFAULT_TRUE_PEAK_DB
+    ) -> Tuple[Dict[str, float], Dict[str, Dict[str, Any]]]:
+        """
+        Streaming mix_buses(): each stem is decoded once, block by block, into a
+        (stems, block, channels) stack, and one matmul per block renders all
+        buses into a float32 intermediate laid out (frames, buses, channels).
+        A second pass normalizes or limits each bus into output_paths[bus].
+        """
+        output_extension(output_format)
+        if set(output_paths) != set(buses):
+            raise ValueError("output_paths must name exactly one file per bus")
+        gains = gains or {}
+        pans = pans or {}
+        peaks_paths = peaks_paths or {}
+        self.last_timings = {}
+        self.last_loudness = None
+        self._report_progress(0.0)
+        
+        readers = {}
+        temp_path = None
+        results = {}
+        try:
+            n_channels = self._open_readers(stems, block_size, readers)
+            final_gains, coefficients = self._all_coefficients(readers, gains, pans, n_channels)
+            names = list(readers)
+            matrix = mixing_matrix(names, coefficients, buses, n_channels, self.dtype)
+            n_buses = len(buses)
+            
+            first_output = next(iter(output_paths.values()))
+            fd, temp_path = tempfile.mkstemp(suffix='.f32', dir=os.path.dirname(os.path.abspath(first_output)))
+            os.close(fd)
+            
+            stack = np.zeros((len(names), block_size, n_channels), dtype=self.dtype)
+            rendered = np.empty((n_buses, block_size, n_channels), dtype=self.dtype)
+            peaks = np.zeros(n_buses)
+            meters = [LoudnessMeter(self.sample_rate, n_channels) for _ in buses] if target_lufs is not None else []
+            meter_seconds = 0.0
+            expected_frames = max([reader.frames for reader in readers.values()] + [1])
+            frames = 0
+            
+            log(f"Streaming {n_buses} buses from {len(names)} stems (block size: {block_size})...")
+            with self._stage('mix', stems=len(names), buses=n_buses) as info:
+                with open(temp_path, 'wb') as tmp:
+                    while True:
+                        block_frames = 0
+                        for index, name in enumerate(names):
+                            n = readers[name].read_into(stack[index])
+                            stack[index, n:] = 0.0
+                            block_frames = max(block_frames, n)
+                        if block_frames == 0:
+                            break
+                        
+                        block = mix_block(matrix, stack[:, :block_frames], out=rendered[:, :block_frames])
+                        np.maximum(peaks, np.abs(block).max(axis=(1, 2)), out=peaks)
+                        meter_start = time.perf_counter()
+                        for meter, bus_block in zip(meters, block):
+                            meter.update(bus_block)
+                        meter_seconds += time.perf_counter() - meter_start
+                        tmp.write(block.transpose(1, 0, 2).astype(np.float32).tobytes())
+                        frames += block_frames
+                        self._report_progress(STREAM_MIX_PROGRESS * frames / expected_frames)
+                info['bytes'] = frames * n_buses * n_channels * self.dtype.itemsize
+            if meters:
+                self._record_meter_time(meter_seconds, frames * n_buses * n_channels * self.dtype.itemsize)
+            
+            # Linked normalization keeps the buses level-matched with each other
+            scale = 1.0
+            if normalize_output and target_lufs is None and peaks.max() > 1.0:
+                scale = 1.0 / float(peaks.max())
+                log(f"Normalizing all buses (max value: {peaks.max():.3f})")
+            
+            intermediate = np.memmap(temp_path, dtype=np.float32, mode='r', shape=(frames, n_buses, n_channels)) \
+                if frames else np.zeros((0, n_buses, n_channels), dtype=np.float32)
+            progress_step = (1.0 - STREAM_MIX_PROGRESS) / n_buses
+            loudness = {}
+            for index, bus in enumerate(buses):
+                limiter = None
+                if meters:
+                    log(f"Mastering bus {bus}...")
+                    input_lufs = meters[index].integrated()
+                    limiter = self._limiter(input_lufs, target_lufs, true_peak_db)
+                
+                peak_builder = PeakBuilder(self.sample_rate, n_channels) if bus in peaks_paths else None
+                source = (intermediate[i:i + block_size, index] for i in range(0, frames, block_size))
+                progress_start = STREAM_MIX_PROGRESS + index * progress_step
+                output_meter = self._write_pass(
+                    source, frames, output_paths[bus], n_channels, output_format, peak_builder, scale, limiter,
+                    progress_start, progress_start + progress_step, bus=bus
+                )
+                if peak_builder is not None:
+                    peak_builder.save(peaks_paths[bus])
+                if limiter is not None:
+                    loudness[bus] = self._record_loudness(input_lufs, target_lufs, limiter, output_meter)
+                
+                results[bus] = {
+                    'frames': frames,
+                    'duration': frames / self.sample_rate,
+                    'peak': float(peaks[index]),
+                    'scale': limiter.input_gain if limiter is not None else scale,
+                    'output_format': output_format,
+                    'loudness': loudness.get(bus),
+                }
+                log(f"Saved bus {bus} to {output_paths[bus]}")
+            self.last_loudness = loudness or None
+        finally:
+            for reader in readers.values():
+                reader.close()
+            if temp_path is not None:
+                os.remove(temp_path)
+        
+        self._record_stream_io(readers)
+        self._report_progress(1.0)
+        self._print_timings()
+        return final_gains, results
+    
+    def _open_output(self, output_path: str, n_channels: int, output_format: str) -> sf.SoundFile:
+        # Blocks are encoded as they are written, so compressed output never needs a full PCM copy
+        output_extension(output_format)
+        container, subtype, _ = OUTPUT_FORMATS[output_format]
+        return sf.SoundFile(output_path, 'w', samplerate=self.sample_rate, channels=n_channels,
+                            format=container, subtype=subtype)
+    
+    def _record_write(self, seconds: float, output_path: str):
+        size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+        add_span('write', seconds, size, file=os.path.basename(output_path))
+        self._add_timing('write', seconds)
+    
+    def save_audio(self, audio: np.ndarray, output_path: str, output_format: str = 'wav16',
+                   peaks_path: Optional[str] = None):
+        log(f"Saving audio with shape: {audio.shape}")
+        start = time.perf_counter()
+        n_channels = audio.shape[1] if audio.ndim > 1 else 1
+        peak_builder = PeakBuilder(self.sample_rate, n_channels) if peaks_path else None
+        with self._open_output(output_path, n_channels, output_format) as out:
+            for i in range(0, len(audio), MIX_CHUNK_FRAMES):
+                block = audio[i:i + MIX_CHUNK_FRAMES]
+                out.write(block)
+                if peak_builder is not None:
+                    peak_builder.update(block)
+        self._record_write(time.perf_counter() - start, output_path)
+        if peak_builder is not None:
+            peak_builder.save(peaks_path)
+        log(f"Saved mixed audio to {output_path}")
@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+from .audio_mixer import StemMixer
+from .gain_predictor import GainPredictor
+from .parallel import map_stems
+from .stem_cache import StemCache
+
+# project -> stem name -> audio path; stem names double as stem types for scoring
+Catalog = Dict[str, Dict[str, str]]
+
+AUDIO_SUFFIXES = ('.wav', '.flac', '.aiff', '.aif', '.ogg')
+
+
+def _stem_features(mixer: StemMixer, predictor: GainPredictor,
+                   file_path: str) -> Tuple[Optional[np.ndarray], Optional[str]]:
+    # Module-level so process pools can pickle it; failures become rows with an error
+    try:
+        audio, _, _ = mixer._load_stem(file_path)
+        return predictor.extract_features(audio, mixer.sample_rate), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def predict_catalog(
+    catalog: Catalog,
+    sample_rate: int = 44100,
+    executor: str = 'process',
+    max_workers: Optional[int] = None,
+    stem_cache: Optional[StemCache] = None,
+    n_mfcc: int = 13
+) -> Dict[str, np.ndarray]:
+    """
+    Predicts auto-gains for every stem of every project.
+
+    Features are extracted in parallel (one task per stem), stacked into a
+    single (stems, features) matrix and scored in one vectorized pass. Returns
+    columns of equal length: project, stem, path, gain_db, error, plus the
+    feature matrix under 'features'. Stems that fail to load get NaN gains.
+    """
+    mixer = StemMixer(sample_rate=sample_rate, stem_cache=stem_cache, precision='float32')
+    predictor = GainPredictor(n_mfcc=n_mfcc)
+
+    rows: List[Tuple[str, str, str]] = [
+        (project, stem, path) for project, stems in catalog.items() for stem, path in stems.items()
+    ]
+    results = map_stems(
+        _stem_features,
+        {str(i): (mixer, predictor, path) for i, (_, _, path) in enumerate(rows)},
+        executor,
+        max_workers
+    )
+
+    extracted = [results[str(i)] for i in range(len(rows))]
+    errors = np.array([error or '' for _, error in extracted], dtype=object)
+    ok = np.array([features is not None for features, _ in extracted], dtype=bool)
+
+    n_features = next((len(features) for features, _ in extracted if features is not None), 0)
+    feature_matrix = np.full((len(rows), n_features), np.nan)
+    if ok.any():
+        feature_matrix[ok] = np.stack([features for features, _ in extracted if features is not None])
+
+    stems = np.array([stem for _, stem, _ in rows], dtype=object)
+    gains = np.full(len(rows), np.nan)
+    if ok.any():
+        gains[ok] = predictor.compute_relative_gains(feature_matrix[ok], stems[ok].astype(str))
+
+    return {
+        'project': np.array([project for project, _, _ in rows], dtype=object),
+        'stem': stems,
+        'path': np.array([path for _, _, path in rows], dtype=object),
+        'gain_db': gains,
+        'error': errors,
+        'features': feature_matrix,
+    }
+
+
+def write_columnar(table: Dict[str, np.ndarray], output_path: str) -> str:
+    """
+    Writes Parquet when pyarrow is installed and the path ends in .parquet,
+    otherwise an .npz with one array per column. Feature columns are split
+    out as feature_00, feature_01, ... so each is its own column.
+    """
+    columns = {name: values for name, values in table.items() if name != 'features'}
+    features = table.get('features')
+    if features is not None:
+        for i in range(features.shape[1]):
+            columns[f'feature_{i:02d}'] = features[:, i]
+
+    if output_path.endswith('.parquet'):
+        if not HAS_PYARROW:
+            raise ImportError("Writing Parquet requires pyarrow; use an .npz output path instead")
+        arrays = {
+            name: pa.array(values.tolist() if values.dtype == object else values)
+            for name, values in columns.items()
+        }
+        pq.write_table(pa.table(arrays), output_path)
+        return output_path
+
+    if not output_path.endswith('.npz'):
+        output_path += '.npz'
+    np.savez(output_path, **{
+        name: values.astype(str) if values.dtype == object else values for name, values in columns.items()
+    })
+    return output_path
+
+
+def catalog_from_directory(root: str) -> Catalog:
+    # Each subdirectory is a project; its audio files are the stems, named by file stem
+    catalog: Catalog = {}
+    for project in sorted(Path(root).iterdir()):
+        if not project.is_dir():
+            continue
+        stems = {
+            path.stem: str(path) for path in sorted(project.iterdir())
+            if path.suffix.lower() in AUDIO_SUFFIXES
+        }
+        if stems:
+            catalog[project.name] = stems
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch auto-gain prediction over many projects")
+    parser.add_argument('catalog', help="JSON manifest {project: {stem: path}} or a directory of project folders")
+    parser.add_argument('--output', default='gains.parquet' if HAS_PYARROW else 'gains.npz')
+    parser.add_argument('--sample-rate', type=int, default=44100)
+    parser.add_argument('--executor', default='process')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--stem-cache', help="stem cache directory to reuse decoded stems")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.catalog):
+        catalog = catalog_from_directory(args.catalog)
+    else:
+        with open(args.catalog) as f:
+            catalog = json.load(f)
+
+    stem_cache = StemCache(args.stem_cache) if args.stem_cache else None
+    n_stems = sum(len(stems) for stems in catalog.values())
+    print(f"Analyzing {n_stems} stems across {len(catalog)} projects ({args.executor} executor)...")
+
+    start = time.perf_counter()
+    table = predict_catalog(catalog, args.sample_rate, args.executor, args.workers, stem_cache)
+    elapsed = time.perf_counter() - start
+
+    output_path = write_columnar(table, args.output)
+    failed = int(np.count_nonzero(table['error'] != ''))
+    print(f"Wrote {output_path}: {n_stems - failed} stems scored, {failed} failed "
+          f"in {elapsed:.1f}s ({n_stems / max(elapsed, 1e-9):.1f} stems/s)")
+
+
+if __name__ == '__main__':
+    main()
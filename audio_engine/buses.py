@@ -0,0 +1,100 @@
+from typing import Dict, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+# A bus lists the stems it carries (at unity send) or maps stems to a send level in dB
+BusSpec = Union[Sequence[str], Mapping[str, float]]
+
+
+def bus_sends(bus: BusSpec) -> Dict[str, float]:
+    if isinstance(bus, Mapping):
+        return dict(bus)
+    return {name: 0.0 for name in bus}
+
+
+def mixing_matrix(
+    stem_names: Sequence[str],
+    coefficients: Mapping[str, Optional[np.ndarray]],
+    buses: Mapping[str, BusSpec],
+    n_channels: int,
+    dtype: np.dtype = np.float64
+) -> np.ndarray:
+    """
+    Builds the (buses, stems, channels) matrix of per-channel coefficients:
+    each stem's gain/pan coefficients (None is unity) times its send level
+    on the bus, and zero for stems the bus does not carry.
+    """
+    if not buses:
+        raise ValueError("At least one output bus is required")
+    index = {name: i for i, name in enumerate(stem_names)}
+    matrix = np.zeros((len(buses), len(stem_names), n_channels), dtype=dtype)
+
+    for b, (bus_name, bus) in enumerate(buses.items()):
+        sends = bus_sends(bus)
+        unknown = sorted(set(sends) - set(index))
+        if unknown:
+            raise ValueError(f"Bus '{bus_name}' references unknown stems: {unknown}")
+        for stem, send_db in sends.items():
+            coeff = coefficients.get(stem)
+            matrix[b, index[stem]] = (1.0 if coeff is None else coeff) * 10 ** (send_db / 20.0)
+    return matrix
+
+
+def stack_stems(
+    stem_data: Mapping[str, np.ndarray],
+    max_length: int,
+    dtype: np.dtype = np.float64,
+    path: Optional[str] = None
+) -> np.ndarray:
+    """
+    Aligns stems into one zero-padded (stems, frames, channels) array, in the
+    order of stem_data. With a path the stack is an .npy memmap on disk, for
+    stem sets larger than memory.
+    """
+    channels = {audio.shape[1] for audio in stem_data.values()}
+    if len(channels) > 1:
+        raise ValueError(f"Stems have mismatched channel counts: {sorted(channels)}")
+    shape = (len(stem_data), max_length, channels.pop() if channels else 2)
+
+    if path is None:
+        stack = np.zeros(shape, dtype=dtype)
+    else:
+        stack = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+    for i, audio in enumerate(stem_data.values()):
+        frames = min(len(audio), max_length)
+        stack[i, :frames] = audio[:frames]
+        stack[i, frames:] = 0.0
+    return stack
+
+
+def mix_block(matrix: np.ndarray, block: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    (buses, stems, channels) x (stems, frames, channels) -> (buses, frames, channels).
+
+    One batched matmul over channels: matrix as (channels, buses, stems) times
+    the block as (channels, stems, frames). The transposes are views, so BLAS
+    reads the block in place and writes straight into out.
+    """
+    if out is None:
+        out = np.empty((matrix.shape[0], block.shape[1], block.shape[2]), dtype=np.result_type(matrix, block))
+    np.matmul(matrix.transpose(2, 0, 1), block.transpose(2, 0, 1), out=out.transpose(2, 0, 1))
+    return out
+
+
+def mix_matrix(
+    stack: np.ndarray,
+    matrix: np.ndarray,
+    block_size: int = 65536,
+    out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    # Renders every bus of a stacked (stems, frames, channels) array, block by block
+    n_buses = matrix.shape[0]
+    _, frames, n_channels = stack.shape
+    if out is None:
+        out = np.empty((n_buses, frames, n_channels), dtype=np.result_type(matrix, stack))
+    # Channel-major copy once, so each block's matmul reads a contiguous matrix
+    matrix = np.ascontiguousarray(matrix.transpose(2, 0, 1)).transpose(1, 2, 0)
+    for start in range(0, frames, block_size):
+        end = min(start + block_size, frames)
+        mix_block(matrix, stack[:, start:end], out=out[:, start:end])
+    return out
@@ -0,0 +1,75 @@
+import importlib.util
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Checked without importing; onnxruntime itself loads with the first model
+HAS_ONNXRUNTIME = importlib.util.find_spec('onnxruntime') is not None
+
+BUNDLED_TEST_MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'gain_cnn_test.onnx')
+
+# Mel patches taken per stem, evenly spaced; every stem contributes the same number so
+# the whole request is one fixed-shape batch
+PATCHES_PER_STEM = 8
+
+_models: Dict[str, 'GainModel'] = {}
+_models_lock = threading.Lock()
+
+
+class GainModel:
+    """
+    ONNX gain regressor over log-mel patches.
+
+    Input: float32 (batch, 1, n_mels, frames), log-mel dB scaled to roughly [0, 1].
+    Output: (batch, 1) gain in dB per patch.
+    """
+
+    def __init__(self, model_path: str, intra_op_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        _, _, self.n_mels, self.patch_frames = model_input.shape
+        # Serialize runs: a session is thread-safe, but concurrent runs would
+        # oversubscribe the intra-op thread pool
+        self._lock = threading.Lock()
+
+    @property
+    def patch_shape(self) -> Tuple[int, int]:
+        return self.n_mels, self.patch_frames
+
+    def predict(self, patches: np.ndarray) -> np.ndarray:
+        with self._lock:
+            outputs = self.session.run(None, {self.input_name: np.ascontiguousarray(patches, dtype=np.float32)})
+        return outputs[0].reshape(len(patches))
+
+    def warm_up(self):
+        # First run allocates buffers and picks kernels; do it before real traffic
+        self.predict(np.zeros((PATCHES_PER_STEM, 1, self.n_mels, self.patch_frames), dtype=np.float32))
+
+
+def load_model(model_path: str, warm_up: bool = True) -> GainModel:
+    # One session per model file per process; /mix builds predictors per request
+    if not HAS_ONNXRUNTIME:
+        raise ImportError("CNN gain prediction requires onnxruntime")
+    model_path = os.path.abspath(model_path)
+    with _models_lock:
+        model = _models.get(model_path)
+        if model is None:
+            model = GainModel(model_path)
+            if warm_up:
+                model.warm_up()
+            _models[model_path] = model
+    return model
+
+
+def configured_model_path(model_path: Optional[str] = None) -> Optional[str]:
+    return model_path or os.environ.get('AURALIS_CNN_MODEL') or None
@@ -1,40 +1,123 @@
+import hashlib
+import importlib.util
+import os
+import threading
+from collections import OrderedDict
 import numpy as np
-import librosa
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional, Sequence, Tuple
+from .parallel import map_stems
+from .instrumentation import log, span
+from .cnn_model import PATCHES_PER_STEM, HAS_ONNXRUNTIME, GainModel, configured_model_path, load_model
 import warnings
 warnings.filterwarnings('ignore')
 
+# librosa (and its numba JIT) is imported on first use so importing the mixer stays fast
+HAS_LIBROSA = importlib.util.find_spec('librosa') is not None
+
+# Memoized feature arrays, bounded by count and by total bytes: feature vectors are tiny,
+# but a stem's mel patches (8 x 128 x 128 float32) take 0.5 MB each
+FEATURE_CACHE_SIZE = 512
+FEATURE_CACHE_BYTES = 32 * 1024 ** 2
+
+# Gain offset (dB) per stem type before feature-based corrections
+TYPE_BASELINES = {
+    'drums': -2.0,
+    'bass': -1.5,
+    'vocals': 0.0,
+    'synth': -2.5,
+}
+DEFAULT_BASELINE = -1.5
+
+
 class GainPredictor:
-    def __init__(self, n_mfcc: int = 13):
+    _feature_cache: 'OrderedDict[Tuple, np.ndarray]' = OrderedDict()
+    _feature_cache_lock = threading.Lock()
+    _feature_cache_bytes = 0
+    
+    def __init__(self, n_mfcc: int = 13, executor: str = 'serial', max_workers: Optional[int] = None):
         self.n_mfcc = n_mfcc
+        self.executor = executor
+        self.max_workers = max_workers
     
-    def extract_features(self, audio: np.ndarray, sr: int) -> np.ndarray:
+    @classmethod
+    def clear_feature_cache(cls):
+        with cls._feature_cache_lock:
+            cls._feature_cache.clear()
+            cls._feature_cache_bytes = 0
+    
+    @staticmethod
+    def audio_digest(audio: np.ndarray) -> str:
+        audio = np.ascontiguousarray(audio)
+        hasher = hashlib.blake2b(digest_size=20)
+        hasher.update(f"{audio.dtype.str}{audio.shape}".encode())
+        hasher.update(audio.view(np.uint8))
+        return hasher.hexdigest()
+    
+    def _memoize(self, kind: str, audio: np.ndarray, sr: int, params: Tuple,
+                 compute: Callable[[], np.ndarray]) -> np.ndarray:
+        key = (kind, self.audio_digest(audio), sr, self.n_mfcc) + params
+        
+        cache = GainPredictor._feature_cache
+        with GainPredictor._feature_cache_lock:
+            features = cache.get(key)
+            if features is not None:
+                cache.move_to_end(key)
+                return features.copy()
+        
+        with span('features', audio.nbytes, kind=kind):
+            features = compute()
+        
+        with GainPredictor._feature_cache_lock:
+            previous = cache.pop(key, None)
+            if previous is not None:
+                GainPredictor._feature_cache_bytes -= previous.nbytes
+            cache[key] = features
+            GainPredictor._feature_cache_bytes += features.nbytes
+            while len(cache) > 1 and (len(cache) > FEATURE_CACHE_SIZE
+                                      or GainPredictor._feature_cache_bytes > FEATURE_CACHE_BYTES):
+                _, evicted = cache.popitem(last=False)
+                GainPredictor._feature_cache_bytes -= evicted.nbytes
+        return features.copy()
+    
+    def _to_mono(self, audio: np.ndarray) -> np.ndarray:
         if len(audio.shape) > 1:
-            audio_mono = np.mean(audio, axis=1)
-        else:
-            audio_mono = audio
+            return np.mean(audio, axis=1)
+        return audio
+    
+    def _spectrogram(self, audio_mono: np.ndarray, sr: int, n_fft: int = 2048,
+                     hop_length: int = 512, n_mels: int = 128) -> Tuple[np.ndarray, np.ndarray]:
+        import librosa
+        
+        # One STFT per stem; every spectral descriptor below is derived from it
+        magnitude = np.abs(librosa.stft(audio_mono, n_fft=n_fft, hop_length=hop_length))
+        mel_power = librosa.feature.melspectrogram(S=magnitude ** 2, sr=sr, n_mels=n_mels)
+        return magnitude, mel_power
+    
+    def _features_from_spectrogram(self, audio_mono: np.ndarray, sr: int,
+                                   magnitude: np.ndarray, mel_power: np.ndarray) -> np.ndarray:
+        import librosa
         
         features = []
         
         rms = np.mean(librosa.feature.rms(y=audio_mono, frame_length=2048, hop_length=512)[0])
         features.append(rms)
         
-        spectral_centroid = np.mean(librosa.feature.spectral_centroid(y=audio_mono, sr=sr)[0])
+        spectral_centroid = np.mean(librosa.feature.spectral_centroid(S=magnitude, sr=sr)[0])
         spectral_centroid_norm = spectral_centroid / (sr / 2)
         features.append(spectral_centroid_norm)
         
-        rolloff = np.mean(librosa.feature.spectral_rolloff(y=audio_mono, sr=sr)[0])
+        rolloff = np.mean(librosa.feature.spectral_rolloff(S=magnitude, sr=sr)[0])
         rolloff_norm = rolloff / (sr / 2)
         features.append(rolloff_norm)
         
         zcr = np.mean(librosa.feature.zero_crossing_rate(audio_mono)[0])
         features.append(zcr)
         
-        bandwidth = np.mean(librosa.feature.spectral_bandwidth(y=audio_mono, sr=sr)[0])
+        bandwidth = np.mean(librosa.feature.spectral_bandwidth(S=magnitude, sr=sr)[0])
         bandwidth_norm = bandwidth / (sr / 2)
         features.append(bandwidth_norm)
         
-        mfccs = librosa.feature.mfcc(y=audio_mono, sr=sr, n_mfcc=self.n_mfcc)
+        mfccs = librosa.feature.mfcc(S=librosa.power_to_db(mel_power), sr=sr, n_mfcc=self.n_mfcc)
         mfcc_mean = np.mean(mfccs, axis=1)
         features.extend(mfcc_mean.tolist())
         
@@ -43,24 +126,33 @@ class GainPredictor:
         
         return np.array(features)
     
+    def extract_features(self, audio: np.ndarray, sr: int) -> np.ndarray:
+        def compute() -> np.ndarray:
+            audio_mono = self._to_mono(audio)
+            magnitude, mel_power = self._spectrogram(audio_mono, sr)
+            return self._features_from_spectrogram(audio_mono, sr, magnitude, mel_power)
+        
+        return self._memoize('features', audio, sr, (), compute)
+    
     def compute_relative_gain(self, features: np.ndarray, stem_type: str) -> float:
-        type_baselines = {
-            'drums': -2.0,
-            'bass': -1.5,
-            'vocals': 0.0,
-            'synth': -2.5,
-        }
-        baseline = type_baselines.get(stem_type, -1.5)
-        
-        rms = features[0]
-        spectral_centroid = features[1]
-        dynamic_range = features[-1]
+        return float(self.compute_relative_gains(np.asarray(features)[np.newaxis, :], [stem_type])[0])
+    
+    def compute_relative_gains(self, feature_matrix: np.ndarray, stem_types: Sequence[str]) -> np.ndarray:
+        # One row per stem (as returned by extract_features); all rows are scored at once
+        feature_matrix = np.asarray(feature_matrix, dtype=np.float64)
+        stem_types = np.asarray(stem_types)
+        
+        baseline = np.array([TYPE_BASELINES.get(t, DEFAULT_BASELINE) for t in stem_types], dtype=np.float64)
+        
+        rms = feature_matrix[:, 0]
+        spectral_centroid = feature_matrix[:, 1]
+        dynamic_range = feature_matrix[:, -1]
         
         loudness_gain = np.clip((0.5 - rms) * 10, -3, 3)
         
-        brightness_gain = 0
-        if stem_type == 'vocals':
-            brightness_gain = np.clip((spectral_centroid - 0.15) * 5, -2, 2)
+        brightness_gain = np.where(
+            stem_types == 'vocals', np.clip((spectral_centroid - 0.15) * 5, -2, 2), 0.0
+        )
         
         compression_gain = np.clip((0.5 - dynamic_range) * 2, -2, 1)
         
@@ -70,68 +162,127 @@ class GainPredictor:
     
     def predict_gains(self, stems_data: Dict[str, np.ndarray], 
                      stem_paths: Optional[Dict[str, str]] = None) -> Dict[str, float]:
-        print("\nAnalyzing stems for optimal gain settings...")
+        log("\nAnalyzing stems for optimal gain settings...")
         
         predicted_gains = {}
         
-        for name, audio in stems_data.items():
-            sr = 44100
-            if stem_paths and hasattr(self, 'sr'):
-                sr = self.sr
-            
-            features = self.extract_features(audio, sr)
-            
-            gain = self.compute_relative_gain(features, name)
+        sr = 44100
+        if stem_paths and hasattr(self, 'sr'):
+            sr = self.sr
+        
+        all_features = map_stems(
+            self.extract_features,
+            {name: (audio, sr) for name, audio in stems_data.items()},
+            self.executor,
+            self.max_workers
+        )
+        
+        names = list(all_features)
+        gains = self.compute_relative_gains(np.stack([all_features[n] for n in names]), names) if names else []
+        for name, gain in zip(names, gains):
+            features = all_features[name]
             predicted_gains[name] = float(gain)
             
-            print(f"  {name}: {gain:.2f} dB (RMS: {features[0]:.4f}, "
+            log(f"  {name}: {gain:.2f} dB (RMS: {features[0]:.4f}, "
                   f"Centroid: {features[1]:.4f})")
         
         return predicted_gains
 
 
 class CNNGainPredictor(GainPredictor):
-    def __init__(self, n_mfcc: int = 13, model_path: Optional[str] = None):
-        super().__init__(n_mfcc)
-        self.model_path = model_path
-        self.model = None
+    def __init__(self, n_mfcc: int = 13, model_path: Optional[str] = None,
+                 executor: str = 'serial', max_workers: Optional[int] = None):
+        super().__init__(n_mfcc, executor, max_workers)
+        self.model_path = configured_model_path(model_path)
+        self.model: Optional[GainModel] = None
+    
+    def __getstate__(self):
+        # Process-pool fan-out pickles extract_mel_patches, and with it the predictor.
+        # The ONNX session cannot be pickled; workers only extract patches, and
+        # _model() reloads it from model_path if ever needed there.
+        state = self.__dict__.copy()
+        state['model'] = None
+        return state
     
     def extract_spectral_features(self, audio: np.ndarray, sr: int, 
                                    n_fft: int = 2048, hop_length: int = 512) -> np.ndarray:
-        if len(audio.shape) > 1:
-            audio_mono = np.mean(audio, axis=1)
-        else:
-            audio_mono = audio
-        
-        mel_spec = librosa.feature.melspectrogram(
-            y=audio_mono, 
-            sr=sr,
-            n_fft=n_fft,
-            hop_length=hop_length,
-            n_mels=128
-        )
-        
-        mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
-        
-        features = []
-        features.append(np.mean(mel_spec_db))
-        features.append(np.std(mel_spec_db))
+        def compute() -> np.ndarray:
+            import librosa
+            
+            audio_mono = self._to_mono(audio)
+            magnitude, mel_power = self._spectrogram(audio_mono, sr, n_fft, hop_length)
+            
+            mel_spec_db = librosa.power_to_db(mel_power, ref=np.max)
+            
+            features = []
+            features.append(np.mean(mel_spec_db))
+            features.append(np.std(mel_spec_db))
+            
+            if n_fft != 2048 or hop_length != 512:
+                magnitude, mel_power = self._spectrogram(audio_mono, sr)
+            traditional_features = self._features_from_spectrogram(audio_mono, sr, magnitude, mel_power)
+            features.extend(traditional_features.tolist())
+            
+            return np.array(features)
         
-        traditional_features = self.extract_features(audio, sr)
-        features.extend(traditional_features.tolist())
+        return self._memoize('spectral', audio, sr, (n_fft, hop_length), compute)
+    
+    def extract_mel_patches(self, audio: np.ndarray, sr: int, n_mels: int = 128, patch_frames: int = 128,
+                            n_patches: int = PATCHES_PER_STEM) -> np.ndarray:
+        # Fixed-shape (n_patches, 1, n_mels, patch_frames) log-mel patches, evenly
+        # spaced over the stem; short stems are padded with silence
+        def compute() -> np.ndarray:
+            import librosa
+            
+            audio_mono = self._to_mono(audio)
+            _, mel_power = self._spectrogram(audio_mono, sr, n_mels=n_mels)
+            mel_db = librosa.power_to_db(mel_power, ref=np.max, top_db=80.0)
+            mel = ((mel_db + 80.0) / 80.0).astype(np.float32)
+            
+            if mel.shape[1] < patch_frames:
+                mel = np.pad(mel, ((0, 0), (0, patch_frames - mel.shape[1])))
+            starts = np.linspace(0, mel.shape[1] - patch_frames, n_patches).astype(int)
+            patches = np.stack([mel[:, start:start + patch_frames] for start in starts])
+            return patches[:, np.newaxis, :, :]
         
-        return np.array(features)
+        return self._memoize('patches', audio, sr, (n_mels, patch_frames, n_patches), compute)
+    
+    def _model(self) -> Optional[GainModel]:
+        if self.model is None and self.model_path and HAS_ONNXRUNTIME:
+            self.model = load_model(self.model_path)
+        return self.model
     
     def predict_gains_cnn(self, stems_data: Dict[str, np.ndarray],
                           stem_paths: Optional[Dict[str, str]] = None) -> Dict[str, float]:
-        print("\nUsing CNN model for gain prediction (Prototype Mode)...")
+        sr = getattr(self, 'sr', 44100)
+        model = self._model()
+        if model is None:
+            reason = "onnxruntime not installed" if self.model_path else "no model configured"
+            log(f"\nCNN model unavailable ({reason}), using rule-based gain prediction...")
+            return self.predict_gains(stems_data, stem_paths)
         
-        predicted_gains = {}
-        sr = 44100
+        log(f"\nUsing CNN model {os.path.basename(model.model_path)} for gain prediction...")
+        n_mels, patch_frames = model.patch_shape
+        all_patches = map_stems(
+            self.extract_mel_patches,
+            {name: (audio, sr, n_mels, patch_frames) for name, audio in stems_data.items()},
+            self.executor,
+            self.max_workers
+        )
         
-        for name, audio in stems_data.items():
-            gain = self.compute_relative_gain(self.extract_features(audio, sr), name)
+        names = list(all_patches)
+        if not names:
+            return {}
+        
+        # Every patch of every stem goes through the model in one forward call
+        batch = np.concatenate([all_patches[name] for name in names])
+        with span('inference', batch.nbytes, patches=len(batch)):
+            patch_gains = model.predict(batch).reshape(len(names), -1)
+        gains = np.clip(patch_gains.mean(axis=1), -6, 6)
+        
+        predicted_gains = {}
+        for name, gain in zip(names, gains):
             predicted_gains[name] = float(gain)
-            print(f"  {name}: {gain:.2f} dB")
+            log(f"  {name}: {gain:.2f} dB")
         
         return predicted_gains
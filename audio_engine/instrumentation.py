@@ -0,0 +1,169 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+STAGES = ('cache', 'decode', 'resample', 'features', 'predict', 'inference', 'mix', 'normalize', 'loudness', 'limit', 'write')
+
+_current_recorder: 'ContextVar[Optional[StageRecorder]]' = ContextVar('auralis_stage_recorder', default=None)
+
+
+def peak_rss_kb() -> int:
+    # Process-wide high-water mark; ru_maxrss is bytes on macOS and kilobytes on Linux
+    if not HAS_RESOURCE:
+        return 0
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+class StageRecorder:
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+        self.log_lines: List[str] = []
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, nbytes: int = 0, peak_rss: int = 0,
+               rss_growth: int = 0, **extra):
+        span = {
+            'stage': stage,
+            'seconds': seconds,
+            'bytes': int(nbytes),
+            'peak_rss_kb': peak_rss,
+            'rss_growth_kb': rss_growth,
+        }
+        span.update(extra)
+        with self._lock:
+            self.spans.append(span)
+
+    def log(self, message: str):
+        with self._lock:
+            self.log_lines.append(message)
+
+    @property
+    def logs(self) -> str:
+        with self._lock:
+            return "\n".join(self.log_lines) + ("\n" if self.log_lines else "")
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = list(self.spans)
+
+        stages: Dict[str, Dict[str, float]] = {}
+        for span in spans:
+            totals = stages.setdefault(span['stage'], {'count': 0, 'seconds': 0.0, 'bytes': 0})
+            totals['count'] += 1
+            totals['seconds'] += span['seconds']
+            totals['bytes'] += span['bytes']
+
+        return {
+            'wall_seconds': time.time() - self.started,
+            'peak_rss_kb': max([span['peak_rss_kb'] for span in spans] + [peak_rss_kb()]),
+            'stages': stages,
+            'spans': spans,
+        }
+
+
+def current_recorder() -> Optional[StageRecorder]:
+    return _current_recorder.get()
+
+
+@contextmanager
+def recording(recorder: Optional[StageRecorder] = None) -> Iterator[StageRecorder]:
+    recorder = recorder or StageRecorder()
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+
+@contextmanager
+def span(stage: str, nbytes: int = 0, **extra) -> Iterator[Dict[str, Any]]:
+    # Callers may fill in info['bytes'] (or other keys) once the payload size is known;
+    # info['seconds'] is available after the block exits.
+    info: Dict[str, Any] = {'bytes': nbytes}
+    info.update(extra)
+    rss_before = peak_rss_kb()
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        info['seconds'] = time.perf_counter() - start
+        recorder = _current_recorder.get()
+        if recorder is not None:
+            rss_after = peak_rss_kb()
+            fields = {k: v for k, v in info.items() if k not in ('bytes', 'seconds')}
+            recorder.record(stage, info['seconds'], info['bytes'], rss_after, rss_after - rss_before, **fields)
+
+
+def add_span(stage: str, seconds: float, nbytes: int = 0, **extra):
+    # For stages measured piecewise (e.g. block writes interleaved with mixing)
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        rss = peak_rss_kb()
+        recorder.record(stage, seconds, nbytes, rss, 0, **extra)
+
+
+def log(message: str = ""):
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        for line in message.split("\n"):
+            recorder.log(line)
+    else:
+        print(message)
+
+
+class MetricsRegistry:
+    def __init__(self, recent_limit: int = 50):
+        self.recent_limit = recent_limit
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._runs = 0
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._recent: List[Dict[str, Any]] = []
+
+    def observe(self, summary: Dict[str, Any], label: str = 'mix'):
+        with self._lock:
+            self._runs += 1
+            for stage, totals in summary['stages'].items():
+                aggregate = self._stages.setdefault(
+                    stage, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'bytes': 0}
+                )
+                aggregate['count'] += totals['count']
+                aggregate['seconds'] += totals['seconds']
+                aggregate['max_seconds'] = max(aggregate['max_seconds'], totals['seconds'])
+                aggregate['bytes'] += totals['bytes']
+
+            self._recent.append({
+                'label': label,
+                'finished': time.time(),
+                'wall_seconds': summary['wall_seconds'],
+                'peak_rss_kb': summary['peak_rss_kb'],
+                'stages': {stage: totals['seconds'] for stage, totals in summary['stages'].items()},
+            })
+            del self._recent[:-self.recent_limit]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {}
+            for stage, aggregate in self._stages.items():
+                stages[stage] = dict(aggregate, mean_seconds=aggregate['seconds'] / max(aggregate['count'], 1))
+            return {
+                'uptime_seconds': time.time() - self._started,
+                'runs': self._runs,
+                'peak_rss_kb': peak_rss_kb(),
+                'stages': stages,
+                'recent': list(self._recent),
+            }
+
+
+METRICS = MetricsRegistry()
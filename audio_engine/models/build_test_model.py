@@ -0,0 +1,79 @@
+"""
+Builds gain_cnn_test.onnx, the small CNN bundled for exercising CNN mode.
+
+The weights are seeded random values, not trained: the model exists to test
+loading, batching and latency end to end, and its gains are not meaningful.
+Requires the `onnx` package (not needed at runtime).
+
+    python audio_engine/models/build_test_model.py
+"""
+import argparse
+import os
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+N_MELS = 128
+PATCH_FRAMES = 128
+
+
+def _conv_weights(rng: np.random.Generator, out_channels: int, in_channels: int, kernel: int) -> np.ndarray:
+    # He-style init keeps activations in a sane range through the ReLUs
+    scale = np.sqrt(2.0 / (in_channels * kernel * kernel))
+    return (rng.standard_normal((out_channels, in_channels, kernel, kernel)) * scale).astype(np.float32)
+
+
+def build_model(seed: int = 0) -> onnx.ModelProto:
+    rng = np.random.default_rng(seed)
+
+    initializers = [
+        numpy_helper.from_array(_conv_weights(rng, 8, 1, 3), 'conv1_w'),
+        numpy_helper.from_array(np.zeros(8, dtype=np.float32), 'conv1_b'),
+        numpy_helper.from_array(_conv_weights(rng, 16, 8, 3), 'conv2_w'),
+        numpy_helper.from_array(np.zeros(16, dtype=np.float32), 'conv2_b'),
+        numpy_helper.from_array((rng.standard_normal((1, 16)) * 0.25).astype(np.float32), 'dense_w'),
+        numpy_helper.from_array(np.zeros(1, dtype=np.float32), 'dense_b'),
+        numpy_helper.from_array(np.array(6.0, dtype=np.float32), 'gain_range'),
+    ]
+
+    nodes = [
+        helper.make_node('Conv', ['mel', 'conv1_w', 'conv1_b'], ['c1'], pads=[1, 1, 1, 1], strides=[2, 2]),
+        helper.make_node('Relu', ['c1'], ['r1']),
+        helper.make_node('MaxPool', ['r1'], ['p1'], kernel_shape=[2, 2], strides=[2, 2]),
+        helper.make_node('Conv', ['p1', 'conv2_w', 'conv2_b'], ['c2'], pads=[1, 1, 1, 1], strides=[2, 2]),
+        helper.make_node('Relu', ['c2'], ['r2']),
+        helper.make_node('GlobalAveragePool', ['r2'], ['pooled']),
+        helper.make_node('Flatten', ['pooled'], ['flat']),
+        helper.make_node('Gemm', ['flat', 'dense_w', 'dense_b'], ['logit'], transB=1),
+        # Bounded to the +/-6 dB range the mixer accepts
+        helper.make_node('Tanh', ['logit'], ['squashed']),
+        helper.make_node('Mul', ['squashed', 'gain_range'], ['gain_db']),
+    ]
+
+    graph = helper.make_graph(
+        nodes,
+        'auralis_gain_cnn_test',
+        [helper.make_tensor_value_info('mel', TensorProto.FLOAT, ['batch', 1, N_MELS, PATCH_FRAMES])],
+        [helper.make_tensor_value_info('gain_db', TensorProto.FLOAT, ['batch', 1])],
+        initializers,
+    )
+    # IR 8 / opset 13 load on onnxruntime releases from the last few years
+    model = helper.make_model(graph, producer_name='auralis', opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the bundled test gain CNN")
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gain_cnn_test.onnx'))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    onnx.save(build_model(args.seed), args.output)
+    print(f"Wrote {args.output} ({os.path.getsize(args.output)} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+EXECUTOR_KINDS = ('serial', 'thread', 'process')
+
+_executors: Dict[Tuple[str, int], Executor] = {}
+_executors_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def get_executor(kind: str, max_workers: Optional[int] = None) -> Optional[Executor]:
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f"Unknown executor '{kind}', expected one of {EXECUTOR_KINDS}")
+    if kind == 'serial':
+        return None
+
+    max_workers = max_workers or default_workers()
+    key = (kind, max_workers)
+    with _executors_lock:
+        executor = _executors.get(key)
+        if executor is None:
+            if kind == 'thread':
+                executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='auralis-stem')
+            else:
+                executor = ProcessPoolExecutor(max_workers=max_workers)
+            _executors[key] = executor
+    return executor
+
+
+def map_stems(
+    fn: Callable[..., T],
+    items: Dict[str, Tuple],
+    kind: str = 'serial',
+    max_workers: Optional[int] = None
+) -> Dict[str, T]:
+    # Process pools need fn and its arguments to be picklable (module-level
+    # functions or bound methods of picklable objects).
+    executor = get_executor(kind, max_workers)
+    if executor is None or len(items) <= 1:
+        return {name: fn(*args) for name, args in items.items()}
+
+    if kind == 'thread':
+        # Each task runs in a copy of the caller's context so stage spans and
+        # log lines reach the active recorder (process workers cannot share it).
+        futures = {
+            name: executor.submit(contextvars.copy_context().run, fn, *args)
+            for name, args in items.items()
+        }
+    else:
+        futures = {name: executor.submit(fn, *args) for name, args in items.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def shutdown_executors():
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False)
+        _executors.clear()
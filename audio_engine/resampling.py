@@ -0,0 +1,124 @@
+from fractions import Fraction
+from functools import lru_cache
+from typing import Tuple, Union
+
+import numpy as np
+
+# quality -> (filter zero crossings per side, Kaiser beta, cutoff relative to the lower Nyquist)
+POLYPHASE_QUALITIES = {
+    'fast': (8, 5.0, 0.90),
+    'medium': (16, 7.0, 0.94),
+    'high': (32, 9.0, 0.97),
+}
+
+SOXR_QUALITIES = {
+    'fast': 'LQ',
+    'medium': 'MQ',
+    'high': 'HQ',
+}
+
+
+def _ratio(sr_original: int, sr_target: int) -> Tuple[int, int]:
+    ratio = Fraction(int(sr_target), int(sr_original))
+    return ratio.numerator, ratio.denominator
+
+
+@lru_cache(maxsize=64)
+def _polyphase_filter(up: int, down: int, quality: str) -> np.ndarray:
+    from scipy.signal import firwin
+
+    zero_crossings, beta, rolloff = POLYPHASE_QUALITIES[quality]
+    max_rate = max(up, down)
+    taps = firwin(2 * zero_crossings * max_rate + 1, rolloff / max_rate, window=('kaiser', beta))
+    taps.setflags(write=False)
+    return taps
+
+
+class Resampler:
+    name = 'base'
+    supports_streaming = False
+
+    def __init__(self, quality: str = 'high'):
+        if quality not in POLYPHASE_QUALITIES:
+            raise ValueError(f"Unknown resample quality '{quality}', expected one of {tuple(POLYPHASE_QUALITIES)}")
+        self.quality = quality
+
+    @property
+    def tag(self) -> str:
+        # Identifies the backend and quality in stem cache keys
+        return f"{self.name}-{self.quality}"
+
+    def resample(self, audio: np.ndarray, sr_original: int, sr_target: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def open_stream(self, sr_original: int, sr_target: int, channels: int,
+                    dtype: np.dtype = np.dtype(np.float64)):
+        raise NotImplementedError(f"{self.name} resampler does not support streaming")
+
+
+class PolyphaseResampler(Resampler):
+    name = 'polyphase'
+
+    def resample(self, audio: np.ndarray, sr_original: int, sr_target: int) -> np.ndarray:
+        from scipy.signal import resample_poly
+
+        if sr_original == sr_target:
+            return audio
+
+        up, down = _ratio(sr_original, sr_target)
+        taps = _polyphase_filter(up, down, self.quality)
+        if audio.dtype == np.float32:
+            # Keep float32 input in float32 instead of promoting through float64 taps
+            taps = taps.astype(np.float32)
+        return resample_poly(audio, up, down, axis=0, window=taps)
+
+
+class SoxrResampler(Resampler):
+    name = 'soxr'
+    supports_streaming = True
+
+    def resample(self, audio: np.ndarray, sr_original: int, sr_target: int) -> np.ndarray:
+        import soxr
+
+        if sr_original == sr_target:
+            return audio
+        return soxr.resample(audio, sr_original, sr_target, quality=SOXR_QUALITIES[self.quality])
+
+    def open_stream(self, sr_original: int, sr_target: int, channels: int,
+                    dtype: np.dtype = np.dtype(np.float64)):
+        import soxr
+
+        return soxr.ResampleStream(
+            sr_original, sr_target, channels, dtype=np.dtype(dtype).name, quality=SOXR_QUALITIES[self.quality]
+        )
+
+
+class LibrosaResampler(Resampler):
+    name = 'librosa'
+
+    def resample(self, audio: np.ndarray, sr_original: int, sr_target: int) -> np.ndarray:
+        import librosa
+
+        if sr_original == sr_target:
+            return audio
+
+        channels = [
+            librosa.resample(audio[:, ch], orig_sr=sr_original, target_sr=sr_target)
+            for ch in range(audio.shape[1])
+        ]
+        return np.column_stack(channels)
+
+
+RESAMPLERS = {
+    'polyphase': PolyphaseResampler,
+    'soxr': SoxrResampler,
+    'librosa': LibrosaResampler,
+}
+
+
+def get_resampler(resampler: Union[str, Resampler] = 'polyphase', quality: str = 'high') -> Resampler:
+    if isinstance(resampler, Resampler):
+        return resampler
+    if resampler not in RESAMPLERS:
+        raise ValueError(f"Unknown resampler '{resampler}', expected one of {tuple(RESAMPLERS)}")
+    return RESAMPLERS[resampler](quality)
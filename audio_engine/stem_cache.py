@@ -0,0 +1,205 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+
+def _npy_header(shape: Tuple[int, ...]) -> bytes:
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        header, {'descr': np.lib.format.dtype_to_descr(np.dtype(np.float32)), 'fortran_order': False, 'shape': shape}
+    )
+    return header.getvalue()
+
+
+class StemCacheWriter:
+    def __init__(self, cache: 'StemCache', key: str, channels: int):
+        self._cache = cache
+        self._key = key
+        self._channels = channels
+        self._frames = 0
+        self._header_size = len(_npy_header((0, channels)))
+
+        fd, self._temp_path = tempfile.mkstemp(suffix='.npy.part', dir=str(cache.cache_dir))
+        self._file = os.fdopen(fd, 'wb')
+        self._file.write(_npy_header((0, channels)))
+
+    def write(self, block: np.ndarray):
+        self._file.write(np.ascontiguousarray(block, dtype=np.float32).tobytes())
+        self._frames += len(block)
+
+    def commit(self):
+        header = _npy_header((self._frames, self._channels))
+        if len(header) != self._header_size:
+            raise ValueError("npy header size changed while streaming into the stem cache")
+
+        self._file.seek(0)
+        self._file.write(header)
+        self._file.close()
+        self._cache._commit(self._key, self._temp_path)
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+
+class StemCache:
+    def __init__(
+        self,
+        cache_dir: str,
+        max_memory_items: int = 32,
+        max_disk_bytes: int = 4 * 1024 ** 3,
+        max_age_seconds: float = 7 * 24 * 3600
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age_seconds = max_age_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self._memory: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Worker processes get their own lock and an empty in-memory LRU
+        state = self.__dict__.copy()
+        state['_memory'] = OrderedDict()
+        state['_digests'] = {}
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def file_digest(self, file_path: str) -> str:
+        stat = os.stat(file_path)
+        stat_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(stat_key)
+        if digest is not None:
+            return digest
+
+        hasher = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+
+        with self._lock:
+            self._digests[stat_key] = digest
+        return digest
+
+    def remember_digest(self, file_path: str, digest: str):
+        # Lets callers that already hashed the file (e.g. while uploading) skip the re-read
+        stat = os.stat(file_path)
+        with self._lock:
+            self._digests[(os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)] = digest
+
+    def key(self, file_path: str, target_sr: int, variant: str = '') -> str:
+        # variant identifies the resampler that produced the buffer, if any
+        key = f"{self.file_digest(file_path)}_{target_sr}"
+        return f"{key}_{variant}" if variant else key
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npy"
+
+    def _remember(self, key: str, audio: np.ndarray):
+        with self._lock:
+            self._memory[key] = audio
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def lookup(self, file_path: str, target_sr: int, variant: str = '') -> Optional[np.ndarray]:
+        key = self.key(file_path, target_sr, variant)
+
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return audio
+
+        path = self._path(key)
+        try:
+            audio = np.load(path, mmap_mode='r')
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        self._remember(key, audio)
+        return audio
+
+    def get(self, file_path: str, target_sr: int, loader: Callable[[], np.ndarray],
+            variant: str = '') -> np.ndarray:
+        audio = self.lookup(file_path, target_sr, variant)
+        if audio is not None:
+            return audio
+        return self.put(file_path, target_sr, loader(), variant)
+
+    def put(self, file_path: str, target_sr: int, audio: np.ndarray, variant: str = '') -> np.ndarray:
+        key = self.key(file_path, target_sr, variant)
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+
+        fd, temp_path = tempfile.mkstemp(suffix='.npy.part', dir=str(self.cache_dir))
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, audio)
+        return self._commit(key, temp_path)
+
+    def writer(self, file_path: str, target_sr: int, channels: int, variant: str = '') -> StemCacheWriter:
+        return StemCacheWriter(self, self.key(file_path, target_sr, variant), channels)
+
+    def _commit(self, key: str, temp_path: str) -> np.ndarray:
+        path = self._path(key)
+        os.replace(temp_path, path)
+        audio = np.load(path, mmap_mode='r')
+        self._remember(key, audio)
+        self.evict()
+        return audio
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for path in self.cache_dir.glob('*.npy'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if now - mtime <= self.max_age_seconds and total <= self.max_disk_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self._lock:
+                self._memory.pop(path.stem, None)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._digests.clear()
+        for path in self.cache_dir.glob('*.npy'):
+            path.unlink()
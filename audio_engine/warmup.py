@@ -0,0 +1,72 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence
+
+import numpy as np
+
+from .cnn_model import HAS_ONNXRUNTIME, configured_model_path, load_model
+from .gain_predictor import HAS_LIBROSA, CNNGainPredictor
+from .loudness import TruePeakLimiter, integrated_loudness
+from .resampling import SoxrResampler, get_resampler
+
+# Source rates whose polyphase filters are designed up front
+WARMUP_SOURCE_RATES = (48000, 22050, 88200, 96000)
+
+
+@contextmanager
+def _timed(timings: Dict[str, float], stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+
+def warm_up(
+    sample_rate: int = 44100,
+    resampler: str = 'polyphase',
+    resample_quality: str = 'high',
+    precision: str = 'float32',
+    source_rates: Sequence[int] = WARMUP_SOURCE_RATES,
+    cnn_model_path: Optional[str] = None
+) -> Dict[str, float]:
+    """
+    Pays one-off costs before the first request: lazy imports (scipy, soxr,
+    librosa), polyphase filter design for common source rates, the loudness
+    meter and limiter filters, librosa's numba JIT for the STFT/mel/MFCC
+    path, and the ONNX model session. Everything
+    warmed here is cached process-wide, so this runs once per worker.
+    Returns seconds per stage.
+    """
+    timings: Dict[str, float] = {}
+    dtype = np.dtype(precision)
+    rng = np.random.default_rng(0)
+    signal = rng.uniform(-0.1, 0.1, (sample_rate, 2)).astype(dtype)
+
+    with _timed(timings, 'resampler'):
+        backend = get_resampler(resampler, resample_quality)
+        for source_rate in source_rates:
+            if source_rate != sample_rate:
+                backend.resample(signal[:4096], source_rate, sample_rate)
+        stream_backend = backend if backend.supports_streaming else SoxrResampler(resample_quality)
+        stream = stream_backend.open_stream(source_rates[0], sample_rate, 2, dtype)
+        stream.resample_chunk(signal[:4096], last=True)
+
+    with _timed(timings, 'loudness'):
+        integrated_loudness(signal, sample_rate)
+        TruePeakLimiter(sample_rate).process(signal)
+
+    if HAS_LIBROSA:
+        with _timed(timings, 'features'):
+            # Calls the feature code directly so the throwaway signal stays out of the memo cache
+            predictor = CNNGainPredictor()
+            mono = predictor._to_mono(signal)
+            magnitude, mel_power = predictor._spectrogram(mono, sample_rate)
+            predictor._features_from_spectrogram(mono, sample_rate, magnitude, mel_power)
+
+    model_path = configured_model_path(cnn_model_path)
+    if model_path and HAS_ONNXRUNTIME:
+        with _timed(timings, 'model'):
+            load_model(model_path, warm_up=True)
+
+    return timings
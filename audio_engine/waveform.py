@@ -0,0 +1,142 @@
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import soundfile as sf
+
+# Finest zoom level, in samples per peak; each coarser level groups PEAK_LEVEL_FACTOR peaks
+PEAK_BASE_SAMPLES = 256
+PEAK_LEVEL_FACTOR = 4
+PEAK_LEVELS = 5  # 256, 1024, 4096, 16384, 65536 samples per peak
+
+PEAKS_SUFFIX = '.peaks.npz'
+
+# Read size for building peaks from a file; a multiple of PEAK_BASE_SAMPLES
+PEAK_BLOCK_FRAMES = 65536
+
+
+def peaks_path_for(audio_path: str) -> str:
+    return audio_path + PEAKS_SUFFIX
+
+
+def _reduce(mins: np.ndarray, maxs: np.ndarray, factor: int):
+    # Groups `factor` consecutive peaks; a trailing partial group is kept
+    n = len(mins)
+    pad = -n % factor
+    if pad:
+        mins = np.concatenate([mins, np.repeat(mins[-1:], pad, axis=0)])
+        maxs = np.concatenate([maxs, np.repeat(maxs[-1:], pad, axis=0)])
+    shape = (-1, factor) + mins.shape[1:]
+    return mins.reshape(shape).min(axis=1), maxs.reshape(shape).max(axis=1)
+
+
+class PeakBuilder:
+    """
+    Builds a min/max peak pyramid from audio blocks in one pass.
+
+    Only the finest level is accumulated while streaming (a few KB per minute of
+    audio); coarser levels are reduced from it in finish(). Blocks may have any
+    length: samples that do not fill a whole peak are carried to the next block.
+    """
+
+    def __init__(self, sample_rate: int, channels: int, base: int = PEAK_BASE_SAMPLES,
+                 levels: int = PEAK_LEVELS, factor: int = PEAK_LEVEL_FACTOR):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.base = base
+        self.levels = levels
+        self.factor = factor
+        self.frames = 0
+        self._mins: List[np.ndarray] = []
+        self._maxs: List[np.ndarray] = []
+        self._carry = np.zeros((0, channels), dtype=np.float32)
+
+    def update(self, block: np.ndarray):
+        if block.ndim == 1:
+            block = block[:, np.newaxis]
+        self.frames += len(block)
+        if len(self._carry):
+            block = np.concatenate([self._carry, block])
+
+        whole = len(block) - len(block) % self.base
+        if whole:
+            bins = block[:whole].reshape(-1, self.base, self.channels)
+            self._mins.append(bins.min(axis=1).astype(np.float32))
+            self._maxs.append(bins.max(axis=1).astype(np.float32))
+        self._carry = np.array(block[whole:], dtype=np.float32)
+
+    def finish(self) -> Dict[str, np.ndarray]:
+        mins, maxs = list(self._mins), list(self._maxs)
+        if len(self._carry):
+            mins.append(self._carry.min(axis=0, keepdims=True))
+            maxs.append(self._carry.max(axis=0, keepdims=True))
+
+        if mins:
+            level_min, level_max = np.concatenate(mins), np.concatenate(maxs)
+        else:
+            level_min = level_max = np.zeros((0, self.channels), dtype=np.float32)
+
+        pyramid = {
+            'sample_rate': np.array(self.sample_rate),
+            'frames': np.array(self.frames),
+        }
+        samples_per_peak = self.base
+        for level in range(self.levels):
+            if level:
+                if len(level_min) <= 1:
+                    break
+                level_min, level_max = _reduce(level_min, level_max, self.factor)
+                samples_per_peak *= self.factor
+            # Interleave min/max per channel like audiowaveform's 16-bit data
+            interleaved = np.empty((len(level_min), self.channels, 2), dtype=np.int16)
+            interleaved[:, :, 0] = np.round(np.clip(level_min, -1.0, 1.0) * 32767)
+            interleaved[:, :, 1] = np.round(np.clip(level_max, -1.0, 1.0) * 32767)
+            pyramid[f'level_{samples_per_peak}'] = interleaved
+        return pyramid
+
+    def save(self, peaks_path: str):
+        # Written under a temporary name so readers never see a partial file
+        temp_path = peaks_path + '.part'
+        with open(temp_path, 'wb') as f:
+            np.savez(f, **self.finish())
+        os.replace(temp_path, peaks_path)
+
+
+def build_peaks(audio_path: str, peaks_path: Optional[str] = None, block_frames: int = PEAK_BLOCK_FRAMES) -> str:
+    peaks_path = peaks_path or peaks_path_for(audio_path)
+    info = sf.info(audio_path)
+    builder = PeakBuilder(info.samplerate, info.channels)
+    for block in sf.blocks(audio_path, blocksize=block_frames, dtype='float32', always_2d=True):
+        builder.update(block)
+    builder.save(peaks_path)
+    return peaks_path
+
+
+def load_peaks(peaks_path: str, min_peaks: int = 0) -> Dict[str, Any]:
+    """
+    Picks the coarsest level with at least `min_peaks` peaks (e.g. the pixel width
+    being drawn), or the finest level if none is that detailed. The result follows
+    audiowaveform's JSON layout so WaveSurfer and similar players can consume it.
+    """
+    with np.load(peaks_path) as pyramid:
+        levels = sorted(int(name.split('_')[1]) for name in pyramid.files if name.startswith('level_'))
+        chosen = levels[0]
+        for samples_per_peak in levels:
+            if len(pyramid[f'level_{samples_per_peak}']) >= min_peaks:
+                chosen = samples_per_peak
+
+        data = pyramid[f'level_{chosen}']
+        sample_rate = int(pyramid['sample_rate'])
+        frames = int(pyramid['frames'])
+
+    return {
+        'version': 2,
+        'channels': int(data.shape[1]),
+        'sample_rate': sample_rate,
+        'samples_per_pixel': chosen,
+        'bits': 16,
+        'length': int(data.shape[0]),
+        'duration': frames / sample_rate if sample_rate else 0.0,
+        'levels': levels,
+        'data': data.reshape(-1).tolist(),
+    }
@@ -0,0 +1,264 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import soundfile as sf
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_ROOT))
+
+STAGES = ('load_audio', 'resample_audio', 'mix_stems', 'mix_stems_streaming', 'extract_features')
+
+
+def generate_stems(directory: Path, count: int, duration: float, channels: int,
+                   sample_rates: List[int], seed: int = 0) -> Dict[str, str]:
+    rng = np.random.default_rng(seed)
+    stems = {}
+
+    for i in range(count):
+        sr = sample_rates[i % len(sample_rates)]
+        t = np.arange(int(duration * sr)) / sr
+
+        tone = np.zeros_like(t)
+        for _ in range(3):
+            tone += rng.uniform(0.05, 0.2) * np.sin(2 * np.pi * rng.uniform(40, 4000) * t)
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(0.2, 2.0) * t)
+        noise = rng.normal(0, 0.02, len(t))
+
+        mono = (tone * envelope + noise).astype(np.float32)
+        audio = np.column_stack([mono] * channels) if channels > 1 else mono
+
+        path = directory / f"synthetic_{i:02d}_{sr}.wav"
+        sf.write(str(path), audio, sr)
+        stems[f"stem_{i:02d}"] = str(path)
+
+    return stems
+
+
+def _rss_kb() -> int:
+    if not HAS_RESOURCE:
+        return 0
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+def _run_stage(stage: str, stems: Dict[str, str], config: dict, output_dir: str) -> float:
+    from audio_engine.audio_mixer import StemMixer
+    from audio_engine.gain_predictor import GainPredictor
+
+    mixer = StemMixer(
+        sample_rate=config['target_sr'],
+        executor=config['executor'],
+        resampler=config['resampler'],
+        resample_quality=config['quality'],
+        precision=config['precision']
+    )
+
+    if stage == 'load_audio':
+        start = time.perf_counter()
+        for path in stems.values():
+            mixer.load_audio(path)
+        return time.perf_counter() - start
+
+    if stage == 'resample_audio':
+        loaded = [mixer.load_audio(path) for path in stems.values()]
+        start = time.perf_counter()
+        for audio, sr in loaded:
+            mixer.resample_audio(audio, sr, config['target_sr'])
+        return time.perf_counter() - start
+
+    if stage == 'mix_stems':
+        start = time.perf_counter()
+        mixer.mix_stems(stems)
+        return time.perf_counter() - start
+
+    if stage == 'mix_stems_streaming':
+        start = time.perf_counter()
+        mixer.mix_stems_streaming(stems, os.path.join(output_dir, 'bench_mix.wav'))
+        return time.perf_counter() - start
+
+    if stage == 'extract_features':
+        predictor = GainPredictor()
+        loaded, _ = mixer._load_stems(stems)
+        GainPredictor.clear_feature_cache()
+        start = time.perf_counter()
+        for audio in loaded.values():
+            predictor.extract_features(audio, config['target_sr'])
+        return time.perf_counter() - start
+
+    raise ValueError(f"Unknown stage '{stage}'")
+
+
+def _stage_worker(stage: str, stems: Dict[str, str], config: dict, output_dir: str, queue):
+    # Runs in a fresh process so peak RSS reflects this stage only
+    import contextlib
+    import io
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Warm-up run pays for imports, JIT and filter design outside the measurement
+        _run_stage(stage, stems, config, output_dir)
+        rss_before = _rss_kb()
+
+        durations = []
+        tracemalloc.start()
+        for _ in range(config['repeat']):
+            durations.append(_run_stage(stage, stems, config, output_dir))
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    queue.put({
+        'durations': durations,
+        'rss_before_kb': rss_before,
+        'peak_rss_kb': _rss_kb(),
+        'traced_peak_bytes': traced_peak,
+    })
+
+
+def run_benchmarks(stems: Dict[str, str], config: dict, stages: List[str]) -> Dict[str, dict]:
+    ctx = multiprocessing.get_context('spawn')
+    results = {}
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for stage in stages:
+            queue = ctx.Queue()
+            process = ctx.Process(target=_stage_worker, args=(stage, stems, config, output_dir, queue))
+            process.start()
+            measurement = queue.get()
+            process.join()
+
+            durations = measurement.pop('durations')
+            results[stage] = dict(
+                measurement,
+                median_s=statistics.median(durations),
+                min_s=min(durations),
+                max_s=max(durations),
+                runs=durations,
+            )
+            print(f"{stage:<22} median {results[stage]['median_s'] * 1000:9.1f} ms   "
+                  f"peak RSS {results[stage]['peak_rss_kb'] / 1024:8.1f} MiB   "
+                  f"traced {measurement['traced_peak_bytes'] / 2 ** 20:8.1f} MiB")
+
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=str(REPO_ROOT), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    print(f"\nComparison against {baseline['meta'].get('commit', 'unknown')[:12]} "
+          f"(regression threshold {threshold:.0%})")
+    regressed = False
+
+    for stage, result in current['results'].items():
+        base = baseline['results'].get(stage)
+        if base is None:
+            print(f"{stage:<22} (no baseline)")
+            continue
+
+        time_ratio = result['median_s'] / base['median_s'] if base['median_s'] else float('inf')
+        rss_ratio = result['peak_rss_kb'] / base['peak_rss_kb'] if base['peak_rss_kb'] else float('inf')
+        flag = ''
+        if time_ratio > 1 + threshold or rss_ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressed = True
+        print(f"{stage:<22} time x{time_ratio:5.2f}   peak RSS x{rss_ratio:5.2f}{flag}")
+
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the audio_engine hot paths")
+    parser.add_argument('--stems', type=int, default=8, help="number of synthetic stems")
+    parser.add_argument('--duration', type=float, default=30.0, help="synthetic stem length in seconds")
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--sample-rates', default='44100,48000,22050',
+                        help="comma-separated rates, cycled across synthetic stems")
+    parser.add_argument('--bundled', action='store_true', help="also include the bundled stems/*.wav")
+    parser.add_argument('--target-sr', type=int, default=44100)
+    parser.add_argument('--executor', default='serial')
+    parser.add_argument('--resampler', default='polyphase')
+    parser.add_argument('--quality', default='high')
+    parser.add_argument('--precision', default='float64')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--stages', default=','.join(STAGES))
+    parser.add_argument('--output', default='bench_results.json', help="where to write the JSON results")
+    parser.add_argument('--compare', help="baseline JSON from a previous run")
+    parser.add_argument('--threshold', type=float, default=0.10, help="relative slowdown counted as a regression")
+    args = parser.parse_args()
+
+    config = {
+        'stems': args.stems,
+        'duration': args.duration,
+        'channels': args.channels,
+        'sample_rates': [int(sr) for sr in args.sample_rates.split(',')],
+        'bundled': args.bundled,
+        'target_sr': args.target_sr,
+        'executor': args.executor,
+        'resampler': args.resampler,
+        'quality': args.quality,
+        'precision': args.precision,
+        'repeat': args.repeat,
+    }
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+
+    with tempfile.TemporaryDirectory() as stem_dir:
+        stems = generate_stems(Path(stem_dir), args.stems, args.duration, args.channels, config['sample_rates'])
+        if args.bundled:
+            for path in sorted((REPO_ROOT / 'stems').glob('*.wav')):
+                stems[path.stem] = str(path)
+
+        print(f"Benchmarking {len(stems)} stems ({args.duration:.0f}s synthetic, "
+              f"rates {config['sample_rates']}, {args.precision}, {args.resampler}/{args.quality})\n")
+        results = run_benchmarks(stems, config, stages)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'config': config,
+        },
+        'results': results,
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in a fresh interpreter: everything a new worker pays before and during its first mix
+ENGINE_PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {repo!r})
+from audio_engine.audio_mixer import StemMixer
+from audio_engine.warmup import warm_up
+result = {{'import_s': time.perf_counter() - start}}
+
+if {warm!r}:
+    t = time.perf_counter()
+    result['warmup'] = warm_up(cnn_model_path={model!r})
+    result['warmup_s'] = time.perf_counter() - t
+
+for attempt in ('first_mix_s', 'second_mix_s'):
+    t = time.perf_counter()
+    mixer = StemMixer(precision='float32', cnn_model_path={model!r})
+    mixer.mix_stems({stems!r}, auto_gain=True, use_cnn={use_cnn!r})
+    result[attempt] = time.perf_counter() - t
+
+result['time_to_first_mix_s'] = time.perf_counter() - start - result['second_mix_s']
+print('RESULT ' + json.dumps(result))
+"""
+
+
+def _write_stems(directory: Path) -> Dict[str, str]:
+    import numpy as np
+    import soundfile as sf
+
+    rng = np.random.default_rng(0)
+    stems = {}
+    # 48 kHz sources so the first mix has to design resampling filters
+    for name in ('drums', 'bass', 'vocals', 'synth'):
+        path = directory / f"{name}.wav"
+        sf.write(str(path), rng.uniform(-0.2, 0.2, (48000 * 10, 2)).astype(np.float32), 48000)
+        stems[name] = str(path)
+    return stems
+
+
+def bench_engine(stems: Dict[str, str], warm: bool, model: str, use_cnn: bool) -> dict:
+    code = ENGINE_PROBE.format(repo=str(REPO_ROOT), warm=warm, model=model, stems=stems, use_cnn=use_cnn)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    line = next(line for line in output.splitlines() if line.startswith('RESULT '))
+    return json.loads(line[len('RESULT '):])
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def bench_server(warm: bool, timeout: float = 120.0) -> dict:
+    # Time from spawning a uvicorn worker until it answers its first request
+    port = _free_port()
+    env = dict(os.environ, AURALIS_WARMUP='1' if warm else '0')
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'web_server.main:app', '--port', str(port)],
+        cwd=str(REPO_ROOT), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("uvicorn exited before serving a request (is the database reachable?)")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1):
+                    return {'time_to_first_request_s': time.perf_counter() - start}
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                time.sleep(0.05)
+        raise TimeoutError(f"No response within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start of the audio engine and API workers")
+    parser.add_argument('--server', action='store_true', help="also time uvicorn workers (needs the configured database)")
+    parser.add_argument('--cnn-model', default=None, help="ONNX model to load in CNN mode")
+    parser.add_argument('--output', default='cold_start.json')
+    args = parser.parse_args()
+
+    report = {'engine': {}, 'server': {}}
+    with tempfile.TemporaryDirectory() as stem_dir:
+        stems = _write_stems(Path(stem_dir))
+        for warm in (False, True):
+            label = 'warm' if warm else 'cold'
+            result = bench_engine(stems, warm, args.cnn_model, bool(args.cnn_model))
+            report['engine'][label] = result
+            print(f"engine {label:<5} import {result['import_s'] * 1000:7.0f} ms   "
+                  f"warm-up {result.get('warmup_s', 0.0) * 1000:7.0f} ms   "
+                  f"first mix {result['first_mix_s'] * 1000:7.0f} ms   "
+                  f"second mix {result['second_mix_s'] * 1000:7.0f} ms")
+
+    if args.server:
+        for warm in (False, True):
+            label = 'warm' if warm else 'cold'
+            report['server'][label] = bench_server(warm)
+            print(f"server {label:<5} time to first request "
+                  f"{report['server'][label]['time_to_first_request_s'] * 1000:7.0f} ms")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""
+Load test for the API: N concurrent simulated users each register, log in,
+upload stems, then mix and browse history in a loop. Reports p50/p95/p99
+latency and throughput per endpoint.
+
+By default it spawns a local uvicorn against a throwaway SQLite database (no
+MySQL needed); pass --url to load an already running server instead.
+
+    python benchmarks/load_test.py --users 16 --iterations 3
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+STEM_NAMES = ('drums', 'bass', 'vocals', 'synth')
+
+
+class Recorder:
+    # Thread-safe (endpoint -> [(seconds, status)]) collector
+    def __init__(self):
+        self.samples: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, endpoint: str, seconds: float, status: int):
+        with self._lock:
+            self.samples[endpoint].append((seconds, status))
+
+
+class Client:
+    def __init__(self, base_url: str, recorder: Recorder, timeout: float):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+        self.token: Optional[str] = None
+
+    def request(self, method: str, path: str, endpoint: str, body: Optional[bytes] = None,
+                content_type: Optional[str] = None) -> Tuple[int, Any]:
+        headers = {}
+        if content_type:
+            headers['Content-Type'] = content_type
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, payload = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, e.read()
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            # Status 0: refused, reset or timed out
+            status, payload = 0, b''
+        self.recorder.add(endpoint, time.perf_counter() - start, status)
+
+        try:
+            return status, json.loads(payload) if payload else None
+        except ValueError:
+            return status, None
+
+    def post_json(self, path: str, endpoint: str, data: dict) -> Tuple[int, Any]:
+        return self.request('POST', path, endpoint, json.dumps(data).encode(), 'application/json')
+
+    def upload(self, filename: str, content: bytes) -> Tuple[int, Any]:
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: audio/wav\r\n\r\n"
+        ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+        return self.request('POST', '/upload', 'POST /upload', body, f"multipart/form-data; boundary={boundary}")
+
+
+def _write_stems(directory: Path, seconds: float) -> Dict[str, bytes]:
+    import soundfile as sf
+
+    rng = np.random.default_rng(0)
+    stems = {}
+    for name in STEM_NAMES:
+        path = directory / f"{name}.wav"
+        sf.write(str(path), rng.uniform(-0.2, 0.2, (int(44100 * seconds), 2)).astype(np.float32), 44100,
+                 subtype='PCM_16')
+        stems[name] = path.read_bytes()
+    return stems
+
+
+def simulate_user(base_url: str, user_index: int, run_id: str, stems: Dict[str, bytes], iterations: int,
+                  replay_fraction: float, recorder: Recorder, start_barrier: threading.Barrier, timeout: float):
+    client = Client(base_url, recorder, timeout)
+    rng = random.Random(user_index)
+    username = f"load_{run_id}_{user_index}"
+    password = "load-test-password"
+    start_barrier.wait()
+
+    status, body = client.post_json('/register', 'POST /register',
+                                    {'username': username, 'email': f"{username}@example.com", 'password': password})
+    # Login separately so its bcrypt verify is measured even though register returned a token
+    status, body = client.post_json('/login', 'POST /login', {'username': username, 'password': password})
+    if status != 200:
+        return
+    client.token = body['access_token']
+
+    uploaded = {}
+    for name, content in stems.items():
+        status, body = client.upload(f"{username}_{name}.wav", content)
+        if status == 200:
+            uploaded[name] = body['filename']
+    if not uploaded:
+        return
+
+    previous = None
+    for _ in range(iterations):
+        if previous is not None and rng.random() < replay_fraction:
+            request = previous  # identical request: served by the result cache
+        else:
+            request = {
+                'stems': uploaded,
+                'gains': {name: round(rng.uniform(-6, 6), 1) for name in uploaded},
+                'pans': {name: round(rng.uniform(-1, 1), 2) for name in uploaded},
+            }
+        status, body = client.post_json('/mix', 'POST /mix', request)
+        previous = request
+
+        status, history = client.request('GET', '/history', 'GET /history')
+        if status == 200 and history:
+            client.request('GET', f"/history/{history[0]['id']}", 'GET /history/{id}')
+
+
+def summarize(recorder: Recorder, wall_seconds: float) -> Dict[str, Dict[str, Any]]:
+    report = {}
+    all_samples = [sample for samples in recorder.samples.values() for sample in samples]
+    for endpoint, samples in sorted(recorder.samples.items()) + [('ALL', all_samples)]:
+        if not samples:
+            continue
+        latencies = np.array([seconds for seconds, _ in samples]) * 1000
+        statuses = defaultdict(int)
+        for _, status in samples:
+            statuses[str(status)] += 1
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        report[endpoint] = {
+            'requests': len(samples),
+            'errors': sum(1 for _, status in samples if not 200 <= status < 300),
+            'statuses': dict(statuses),
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99),
+            'mean_ms': float(latencies.mean()),
+            'max_ms': float(latencies.max()),
+            'throughput_rps': len(samples) / wall_seconds,
+        }
+    return report
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(work_dir: Path, workers: int, warmup: bool, timeout: float = 120.0) -> Tuple[subprocess.Popen, str]:
+    # Runs from a scratch directory so uploads, outputs, cache and the SQLite file stay out of the repo
+    port = _free_port()
+    env = dict(
+        os.environ,
+        AURALIS_DATABASE_URL=f"sqlite:///{work_dir / 'load_test.db'}",
+        AURALIS_WARMUP='1' if warmup else '0',
+    )
+    log = open(work_dir / 'server.log', 'wb')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'web_server.main:app', '--app-dir', str(REPO_ROOT),
+         '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+        cwd=str(work_dir), env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited during startup; see {work_dir / 'server.log'}")
+        try:
+            with urllib.request.urlopen(base_url + '/', timeout=1):
+                return process, base_url
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.1)
+    process.terminate()
+    raise TimeoutError(f"Server did not answer within {timeout}s")
+
+
+def server_metrics(base_url: str, run_id: str, timeout: float) -> Optional[dict]:
+    # Stage timings and cache counters as seen by the server, from one of the load-test users
+    client = Client(base_url, Recorder(), timeout)
+    status, body = client.post_json('/login', 'login', {'username': f"load_{run_id}_0", 'password': "load-test-password"})
+    if status != 200:
+        return None
+    client.token = body['access_token']
+    status, body = client.request('GET', '/metrics', 'metrics')
+    return body if status == 200 else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the Auralis API")
+    parser.add_argument('--users', type=int, default=8, help="concurrent simulated users")
+    parser.add_argument('--iterations', type=int, default=3, help="mix + history rounds per user")
+    parser.add_argument('--stem-seconds', type=float, default=10.0, help="length of each uploaded stem")
+    parser.add_argument('--replay-fraction', type=float, default=0.0,
+                        help="share of mixes that repeat the user's previous request (result cache hits)")
+    parser.add_argument('--url', default=None, help="load this server instead of spawning one")
+    parser.add_argument('--server-workers', type=int, default=1, help="uvicorn worker processes when spawning")
+    parser.add_argument('--warmup', action='store_true', help="enable the startup warm-up in spawned workers")
+    parser.add_argument('--timeout', type=float, default=600.0, help="per-request timeout in seconds")
+    parser.add_argument('--output', default='load_test.json')
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4().hex[:6]
+    recorder = Recorder()
+    with tempfile.TemporaryDirectory() as scratch:
+        work_dir = Path(scratch)
+        stems = _write_stems(work_dir, args.stem_seconds)
+        process = None
+        base_url = args.url
+        if base_url is None:
+            process, base_url = start_server(work_dir, args.server_workers, args.warmup)
+        try:
+            barrier = threading.Barrier(args.users)
+            threads = [
+                threading.Thread(target=simulate_user, args=(
+                    base_url, i, run_id, stems, args.iterations, args.replay_fraction, recorder, barrier, args.timeout
+                ))
+                for i in range(args.users)
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            wall_seconds = time.perf_counter() - start
+            metrics = server_metrics(base_url, run_id, args.timeout)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    report = {
+        'config': {
+            'users': args.users, 'iterations': args.iterations, 'stem_seconds': args.stem_seconds,
+            'replay_fraction': args.replay_fraction, 'server_workers': args.server_workers,
+            'url': args.url, 'wall_seconds': wall_seconds,
+        },
+        'endpoints': summarize(recorder, wall_seconds),
+        'server_metrics': metrics,
+    }
+
+    print(f"{args.users} users x {args.iterations} iterations in {wall_seconds:.1f}s\n")
+    print(f"{'endpoint':<18} {'reqs':>5} {'errs':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>7}")
+    for endpoint, stats in report['endpoints'].items():
+        print(f"{endpoint:<18} {stats['requests']:>5} {stats['errors']:>5} {stats['p50_ms']:>9.1f} "
+              f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['throughput_rps']:>7.2f}")
+        failed = {status: count for status, count in stats['statuses'].items() if not status.startswith('2')}
+        if failed and endpoint != 'ALL':
+            print(f"{'':<18} non-2xx: {failed}")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import io
+import os
+import uuid
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+SAMPLE_RATE = 44100
+
+
+def write_stems(directory: Path, seconds: float = 1.0, channels: int = 2, names=('drums', 'bass'),
+                seed: int = 0) -> Dict[str, str]:
+    # Noise stems with different levels, written as float WAVs so reads are exact
+    rng = np.random.default_rng(seed)
+    stems = {}
+    for i, name in enumerate(names):
+        path = directory / f"{name}.wav"
+        audio = rng.uniform(-0.2, 0.2, (int(SAMPLE_RATE * seconds), channels)) * (1.0 - 0.2 * i)
+        sf.write(str(path), audio.astype(np.float32), SAMPLE_RATE, subtype='FLOAT')
+        stems[name] = str(path)
+    return stems
+
+
+def wav_bytes(seed: int, seconds: float = 1.0) -> bytes:
+    buffer = io.BytesIO()
+    audio = np.random.default_rng(seed).uniform(-0.3, 0.3, (int(SAMPLE_RATE * seconds), 2))
+    sf.write(buffer, audio, SAMPLE_RATE, format='WAV', subtype='PCM_16')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def stems(tmp_path) -> Dict[str, str]:
+    return write_stems(tmp_path)
+
+
+@pytest.fixture(scope='session')
+def server(tmp_path_factory):
+    """
+    The web_server.main module, imported once against a throwaway SQLite
+    database (foreign keys enforced, as on MySQL) from a scratch working
+    directory, since the app keeps its files relative to the current directory.
+    Warm-up and the background sweeper are off; tests call sweep() directly.
+    """
+    root = tmp_path_factory.mktemp('server')
+    previous = os.getcwd()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('AURALIS_DATABASE_URL', f"sqlite:///{root / 'auralis.db'}")
+        patch.setenv('AURALIS_WARMUP', '0')
+        patch.setenv('AURALIS_STORAGE_SWEEP_SECONDS', '0')
+        os.chdir(root)
+        try:
+            from sqlalchemy import event
+            from web_server import database
+
+            @event.listens_for(database.engine, "connect")
+            def _enforce_foreign_keys(dbapi_connection, connection_record):
+                dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+            from web_server import main
+            yield main
+        finally:
+            os.chdir(previous)
+
+
+@pytest.fixture(scope='session')
+def client(server):
+    from fastapi.testclient import TestClient
+
+    with TestClient(server.app) as client:
+        yield client
+
+
+@pytest.fixture
+def register(client):
+    # Registers a fresh user and returns its auth headers
+    def register() -> Dict[str, str]:
+        username = f"user_{uuid.uuid4().hex[:10]}"
+        response = client.post('/register', json={
+            'username': username, 'email': f"{username}@example.com", 'password': 'test-password'
+        })
+        assert response.status_code == 200, response.text
+        return {'Authorization': f"Bearer {response.json()['access_token']}"}
+    return register
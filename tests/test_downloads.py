@@ -0,0 +1,67 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from web_server.downloads import RangeNotSatisfiable, parse_range, ranged_file_response
+
+SIZE = 1000
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None),
+    ('bytes=0-99', (0, 99)),
+    ('bytes=500-', (500, SIZE - 1)),
+    ('bytes=-100', (SIZE - 100, SIZE - 1)),
+    ('bytes=-5000', (0, SIZE - 1)),
+    ('bytes=900-5000', (900, SIZE - 1)),
+    ('bytes=0-1,5-9', None),  # multi-range: whole body
+    ('items=0-9', None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize('header', ['bytes=1000-', 'bytes=500-400', 'bytes=-0'])
+def test_parse_range_not_satisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, SIZE)
+
+
+@pytest.fixture
+def file_client(tmp_path):
+    path = tmp_path / 'mix.wav'
+    path.write_bytes(bytes(range(256)) * 4)
+    app = FastAPI()
+
+    @app.get('/file')
+    def get_file(request: Request):
+        return ranged_file_response(path, request)
+
+    return TestClient(app), path.read_bytes()
+
+
+def test_range_request_returns_206(file_client):
+    client, content = file_client
+    response = client.get('/file', headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.content == content[10:20]
+    assert response.headers['content-range'] == f"bytes 10-19/{len(content)}"
+    assert response.headers['content-length'] == '10'
+
+
+def test_bad_range_returns_416(file_client):
+    client, content = file_client
+    response = client.get('/file', headers={'Range': f"bytes={len(content)}-"})
+    assert response.status_code == 416
+    assert response.headers['content-range'] == f"bytes */{len(content)}"
+
+
+def test_no_range_or_stale_if_range_returns_whole_file(file_client):
+    client, content = file_client
+    response = client.get('/file')
+    assert response.status_code == 200
+    assert response.content == content
+
+    response = client.get('/file', headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    assert response.status_code == 200
+    assert response.content == content
@@ -0,0 +1,29 @@
+import pytest
+
+from audio_engine.audio_mixer import StemMixer
+from audio_engine.cnn_model import BUNDLED_TEST_MODEL, HAS_ONNXRUNTIME
+from audio_engine.gain_predictor import HAS_LIBROSA
+from audio_engine.parallel import EXECUTOR_KINDS
+
+
+@pytest.mark.skipif(not (HAS_LIBROSA and HAS_ONNXRUNTIME), reason="CNN auto-gain needs librosa and onnxruntime")
+@pytest.mark.parametrize('executor', EXECUTOR_KINDS)
+def test_cnn_auto_gain_under_each_executor(stems, executor):
+    # The process executor pickles the predictor along with extract_mel_patches
+    mixer = StemMixer(cnn_model_path=BUNDLED_TEST_MODEL, executor=executor, max_workers=2)
+    mixed, gains = mixer.mix_stems(stems, auto_gain=True, use_cnn=True)
+
+    assert set(gains) == set(stems)
+    assert all(-6.0 <= gain <= 6.0 for gain in gains.values())
+    assert mixed.shape[1] == 2
+
+
+@pytest.mark.skipif(not (HAS_LIBROSA and HAS_ONNXRUNTIME), reason="CNN auto-gain needs librosa and onnxruntime")
+def test_cnn_gains_match_across_executors(stems):
+    results = [
+        StemMixer(cnn_model_path=BUNDLED_TEST_MODEL, executor=executor, max_workers=2)
+        .mix_stems(stems, auto_gain=True, use_cnn=True)[1]
+        for executor in EXECUTOR_KINDS
+    ]
+    for gains in results[1:]:
+        assert gains == pytest.approx(results[0], abs=1e-4)
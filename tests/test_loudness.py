@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from audio_engine.loudness import TruePeakLimiter, integrated_loudness
+
+SAMPLE_RATE = 48000
+
+
+def sine(frequency: float, level_db: float, seconds: float = 5.0, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return 10 ** (level_db / 20.0) * np.sin(2 * np.pi * frequency * t)
+
+
+def true_peak_db(audio: np.ndarray, oversample: int = 8) -> float:
+    # Independent reference: scipy's own polyphase interpolator at twice the limiter's rate
+    from scipy.signal import resample_poly
+
+    return float(20.0 * np.log10(np.abs(resample_poly(audio, oversample, 1, axis=0)).max()))
+
+
+def white_noise(seconds: float = 3.0, sample_rate: int = 44100, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(0.0, 0.5, (int(seconds * sample_rate), 2))
+
+
+def test_bs1770_reference_sine_mono():
+    # BS.1770-4: a 997 Hz sine at -20 dBFS in one channel reads -23.0 LUFS
+    assert integrated_loudness(sine(997.0, -20.0), SAMPLE_RATE) == pytest.approx(-23.0, abs=0.05)
+
+
+def test_bs1770_reference_sine_stereo():
+    # ... and in both channels of a stereo signal, 3 dB louder
+    tone = sine(997.0, -20.0)
+    assert integrated_loudness(np.stack([tone, tone], axis=1), SAMPLE_RATE) == pytest.approx(-20.0, abs=0.05)
+
+
+def test_loudness_is_independent_of_block_size():
+    audio = white_noise(seconds=2.0, sample_rate=SAMPLE_RATE) * 0.1
+    reference = integrated_loudness(audio, SAMPLE_RATE)
+    for block_size in (1000, 4800, 65536):
+        assert integrated_loudness(audio, SAMPLE_RATE, block_size) == pytest.approx(reference, abs=1e-9)
+
+
+@pytest.mark.parametrize('sample_rate', [44100, 48000])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_limiter_holds_full_band_noise_under_the_ceiling(sample_rate, seed):
+    limiter = TruePeakLimiter(sample_rate, ceiling_db=-1.0)
+    limited = limiter.process(white_noise(sample_rate=sample_rate, seed=seed))
+    assert true_peak_db(limited) <= -1.0
+    assert limiter.max_reduction_db > 0
+
+
+def test_limiter_leaves_quiet_material_untouched():
+    audio = sine(440.0, -12.0)[:, np.newaxis]
+    limiter = TruePeakLimiter(SAMPLE_RATE, ceiling_db=-1.0)
+    np.testing.assert_array_equal(limiter.process(audio), audio)
+    assert limiter.limited_frames == 0
+
+
+@pytest.mark.parametrize('block_size', [1000, 4096, 65536])
+def test_limiter_streaming_matches_whole_signal(block_size):
+    audio = white_noise(seconds=2.0)
+    whole = TruePeakLimiter(44100, input_gain=2.0).process(audio)
+
+    blocks = (audio[start:start + block_size] for start in range(0, len(audio), block_size))
+    streamed = np.concatenate(list(TruePeakLimiter(44100, input_gain=2.0).process_blocks(blocks)))
+
+    assert streamed.shape == whole.shape
+    np.testing.assert_allclose(streamed, whole, rtol=0, atol=1e-9)
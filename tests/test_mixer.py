@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+from audio_engine.audio_mixer import PRECISIONS, RemixSession, StemMixer
+
+from .conftest import write_stems
+
+GAINS = {'drums': -3.0, 'bass': 2.0, 'vocals': 0.0}
+PANS = {'drums': -0.5, 'bass': 0.25, 'vocals': 0.0}
+
+
+@pytest.fixture
+def uneven_stems(tmp_path):
+    # Different lengths exercise the zero-padded tail
+    stems = write_stems(tmp_path, seconds=1.0, names=('drums', 'bass'))
+    stems.update(write_stems(tmp_path, seconds=0.6, names=('vocals',), seed=1))
+    return stems
+
+
+@pytest.mark.parametrize('precision', PRECISIONS)
+def test_streaming_mix_matches_in_memory_mix(tmp_path, uneven_stems, precision):
+    mixer = StemMixer(precision=precision)
+    in_memory, _ = mixer.mix_stems(uneven_stems, GAINS, PANS, normalize_output=True)
+    assert in_memory.dtype == np.dtype(precision)
+
+    output_path = tmp_path / 'mix.wav'
+    StemMixer(precision=precision).mix_stems_streaming(
+        uneven_stems, str(output_path), GAINS, PANS, normalize_output=True, block_size=4096, output_format='wav24'
+    )
+    streamed, sample_rate = sf.read(str(output_path), dtype='float64')
+
+    assert sample_rate == 44100
+    assert streamed.shape == in_memory.shape
+    # 24-bit output: within one step of quantization (plus float32 rounding)
+    np.testing.assert_allclose(streamed, in_memory.astype(np.float64), rtol=0, atol=2.0 ** -22)
+
+
+@pytest.mark.parametrize('precision', PRECISIONS)
+def test_remix_session_matches_full_remix(uneven_stems, precision):
+    mixer = StemMixer(precision=precision)
+    session = RemixSession()
+    mixer.remix_incremental(session, uneven_stems, GAINS, PANS)
+
+    steps = [
+        ({'drums': -6.0}, {}),
+        ({'drums': -6.0, 'bass': -1.0}, {'vocals': 0.8}),
+        ({'drums': -6.0, 'bass': -1.0}, {'vocals': 0.8}),  # unchanged: nothing to recompute
+        ({}, {}),
+    ]
+    for gain_changes, pan_changes in steps:
+        gains, pans = dict(GAINS, **gain_changes), dict(PANS, **pan_changes)
+        incremental, _, info = mixer.remix_incremental(session, uneven_stems, gains, pans)
+        full, _ = StemMixer(precision=precision).mix_stems(uneven_stems, gains, pans)
+
+        assert not info['rebuilt']
+        assert incremental.dtype == full.dtype
+        tolerance = 1e-5 if precision == 'float32' else 1e-12
+        np.testing.assert_allclose(incremental, full, rtol=0, atol=tolerance)
+    assert info['changed_stems'] == ['drums', 'bass', 'vocals']
+
+
+def test_remix_session_only_recomputes_changed_stems(uneven_stems):
+    mixer = StemMixer()
+    session = RemixSession()
+    mixer.remix_incremental(session, uneven_stems, GAINS, PANS)
+
+    _, _, info = mixer.remix_incremental(session, uneven_stems, dict(GAINS, bass=-4.0), PANS)
+    assert info['changed_stems'] == ['bass']
+    _, _, info = mixer.remix_incremental(session, uneven_stems, dict(GAINS, bass=-4.0), PANS)
+    assert info['changed_stems'] == []
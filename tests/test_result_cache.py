@@ -0,0 +1,88 @@
+import os
+
+from .conftest import wav_bytes
+
+
+def output_path(server, response):
+    return server.OUTPUT_DIR / response['url'].split('/')[-1]
+
+
+def test_identical_mix_reuses_the_users_entry(client, register):
+    headers = register()
+    stem = client.post('/upload', files={'file': ('drums.wav', wav_bytes(10))}, headers=headers).json()['filename']
+    request = {'stems': {'drums': stem}, 'gains': {'drums': -2.0}, 'pans': {}}
+
+    first = client.post('/mix', json=request, headers=headers).json()
+    second = client.post('/mix', json=request, headers=headers).json()
+    assert first['cached'] is False
+    assert second['cached'] is True
+    assert (second['url'], second['history_id']) == (first['url'], first['history_id'])
+    assert client.post('/mix', json=dict(request, gains={'drums': -2.5}), headers=headers).json()['cached'] is False
+
+
+def test_render_is_released_with_its_last_history_entry(client, register, server):
+    from web_server import database, models
+
+    headers = register()
+    stem = client.post('/upload', files={'file': ('drums.wav', wav_bytes(13))}, headers=headers).json()['filename']
+    mix = client.post('/mix', json={'stems': {'drums': stem}, 'gains': {}, 'pans': {}}, headers=headers).json()
+    path = output_path(server, mix)
+
+    # A second entry on the same file, as cache hits shared renders before per-user aliases
+    db = database.SessionLocal()
+    try:
+        entry = db.get(models.MixHistory, mix['history_id'])
+        shared = models.MixHistory(user_id=entry.user_id, output_filename=entry.output_filename, logs='',
+                                   settings_summary=entry.settings_summary, size=entry.size)
+        db.add(shared)
+        db.commit()
+        shared_id = shared.id
+    finally:
+        db.close()
+
+    # The mix job row still references the first entry; deleting it must not trip the foreign key
+    response = client.delete(f"/history/{mix['history_id']}", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {'status': 'deleted', 'file_removed': False}
+    assert path.exists()
+
+    assert client.delete(f"/history/{shared_id}", headers=headers).json() == {'status': 'deleted', 'file_removed': True}
+    assert not path.exists()
+    assert not os.path.exists(f"{path}.peaks.npz")
+    assert client.delete(f"/history/{shared_id}", headers=headers).status_code == 404
+
+
+def test_cross_user_hit_gets_an_alias_without_the_other_users_logs(client, register, server):
+    owner, other = register(), register()
+    content = wav_bytes(11)
+    stems = [client.post('/upload', files={'file': ('bass.wav', content)}, headers=headers).json()['filename']
+             for headers in (owner, other)]
+    assert stems[0] == stems[1]
+    request = {'stems': {'bass': stems[0]}, 'gains': {'bass': 1.5}, 'pans': {}}
+
+    rendered = client.post('/mix', json=request, headers=owner).json()
+    aliased = client.post('/mix', json=request, headers=other).json()
+    assert aliased['cached'] is True
+    assert aliased['url'] != rendered['url']
+    assert rendered['url'].split('/')[-1] not in aliased['logs']
+    assert aliased['metrics'] is None
+
+    original, alias = output_path(server, rendered), output_path(server, aliased)
+    assert alias.read_bytes() == original.read_bytes()
+
+    # Each user's entry releases only its own file
+    response = client.delete(f"/history/{aliased['history_id']}", headers=other)
+    assert response.json()['file_removed'] is True
+    assert not alias.exists()
+    assert original.exists()
+    assert client.get(f"/download/{original.name}").status_code == 200
+
+
+def test_session_renders_do_not_share_cache_entries_with_streamed_mixes(client, register):
+    headers = register()
+    stem = client.post('/upload', files={'file': ('vocals.wav', wav_bytes(12))}, headers=headers).json()['filename']
+    request = {'stems': {'vocals': stem}, 'gains': {'vocals': -1.0}, 'pans': {}}
+
+    assert client.post('/mix', json=request, headers=headers).json()['cached'] is False
+    assert client.post('/mix', json=dict(request, session_id='s1'), headers=headers).json()['cached'] is False
+    assert client.post('/mix', json=dict(request, session_id='s2'), headers=headers).json()['cached'] is True
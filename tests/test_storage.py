@@ -0,0 +1,70 @@
+import os
+from datetime import datetime, timedelta
+
+from .conftest import wav_bytes
+
+
+def test_quota_rejects_uploads_and_mixes_past_the_limit(client, register, server, monkeypatch):
+    headers = register()
+    content = wav_bytes(20)
+    stem = client.post('/upload', files={'file': ('drums.wav', content)}, headers=headers).json()['filename']
+    usage = client.get('/storage', headers=headers).json()
+    assert usage['stems_bytes'] == len(content)
+
+    monkeypatch.setattr(server.STORAGE, 'quota_bytes', usage['used_bytes'] + 1000)
+    assert client.post('/upload', files={'file': ('bass.wav', wav_bytes(21))}, headers=headers).status_code == 413
+    assert client.post('/uploads', json={'filename': 'bass.wav', 'size': 10 ** 6}, headers=headers).status_code == 413
+    # Re-uploading a stem the user already owns costs nothing
+    assert client.post('/upload', files={'file': ('again.wav', content)}, headers=headers).status_code == 200
+
+    assert client.post('/mix', json={'stems': {'drums': stem}, 'gains': {}, 'pans': {}}, headers=headers).status_code == 200
+    # Now over the quota
+    response = client.post('/mix', json={'stems': {'drums': stem}, 'gains': {'drums': 1.0}, 'pans': {}}, headers=headers)
+    assert response.status_code == 413
+
+
+def test_shared_stem_file_is_removed_with_the_last_claim(client, register, server):
+    first, second = register(), register()
+    content = wav_bytes(22)
+    stem = client.post('/upload', files={'file': ('a.wav', content)}, headers=first).json()['filename']
+    client.post('/upload', files={'file': ('b.wav', content)}, headers=second)
+    path = server.UPLOAD_DIR / stem
+
+    assert client.delete(f"/stems/{stem}", headers=first).json()['file_removed'] is False
+    assert path.exists()
+    assert client.post('/mix', json={'stems': {'a': stem}, 'gains': {}, 'pans': {}}, headers=first).status_code == 404
+    assert client.delete(f"/stems/{stem}", headers=second).json()['file_removed'] is True
+    assert not path.exists()
+
+
+def test_sweep_evicts_stale_stems_and_abandoned_uploads(client, register, server, monkeypatch):
+    from web_server import database, models
+
+    headers = register()
+    stale = client.post('/upload', files={'file': ('old.wav', wav_bytes(23))}, headers=headers).json()['filename']
+    fresh = client.post('/upload', files={'file': ('new.wav', wav_bytes(24))}, headers=headers).json()['filename']
+    upload_id = client.post('/uploads', json={'filename': 'partial.wav'}, headers=headers).json()['upload_id']
+    client.put(f"/uploads/{upload_id}?offset=0", content=b'RIFF', headers=headers)
+
+    db = database.SessionLocal()
+    try:
+        db.query(models.StemFile).filter(models.StemFile.filename == stale).update(
+            {'last_accessed': datetime.utcnow() - timedelta(days=60)}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+    partial = server.UPLOADS.partial_dir / f"{upload_id}.part"
+    old = datetime.now().timestamp() - 2 * 86400
+    os.utime(partial, (old, old))
+
+    monkeypatch.setattr(server.STORAGE, 'transcode_after_seconds', 0)
+    stats = server.STORAGE.sweep()
+    assert stats['evicted_stems'] >= 1
+    assert stats['expired_partial_uploads'] >= 1
+
+    assert not (server.UPLOAD_DIR / stale).exists()
+    assert (server.UPLOAD_DIR / fresh).exists()
+    assert client.post('/mix', json={'stems': {'s': stale}, 'gains': {}, 'pans': {}}, headers=headers).status_code == 404
+    assert client.post('/mix', json={'stems': {'s': fresh}, 'gains': {}, 'pans': {}}, headers=headers).status_code == 200
+    assert client.get(f"/uploads/{upload_id}", headers=headers).json()['status'] == 'failed'
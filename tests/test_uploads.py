@@ -0,0 +1,96 @@
+import hashlib
+
+from .conftest import wav_bytes
+
+
+def start_upload(client, headers, content=None, **extra):
+    body = dict({'filename': 'stem.wav'}, **extra)
+    if content is not None:
+        body['size'] = len(content)
+    response = client.post('/uploads', json=body, headers=headers)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def test_chunked_upload_round_trip(client, register):
+    headers = register()
+    content = wav_bytes(1)
+    upload_id = start_upload(client, headers, content)['upload_id']
+
+    middle = len(content) // 2
+    assert client.put(f"/uploads/{upload_id}?offset=0", content=content[:middle], headers=headers).json()['offset'] == middle
+    assert client.put(f"/uploads/{upload_id}?offset={middle}", content=content[middle:], headers=headers).status_code == 200
+
+    response = client.post(f"/uploads/{upload_id}/finalize",
+                           json={'sha256': hashlib.sha256(content).hexdigest()}, headers=headers)
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result['status'] == 'complete'
+    assert result['stored_filename'] == f"{hashlib.sha256(content).hexdigest()}.wav"
+    assert result['frames'] == 44100
+
+
+def test_wrong_offset_returns_409_with_expected_offset(client, register):
+    headers = register()
+    content = wav_bytes(2)
+    upload_id = start_upload(client, headers, content)['upload_id']
+    client.put(f"/uploads/{upload_id}?offset=0", content=content[:1000], headers=headers)
+
+    response = client.put(f"/uploads/{upload_id}?offset=0", content=content[:1000], headers=headers)
+    assert response.status_code == 409
+    assert response.headers['upload-offset'] == '1000'
+    assert client.get(f"/uploads/{upload_id}", headers=headers).json()['offset'] == 1000
+
+
+def test_sha256_mismatch_is_rejected(client, register):
+    headers = register()
+    content = wav_bytes(3)
+    upload_id = start_upload(client, headers, content)['upload_id']
+    client.put(f"/uploads/{upload_id}?offset=0", content=content, headers=headers)
+
+    response = client.post(f"/uploads/{upload_id}/finalize", json={'sha256': '0' * 64}, headers=headers)
+    assert response.status_code == 400
+    assert 'sha256 mismatch' in response.json()['detail']
+    assert client.get(f"/uploads/{upload_id}", headers=headers).json()['status'] == 'open'
+
+
+def test_oversized_chunk_is_dropped_whole(client, register):
+    headers = register()
+    content = wav_bytes(4)
+    upload_id = start_upload(client, headers, content)['upload_id']
+
+    response = client.put(f"/uploads/{upload_id}?offset=0", content=content + b'extra', headers=headers)
+    assert response.status_code == 400
+    assert client.get(f"/uploads/{upload_id}", headers=headers).json()['offset'] == 0
+
+
+def test_digest_dedupe_requires_the_bytes_from_other_users(client, register):
+    owner, other = register(), register()
+    content = wav_bytes(5)
+    digest = hashlib.sha256(content).hexdigest()
+    stored = client.post('/upload', files={'file': ('drums.wav', content)}, headers=owner).json()['filename']
+    mix = {'stems': {'drums': stored}, 'gains': {}, 'pans': {}}
+
+    # Knowing the digest is not owning the stem
+    upload = start_upload(client, other, content, sha256=digest)
+    assert upload['status'] == 'open'
+    assert client.post('/mix', json=mix, headers=other).status_code == 404
+
+    client.put(f"/uploads/{upload['upload_id']}?offset=0", content=content, headers=other)
+    result = client.post(f"/uploads/{upload['upload_id']}/finalize", json={}, headers=other).json()
+    assert result['stored_filename'] == stored
+    assert result['deduplicated'] is True
+    assert client.post('/mix', json=mix, headers=other).status_code == 200
+
+    # The owner's own stem completes without sending anything
+    assert start_upload(client, owner, content, sha256=digest)['status'] == 'complete'
+
+
+def test_upload_without_declared_size_counts_against_quota(client, register, server, monkeypatch):
+    headers = register()
+    monkeypatch.setattr(server.STORAGE, 'quota_bytes', 50000)
+    upload_id = start_upload(client, headers)['upload_id']
+
+    response = client.put(f"/uploads/{upload_id}?offset=0", content=wav_bytes(6), headers=headers)
+    assert response.status_code == 413
+    assert client.get(f"/uploads/{upload_id}", headers=headers).json()['offset'] == 0
@@ -12,27 +12,31 @@ const History = () => {
     const { token, logout } = useContext(AuthContext);
     const [history, setHistory] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [logsById, setLogsById] = useState({});
     const [expandedLogs, setExpandedLogs] = useState({});
 
-    useEffect(() => {
-        const fetchHistory = async () => {
-            try {
-                const response = await fetch(`${API_URL}/history`, {
-                    headers: {
-                        'Authorization': `Bearer ${token}`
-                    }
-                });
-                if (response.ok) {
-                    const data = await response.json();
-                    setHistory(data);
+    const fetchHistory = async (cursor = null) => {
+        try {
+            const params = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+            const response = await fetch(`${API_URL}/history${params}`, {
+                headers: {
+                    'Authorization': `Bearer ${token}`
                 }
-            } catch (error) {
-                console.error("Failed to fetch history", error);
-            } finally {
-                setLoading(false);
+            });
+            if (response.ok) {
+                const data = await response.json();
+                setHistory(prev => cursor ? [...prev, ...data] : data);
+                setNextCursor(response.headers.get('X-Next-Cursor'));
             }
-        };
+        } catch (error) {
+            console.error("Failed to fetch history", error);
+        } finally {
+            setLoading(false);
+        }
+    };
 
+    useEffect(() => {
         if (token) {
             fetchHistory();
         }
@@ -60,7 +64,23 @@ const History = () => {
         }
     };
 
-    const toggleLogs = (id) => {
+    const toggleLogs = async (id) => {
+        // Logs are not part of the history listing; load them the first time they are opened
+        if (!expandedLogs[id] && logsById[id] === undefined) {
+            try {
+                const response = await fetch(`${API_URL}/history/${id}`, {
+                    headers: {
+                        'Authorization': `Bearer ${token}`
+                    }
+                });
+                if (response.ok) {
+                    const data = await response.json();
+                    setLogsById(prev => ({ ...prev, [id]: data.logs }));
+                }
+            } catch (error) {
+                console.error("Failed to fetch logs", error);
+            }
+        }
         setExpandedLogs(prev => ({
             ...prev,
             [id]: !prev[id]
@@ -120,7 +140,7 @@ const History = () => {
 
                             {expandedLogs[item.id] && (
                                 <div className="log-viewer">
-                                    {item.logs}
+                                    {logsById[item.id] ?? 'Loading logs...'}
                                 </div>
                             )}
 
@@ -129,6 +149,11 @@ const History = () => {
                             </div>
                         </div>
                     ))}
+                    {nextCursor && (
+                        <button className="btn secondary-btn" onClick={() => fetchHistory(nextCursor)}>
+                            Load more
+                        </button>
+                    )}
                 </div>
             )}
         </div>
@@ -1,10 +1,13 @@
+import os
+import threading
+import time
+from typing import Dict, NamedTuple, Tuple
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from hashlib import sha256
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
 from . import models, database
 
 # Secret key for JWT encoding/decoding. 
@@ -13,6 +16,10 @@ SECRET_KEY = "supersecretkey"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 4320 # 3 days
 
+# Resolved users are cached briefly per token subject so authenticated requests skip the users table
+USER_CACHE_TTL = float(os.environ.get("AURALIS_USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = 1024
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
@@ -33,7 +40,49 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+class CurrentUser(NamedTuple):
+    # Detached snapshot of the columns requests need; unlike an ORM instance it is
+    # safe to share across requests, threads and sessions
+    id: int
+    username: str
+    email: str
+
+_user_cache: Dict[str, Tuple[float, CurrentUser]] = {}
+_user_cache_lock = threading.Lock()
+
+def _load_user(username: str) -> CurrentUser:
+    """
+    The user for a token's subject, cached for USER_CACHE_TTL seconds. Nothing
+    invalidates entries early, so a renamed or deleted user (or a changed email)
+    is still served from the cache until the entry expires; only hits are
+    cached, so a freshly registered user is found at once. Anything that starts
+    changing user rows must drop the entry or accept that staleness window.
+    """
+    now = time.monotonic()
+    with _user_cache_lock:
+        cached = _user_cache.get(username)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+    db = database.SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.username == username).first()
+        snapshot = CurrentUser(id=user.id, username=user.username, email=user.email) if user else None
+    finally:
+        db.close()
+
+    if snapshot is not None and USER_CACHE_TTL > 0:
+        with _user_cache_lock:
+            if len(_user_cache) >= USER_CACHE_SIZE:
+                # Drop expired entries first, then the oldest if still full
+                for key in [key for key, (expires, _) in _user_cache.items() if expires <= now]:
+                    del _user_cache[key]
+                if len(_user_cache) >= USER_CACHE_SIZE:
+                    del _user_cache[next(iter(_user_cache))]
+            _user_cache[username] = (now + USER_CACHE_TTL, snapshot)
+    return snapshot
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -47,7 +96,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
         
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = _load_user(username)
     if user is None:
         raise credentials_exception
     return user
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -8,9 +9,45 @@ DB_PASSWORD = "1234"
 DB_HOST = "localhost"
 DB_NAME = "audio_processor_db"
 
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+# AURALIS_DATABASE_URL overrides the MySQL settings above, e.g. "sqlite:///./auralis.db"
+# as a local stand-in for development and load testing
+SQLALCHEMY_DATABASE_URL = os.environ.get("AURALIS_DATABASE_URL") or f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Pool sizing per worker process; pre_ping replaces connections the server has dropped
+# (e.g. MySQL wait_timeout) instead of failing the request that picks them up
+POOL_SIZE = int(os.environ.get("AURALIS_DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.environ.get("AURALIS_DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = int(os.environ.get("AURALIS_DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.environ.get("AURALIS_DB_POOL_RECYCLE", "1800"))
+
+# SQLite waits this long for another connection's write lock before raising "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("AURALIS_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+if IS_SQLITE:
+    # Request handlers and mix jobs share connections across threads
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        pool_pre_ping=True
+    )
+
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        # WAL lets readers proceed while one writer commits, which concurrent requests need
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+else:
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=True
+    )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -0,0 +1,180 @@
+import json
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+from . import database, models
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# runner(payload, user_id, username, progress_callback) -> JSON-serializable result
+JobRunner = Callable[[Dict[str, Any], int, str, Callable[[float], None]], Dict[str, Any]]
+
+
+def worker_id() -> str:
+    # Read per call: with a preloaded app, workers fork after this module is imported
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows; assume it is alive
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _worker_exited(worker: str) -> bool:
+    # Only processes on this host can be checked; jobs without a worker predate the column
+    if not worker:
+        return True
+    host, _, pid = worker.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    # This process has not run any job yet, so a job recorded under its own pid is from an earlier process
+    return int(pid) == os.getpid() or not _process_alive(int(pid))
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+class MixJobManager:
+    def __init__(self, runner: JobRunner, max_workers: int = 2, max_queued: int = 8,
+                 progress_step: float = 0.05):
+        self._runner = runner
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.progress_step = progress_step
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="auralis-mix")
+        self._futures: Dict[str, Future] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def active_count(self) -> int:
+        with self._lock:
+            return len(self._futures)
+
+    def submit(self, user_id: int, username: str, payload: Dict[str, Any]) -> Tuple[str, Future]:
+        with self._lock:
+            if len(self._futures) >= self.max_workers + self.max_queued:
+                raise QueueFull("Mix queue is full, try again shortly")
+
+            job_id = uuid.uuid4().hex
+            db = database.SessionLocal()
+            try:
+                db.add(models.MixJob(id=job_id, user_id=user_id, status=JOB_QUEUED,
+                                     progress=0.0, request=json.dumps(payload), worker=worker_id()))
+                db.commit()
+            finally:
+                db.close()
+
+            cancel_event = threading.Event()
+            future = self._executor.submit(self._run, job_id, user_id, username, payload, cancel_event)
+            self._futures[job_id] = future
+            self._cancel_events[job_id] = cancel_event
+
+        future.add_done_callback(lambda _: self._forget(job_id))
+        return job_id, future
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            future = self._futures.get(job_id)
+            cancel_event = self._cancel_events.get(job_id)
+        if future is None:
+            return False
+
+        cancel_event.set()
+        if future.cancel():
+            # Never started, so _run will not record the cancellation itself
+            self._update(job_id, status=JOB_CANCELLED)
+        return True
+
+    def recover_interrupted(self):
+        # Fails unfinished jobs whose process has exited. Other workers share the
+        # database, so jobs of live processes (or of other hosts) are left alone.
+        db = database.SessionLocal()
+        try:
+            unfinished = db.query(models.MixJob).filter(
+                models.MixJob.status.in_([JOB_QUEUED, JOB_RUNNING])
+            ).all()
+            for job in unfinished:
+                if not _worker_exited(job.worker):
+                    continue
+                job.status = JOB_FAILED
+                job.error = "Interrupted by server restart"
+            db.commit()
+        finally:
+            db.close()
+
+    def shutdown(self):
+        with self._lock:
+            cancel_events = list(self._cancel_events.values())
+        for cancel_event in cancel_events:
+            cancel_event.set()
+        self._executor.shutdown(wait=False)
+
+    def _forget(self, job_id: str):
+        with self._lock:
+            self._futures.pop(job_id, None)
+            self._cancel_events.pop(job_id, None)
+
+    def _update(self, job_id: str, **fields):
+        db = database.SessionLocal()
+        try:
+            job = db.query(models.MixJob).filter(models.MixJob.id == job_id).first()
+            if job is None:
+                return
+            for key, value in fields.items():
+                setattr(job, key, value)
+            db.commit()
+        finally:
+            db.close()
+
+    def _run(self, job_id: str, user_id: int, username: str, payload: Dict[str, Any],
+             cancel_event: threading.Event) -> Dict[str, Any]:
+        if cancel_event.is_set():
+            self._update(job_id, status=JOB_CANCELLED)
+            raise JobCancelled(job_id)
+
+        self._update(job_id, status=JOB_RUNNING)
+        last_reported = [0.0]
+
+        def progress(fraction: float):
+            if cancel_event.is_set():
+                raise JobCancelled(job_id)
+            if fraction - last_reported[0] >= self.progress_step:
+                last_reported[0] = fraction
+                self._update(job_id, progress=fraction)
+
+        try:
+            result = self._runner(payload, user_id, username, progress)
+        except JobCancelled:
+            self._update(job_id, status=JOB_CANCELLED)
+            raise
+        except Exception as e:
+            self._update(job_id, status=JOB_FAILED, error=str(e))
+            raise
+
+        self._update(job_id, status=JOB_DONE, progress=1.0, result=json.dumps(result),
+                     history_id=result.get("history_id"))
+        return result
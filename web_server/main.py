@@ -1,28 +1,61 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Depends
+import time
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-import shutil
 import os
 import sys
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Union
 import json
+import re
 from pydantic import BaseModel
 import uuid
 from datetime import datetime
+import asyncio
+import base64
 import io
-import contextlib
+import soundfile as sf
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError
+from contextlib import asynccontextmanager
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from audio_engine.audio_mixer import StemMixer
+from audio_engine.audio_mixer import StemMixer, RemixSession, OUTPUT_FORMATS, output_extension
+from audio_engine.stem_cache import StemCache
+from audio_engine.instrumentation import METRICS, recording
+from audio_engine.waveform import build_peaks, load_peaks, peaks_path_for
+from audio_engine.warmup import warm_up
+from audio_engine.cnn_model import configured_model_path
 
 from . import models, database, auth_router, auth
+from .jobs import MixJobManager, QueueFull, JobCancelled, JOB_QUEUED, FINISHED_STATES
+from .downloads import ranged_file_response, resolve_download
+from .uploads import ChunkedUploadManager, UploadNotFound, UploadConflict, InvalidUpload, UploadTooLarge, UPLOAD_COMPLETE
+from .result_cache import MixResultCache, cache_key, mix_settings
+from .storage import StorageManager, QuotaExceeded, StemNotFound
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm-up runs before the worker accepts traffic; the storage sweeper thread runs until shutdown
+    warm_up_worker()
+    STORAGE.start()
+    try:
+        yield
+    finally:
+        STORAGE.stop()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 models.Base.metadata.create_all(bind=database.engine)
+models.ensure_columns(database.engine)
+models.ensure_indexes(database.engine)
 
 app.include_router(auth_router.router)
 
@@ -32,13 +65,72 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Upload-Offset"],
 )
 
 UPLOAD_DIR = Path("temp_uploads")
 OUTPUT_DIR = Path("output")
+CACHE_DIR = Path("cache")
 UPLOAD_DIR.mkdir(exist_ok=True)
 OUTPUT_DIR.mkdir(exist_ok=True)
 
+# Decoded + resampled stems, keyed by content hash and sample rate, shared across /mix calls
+STEM_CACHE = StemCache(str(CACHE_DIR / "stems"))
+
+# Per-stem decode/resample/analysis fan-out: "serial", "thread" or "process"
+MIX_EXECUTOR = os.environ.get("AURALIS_MIX_EXECUTOR", "thread")
+MIX_MAX_WORKERS = int(os.environ.get("AURALIS_MIX_WORKERS", "0")) or None
+
+# Resampler backend ("polyphase", "soxr", "librosa") and quality ("fast", "medium", "high")
+RESAMPLER = os.environ.get("AURALIS_RESAMPLER", "polyphase")
+RESAMPLE_QUALITY = os.environ.get("AURALIS_RESAMPLE_QUALITY", "high")
+
+# Sample format used end to end inside the mixer ("float32" or "float64")
+MIX_PRECISION = os.environ.get("AURALIS_MIX_PRECISION", "float32")
+
+# Preview renders: low-rate stem proxies (cached like full-rate stems) and a bounded window
+PREVIEW_SAMPLE_RATES = (8000, 11025, 16000, 22050, 32000, 44100)
+PREVIEW_MAX_SECONDS = float(os.environ.get("AURALIS_PREVIEW_MAX_SECONDS", "30"))
+
+# Output buses per request (full mix, instrumental, a cappella, submixes); names become part of file names
+MAX_MIX_BUSES = int(os.environ.get("AURALIS_MAX_MIX_BUSES", "8"))
+BUS_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+
+# Accepted loudness targets (LUFS) and true-peak ceilings (dBTP)
+MIN_TARGET_LUFS = -40.0
+MIN_TRUE_PEAK_DB = -12.0
+
+# Incremental remix sessions kept in memory (each holds one un-normalized mix buffer), least recently used evicted
+REMIX_SESSIONS_MAX = int(os.environ.get("AURALIS_REMIX_SESSIONS", "4"))
+REMIX_SESSIONS: "OrderedDict[tuple, RemixSession]" = OrderedDict()
+REMIX_SESSIONS_LOCK = threading.Lock()
+
+# Identical mix requests (same stem content and settings) reuse the existing render and history entry
+RESULT_CACHE_ENABLED = os.environ.get("AURALIS_RESULT_CACHE", "1") == "1"
+RESULT_CACHE = MixResultCache(OUTPUT_DIR)
+
+# Resumable chunked uploads, stored content-addressed in UPLOAD_DIR; the upload hash seeds the stem cache
+UPLOADS = ChunkedUploadManager(
+    UPLOAD_DIR,
+    max_chunk_bytes=int(os.environ.get("AURALIS_UPLOAD_CHUNK_BYTES", str(64 * 1024 * 1024))),
+    on_stored=STEM_CACHE.remember_digest
+)
+
+# Per-user stem ownership and quotas (stems + mixes, 0 = unlimited); the sweeper evicts stems unused for the
+# TTL, abandoned partial uploads, and re-encodes WAV mixes not downloaded for a while as FLAC (0 disables a rule)
+STORAGE = StorageManager(
+    UPLOAD_DIR,
+    OUTPUT_DIR,
+    UPLOADS,
+    RESULT_CACHE,
+    quota_bytes=int(os.environ.get("AURALIS_STORAGE_QUOTA_BYTES", str(2 * 1024 ** 3))),
+    stem_ttl_seconds=float(os.environ.get("AURALIS_STEM_TTL_SECONDS", str(30 * 24 * 3600))),
+    partial_ttl_seconds=float(os.environ.get("AURALIS_PARTIAL_UPLOAD_TTL_SECONDS", str(24 * 3600))),
+    transcode_after_seconds=float(os.environ.get("AURALIS_TRANSCODE_AFTER_SECONDS", str(7 * 24 * 3600))),
+    sweep_interval_seconds=float(os.environ.get("AURALIS_STORAGE_SWEEP_SECONDS", "3600")),
+    on_stored=STEM_CACHE.remember_digest
+)
+
 app.mount("/static", StaticFiles(directory="temp_uploads"), name="static")
 app.mount("/output", StaticFiles(directory="output"), name="output")
 
@@ -48,105 +140,624 @@ class MixRequest(BaseModel):
     pans: Dict[str, float]
     auto_gain: bool = False
     use_cnn: bool = False
+    output_format: str = "wav16" # wav16, wav24, flac, flac24
+    session_id: Optional[str] = None # reuse the previous mix of this session and recompute only changed stems
+    target_lufs: Optional[float] = None # loudness-normalize to this integrated LUFS instead of peak-normalizing
+    true_peak_db: float = -1.0 # limiter ceiling in dBTP when target_lufs is set
+    buses: Optional[Dict[str, Union[List[str], Dict[str, float]]]] = None # bus -> stem names, or stem -> send dB; one output file per bus
+
+class PreviewRequest(BaseModel):
+    stems: Dict[str, str]
+    gains: Dict[str, float] = {}
+    pans: Dict[str, float] = {}
+    start: float = 0.0 # seconds
+    duration: float = 10.0
+    sample_rate: int = 22050
+    mono: bool = False
+
+class UploadInit(BaseModel):
+    filename: str
+    size: Optional[int] = None
+    sha256: Optional[str] = None
 
-class MixLog(BaseModel):
+class UploadFinalize(BaseModel):
+    sha256: Optional[str] = None
+
+class MixJobStatus(BaseModel):
+    id: str
+    status: str
+    progress: float
+    error: Optional[str] = None
+    result: Optional[dict] = None
+    created_at: datetime
+    updated_at: datetime
+
+class MixSummary(BaseModel):
     id: int
     timestamp: datetime
-    logs: str
     output_url: str
     settings_summary: str
 
+class MixLog(MixSummary):
+    logs: str
+    metrics: Optional[dict] = None
+
+HISTORY_PAGE_MAX = 100
+
+# Directories whose audio has waveform peaks, as addressed by /peaks/{source}/{filename}
+PEAK_SOURCES = {"stems": UPLOAD_DIR, "mixes": OUTPUT_DIR}
+
+def _build_peaks_quietly(audio_path: str):
+    # Background task: a file soundfile cannot read simply gets no peaks
+    try:
+        build_peaks(audio_path)
+    except Exception as e:
+        print(f"Peak generation failed for {audio_path}: {e}")
+
+def _quota_error(error: QuotaExceeded) -> HTTPException:
+    return HTTPException(status_code=413, detail=str(error))
+
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...), current_user: models.User = Depends(auth.get_current_user)):
+async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...), current_user: auth.CurrentUser = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
+    # Stored under the content hash, so two users' "drums.wav" never overwrite each other
     try:
-        file_path = UPLOAD_DIR / file.filename
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        return {"filename": file.filename, "url": f"/static/{file.filename}"}
+        stem = await run_in_threadpool(STORAGE.store_upload, db, current_user.id, file.file, file.filename)
+    except QuotaExceeded as e:
+        raise _quota_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    file_path = UPLOAD_DIR / stem.filename
+    if not os.path.exists(peaks_path_for(str(file_path))):
+        background_tasks.add_task(_build_peaks_quietly, str(file_path))
+    return {"filename": stem.filename, "original_filename": stem.original_filename, "size": stem.size, "url": f"/static/{stem.filename}", "peaks_url": f"/peaks/stems/{stem.filename}"}
 
-@app.post("/mix")
-async def mix_audio(request: MixRequest, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
-    try:
-        mixer = StemMixer(sample_rate=44100)
-        
-        stems_paths = {}
-        for name, filename in request.stems.items():
-            path = UPLOAD_DIR / filename
-            if not path.exists():
-                raise HTTPException(status_code=404, detail=f"Stem {name} not found")
-            stems_paths[name] = str(path)
-            
-        log_capture = io.StringIO()
-        with contextlib.redirect_stdout(log_capture):
-            mixed_audio, used_gains = mixer.mix_stems(
-                stems=stems_paths,
-                gains=request.gains,
-                pans=request.pans,
-                normalize_output=True,
-                auto_gain=request.auto_gain,
-                use_cnn=request.use_cnn
-            )
-        
-        logs = log_capture.getvalue()
-        
-        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        output_filename = f"mix_{current_user.username}_{timestamp_str}_{unique_id}.wav"
-        output_path = OUTPUT_DIR / output_filename
-        
-        mixer.save_audio(mixed_audio, str(output_path))
-        
-        summary = f"{len(request.stems)} stems. Auto-Gain: {'On' if request.auto_gain else 'Off'}. CNN: {'On' if request.use_cnn else 'Off'}."
-        
+@app.get("/storage")
+async def get_storage(current_user: auth.CurrentUser = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
+    return STORAGE.usage(db, current_user.id)
+
+@app.delete("/stems/{filename}")
+async def delete_stem(filename: str, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
+    # The stored file is shared by every user who uploaded the same content; it is removed with the last one
+    try:
+        file_removed = STORAGE.release_stem(db, current_user.id, filename)
+    except StemNotFound:
+        raise HTTPException(status_code=404, detail="Stem not found")
+    return {"status": "deleted", "file_removed": file_removed}
+
+def _upload_error(error: Exception) -> HTTPException:
+    if isinstance(error, UploadNotFound):
+        return HTTPException(status_code=404, detail="Upload not found")
+    if isinstance(error, UploadConflict):
+        return HTTPException(status_code=409, detail=str(error), headers={"Upload-Offset": str(error.offset)})
+    if isinstance(error, UploadTooLarge):
+        return HTTPException(status_code=413, detail=str(error))
+    return HTTPException(status_code=400, detail=str(error))
+
+UPLOAD_ERRORS = (UploadNotFound, UploadConflict, InvalidUpload)
+
+@app.post("/uploads", status_code=201)
+def init_upload(request: UploadInit, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
+    try:
+        STORAGE.check_quota(db, current_user.id, request.size or 0)
+    except QuotaExceeded as e:
+        raise _quota_error(e)
+    # Knowing a digest (public through /static) is not owning the stem: only the user's own stems skip the bytes
+    result = UPLOADS.create(db, current_user.id, request.filename, request.size, request.sha256,
+                            may_skip=lambda stored: STORAGE.owns(db, current_user.id, stored))
+    if result["status"] == UPLOAD_COMPLETE:
+        try:
+            STORAGE.register(db, current_user.id, result["stored_filename"], result["filename"])
+        except StemNotFound:
+            raise HTTPException(status_code=404, detail="Stem not found")
+    return result
+
+@app.get("/uploads/{upload_id}")
+def get_upload(upload_id: str, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
+    try:
+        return UPLOADS.status(db, upload_id, current_user.id)
+    except UPLOAD_ERRORS as e:
+        raise _upload_error(e)
+
+@app.put("/uploads/{upload_id}")
+async def append_upload_chunk(upload_id: str, offset: int, request: Request, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
+    # The raw request body is the chunk; it is streamed to disk without buffering it whole.
+    # Bytes count against the quota as they arrive, even when the client declared no size.
+    try:
+        max_size = await run_in_threadpool(STORAGE.remaining, db, current_user.id)
+        return await UPLOADS.append(db, upload_id, current_user.id, offset, request.stream(), max_size)
+    except UPLOAD_ERRORS as e:
+        raise _upload_error(e)
+
+@app.post("/uploads/{upload_id}/finalize")
+def finalize_upload(upload_id: str, request: UploadFinalize, background_tasks: BackgroundTasks, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
+    def store(source: Path, stored: str, original: str, digest: str) -> bool:
+        # Placing the file and claiming it is one step under the storage lock, so the sweeper cannot
+        # delete deduplicated content between the existence check and the claim
+        return STORAGE.store_file(db, current_user.id, source, stored, original, digest)[1]
+    
+    try:
+        status = UPLOADS.status(db, upload_id, current_user.id)
+        STORAGE.check_quota(db, current_user.id, status["offset"])
+        result = UPLOADS.finalize(db, upload_id, current_user.id, request.sha256, store=store)
+        if status["status"] == UPLOAD_COMPLETE:
+            # A repeated finalize: refresh the claim
+            STORAGE.register(db, current_user.id, result["stored_filename"], result["filename"])
+    except UPLOAD_ERRORS as e:
+        raise _upload_error(e)
+    except QuotaExceeded as e:
+        raise _quota_error(e)
+    except StemNotFound:
+        raise HTTPException(status_code=404, detail="Stem not found")
+    
+    # Deduplicated content already has its peaks
+    stored_path = UPLOAD_DIR / result["stored_filename"]
+    if not os.path.exists(peaks_path_for(str(stored_path))):
+        background_tasks.add_task(_build_peaks_quietly, str(stored_path))
+    result["peaks_url"] = f"/peaks/stems/{result['stored_filename']}"
+    return result
+
+def _resolve_stems(stems: Dict[str, str], user_id: int) -> Dict[str, str]:
+    # Only the user's own stems resolve; using them also marks them as recently used
+    db = database.SessionLocal()
+    try:
+        return STORAGE.resolve_stems(db, user_id, stems)
+    except StemNotFound as e:
+        raise HTTPException(status_code=404, detail=f"Stem {e} not found")
+    finally:
+        db.close()
+
+def _remix_session(user_id: int, session_id: str) -> RemixSession:
+    key = (user_id, session_id)
+    with REMIX_SESSIONS_LOCK:
+        session = REMIX_SESSIONS.get(key)
+        if session is None:
+            session = RemixSession()
+            REMIX_SESSIONS[key] = session
+        REMIX_SESSIONS.move_to_end(key)
+        while len(REMIX_SESSIONS) > REMIX_SESSIONS_MAX:
+            REMIX_SESSIONS.popitem(last=False)
+    return session
+
+def _save_history(user_id: int, output_filename: str, logs: str, summary: str, metrics: dict, cache_key: str, result: dict) -> int:
+    db = database.SessionLocal()
+    try:
         history_entry = models.MixHistory(
-            user_id=current_user.id,
+            user_id=user_id,
             output_filename=output_filename,
             logs=logs,
-            settings_summary=summary
+            settings_summary=summary,
+            metrics=json.dumps(metrics),
+            cache_key=cache_key,
+            result=json.dumps(result),
+            size=os.path.getsize(OUTPUT_DIR / output_filename)
         )
         db.add(history_entry)
         db.commit()
         db.refresh(history_entry)
-        
-        return {"url": f"/output/{output_filename}", "logs": logs, "gains": used_gains, "history_id": history_entry.id}
-        
+        return history_entry.id
+    finally:
+        db.close()
+
+def _cache_keys(request: MixRequest, stems_paths: Dict[str, str]) -> List[str]:
+    # One key per output file: the mix, or each bus; stems are identified by content digest
+    engine = {"sample_rate": 44100, "precision": MIX_PRECISION, "resampler": RESAMPLER, "resample_quality": RESAMPLE_QUALITY}
+    model_path = configured_model_path()
+    if request.auto_gain and request.use_cnn and model_path and os.path.exists(model_path):
+        engine["cnn_model"] = STEM_CACHE.file_digest(model_path)
+    digests = {name: STEM_CACHE.file_digest(path) for name, path in stems_paths.items()}
+    settings = mix_settings(request.dict(), digests, engine)
+    if request.buses:
+        return [cache_key(settings, bus) for bus in request.buses]
+    return [cache_key(settings)]
+
+def _cached_mix(request: MixRequest, keys: List[str], user_id: int, username: str) -> Optional[dict]:
+    db = database.SessionLocal()
+    try:
+        entries = RESULT_CACHE.lookup(db, user_id, username, keys)
+        if entries is None:
+            return None
+        outputs = []
+        for entry in entries:
+            STORAGE.touch_mix(entry.output_filename)
+            result = json.loads(entry.result) if entry.result else {}
+            outputs.append({
+                "url": f"/download/{entry.output_filename}",
+                "peaks_url": f"/peaks/mixes/{entry.output_filename}",
+                "history_id": entry.id,
+                "loudness": result.get("loudness"),
+                "gains": result.get("gains", {}),
+                "logs": entry.logs,
+                "metrics": json.loads(entry.metrics) if entry.metrics else None,
+            })
+    finally:
+        db.close()
+    
+    first = outputs[0]
+    response = {"url": first["url"], "logs": first["logs"], "gains": first["gains"], "timings": {}, "metrics": first["metrics"], "peaks_url": first["peaks_url"], "history_id": first["history_id"], "loudness": first["loudness"], "cached": True}
+    if request.buses:
+        response["loudness"] = None
+        response["buses"] = {
+            bus: {key: output[key] for key in ("url", "peaks_url", "history_id", "loudness")}
+            for bus, output in zip(request.buses, outputs)
+        }
+    return response
+
+def run_bus_mix(request: MixRequest, mixer: StemMixer, stems_paths: Dict[str, str], keys: List[str], user_id: int, username: str) -> dict:
+    # One pass over the stems renders every bus; each bus is saved as its own history entry
+    timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    unique_id = str(uuid.uuid4())[:8]
+    extension = output_extension(request.output_format)
+    output_filenames = {bus: f"mix_{username}_{timestamp_str}_{unique_id}_{bus}{extension}" for bus in request.buses}
+    output_paths = {bus: str(OUTPUT_DIR / filename) for bus, filename in output_filenames.items()}
+    peaks_paths = {bus: peaks_path_for(path) for bus, path in output_paths.items()}
+    
+    try:
+        with recording() as recorder:
+            used_gains, results = mixer.mix_buses_streaming(
+                stems=stems_paths,
+                buses=request.buses,
+                output_paths=output_paths,
+                gains=request.gains,
+                pans=request.pans,
+                normalize_output=True,
+                output_format=request.output_format,
+                peaks_paths=peaks_paths,
+                target_lufs=request.target_lufs,
+                true_peak_db=request.true_peak_db
+            )
+    except BaseException:
+        for path in list(output_paths.values()) + list(peaks_paths.values()):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    
+    logs = recorder.logs
+    metrics = recorder.summary()
+    METRICS.observe(metrics, label="buses")
+    
+    buses = {}
+    for (bus, filename), key in zip(output_filenames.items(), keys):
+        summary = f"Bus '{bus}': {len(request.buses[bus])} of {len(request.stems)} stems."
+        if request.target_lufs is not None:
+            summary += f" Target: {request.target_lufs:g} LUFS."
+        buses[bus] = {
+            "url": f"/download/{filename}",
+            "peaks_url": f"/peaks/mixes/{filename}",
+            "history_id": _save_history(user_id, filename, logs, summary, metrics, key, {"gains": used_gains, "loudness": results[bus]["loudness"]}),
+            "loudness": results[bus]["loudness"],
+        }
+    
+    first = buses[next(iter(buses))]
+    return {"url": first["url"], "logs": logs, "gains": used_gains, "timings": mixer.last_timings, "metrics": metrics, "peaks_url": first["peaks_url"], "history_id": first["history_id"], "loudness": None, "cached": False, "buses": buses}
+
+def run_mix(payload: dict, user_id: int, username: str, progress: Callable[[float], None]) -> dict:
+    request = MixRequest(**payload)
+    stems_paths = _resolve_stems(request.stems, user_id)
+    
+    keys = _cache_keys(request, stems_paths)
+    if RESULT_CACHE_ENABLED:
+        cached = _cached_mix(request, keys, user_id, username)
+        if cached is not None:
+            return cached
+    
+    mixer = StemMixer(
+        sample_rate=44100,
+        stem_cache=STEM_CACHE,
+        executor=MIX_EXECUTOR,
+        max_workers=MIX_MAX_WORKERS,
+        progress_callback=progress,
+        resampler=RESAMPLER,
+        resample_quality=RESAMPLE_QUALITY,
+        precision=MIX_PRECISION
+    )
+    if request.buses:
+        return run_bus_mix(request, mixer, stems_paths, keys, user_id, username)
+    
+    timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    unique_id = str(uuid.uuid4())[:8]
+    output_filename = f"mix_{username}_{timestamp_str}_{unique_id}{output_extension(request.output_format)}"
+    output_path = OUTPUT_DIR / output_filename
+    peaks_path = Path(peaks_path_for(str(output_path)))
+    
+    try:
+        with recording() as recorder:
+            if request.session_id and not request.auto_gain:
+                session = _remix_session(user_id, request.session_id)
+                with session.lock:
+                    mixed_audio, used_gains, _ = mixer.remix_incremental(
+                        session,
+                        stems=stems_paths,
+                        gains=request.gains,
+                        pans=request.pans,
+                        normalize_output=True,
+                        target_lufs=request.target_lufs,
+                        true_peak_db=request.true_peak_db
+                    )
+                mixer.save_audio(mixed_audio, str(output_path), request.output_format, str(peaks_path))
+            elif request.auto_gain:
+                mixed_audio, used_gains = mixer.mix_stems(
+                    stems=stems_paths,
+                    gains=request.gains,
+                    pans=request.pans,
+                    normalize_output=True,
+                    auto_gain=request.auto_gain,
+                    use_cnn=request.use_cnn,
+                    target_lufs=request.target_lufs,
+                    true_peak_db=request.true_peak_db
+                )
+                mixer.save_audio(mixed_audio, str(output_path), request.output_format, str(peaks_path))
+            else:
+                used_gains, _ = mixer.mix_stems_streaming(
+                    stems=stems_paths,
+                    output_path=str(output_path),
+                    gains=request.gains,
+                    pans=request.pans,
+                    normalize_output=True,
+                    output_format=request.output_format,
+                    peaks_path=str(peaks_path),
+                    target_lufs=request.target_lufs,
+                    true_peak_db=request.true_peak_db
+                )
+    except BaseException:
+        for path in (output_path, peaks_path):
+            if path.exists():
+                path.unlink()
+        raise
+    
+    logs = recorder.logs
+    metrics = recorder.summary()
+    METRICS.observe(metrics, label="auto_gain" if request.auto_gain else "stream")
+    
+    summary = f"{len(request.stems)} stems. Auto-Gain: {'On' if request.auto_gain else 'Off'}. CNN: {'On' if request.use_cnn else 'Off'}."
+    if request.target_lufs is not None:
+        summary += f" Target: {request.target_lufs:g} LUFS."
+    
+    history_id = _save_history(user_id, output_filename, logs, summary, metrics, keys[0], {"gains": used_gains, "loudness": mixer.last_loudness})
+    
+    return {"url": f"/download/{output_filename}", "logs": logs, "gains": used_gains, "timings": mixer.last_timings, "metrics": metrics, "peaks_url": f"/peaks/mixes/{output_filename}", "history_id": history_id, "loudness": mixer.last_loudness, "cached": False}
+
+# Mixes run on a bounded worker pool so the event loop stays free for uploads, history and auth
+MIX_JOBS = MixJobManager(
+    run_mix,
+    max_workers=int(os.environ.get("AURALIS_MIX_JOB_WORKERS", "2")),
+    max_queued=int(os.environ.get("AURALIS_MIX_QUEUE_SIZE", "8"))
+)
+MIX_JOBS.recover_interrupted()
+
+# Pay lazy-import, filter-design, JIT and model-load costs before this worker accepts traffic
+WARMUP_ON_STARTUP = os.environ.get("AURALIS_WARMUP", "1") == "1"
+STARTUP: Dict[str, object] = {}
+
+def warm_up_worker():
+    if WARMUP_ON_STARTUP:
+        timings = warm_up(
+            sample_rate=44100,
+            resampler=RESAMPLER,
+            resample_quality=RESAMPLE_QUALITY,
+            precision=MIX_PRECISION
+        )
+        STARTUP["warmup"] = timings
+        print("Warm-up: " + ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in timings.items()))
+    STARTUP["ready_seconds"] = time.perf_counter() - IMPORT_STARTED
+
+def _validate_buses(request: MixRequest):
+    if not 0 < len(request.buses) <= MAX_MIX_BUSES:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {MAX_MIX_BUSES} buses are allowed")
+    if request.auto_gain or request.session_id:
+        raise HTTPException(status_code=400, detail="Buses cannot be combined with auto_gain or session_id")
+    for bus, spec in request.buses.items():
+        if not BUS_NAME_PATTERN.match(bus):
+            raise HTTPException(status_code=400, detail=f"Invalid bus name '{bus}'")
+        unknown = sorted(set(spec) - set(request.stems))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Bus '{bus}' references unknown stems: {unknown}")
+
+def _submit_mix(request: MixRequest, current_user: auth.CurrentUser):
+    # Validates, checks stem ownership and quota, and inserts the job row: blocking DB work, so the
+    # async handlers run it in the threadpool
+    if request.output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown output format '{request.output_format}'")
+    if request.target_lufs is not None and not (MIN_TARGET_LUFS <= request.target_lufs <= 0.0):
+        raise HTTPException(status_code=400, detail=f"target_lufs must be between {MIN_TARGET_LUFS:g} and 0")
+    if not (MIN_TRUE_PEAK_DB <= request.true_peak_db <= 0.0):
+        raise HTTPException(status_code=400, detail=f"true_peak_db must be between {MIN_TRUE_PEAK_DB:g} and 0")
+    if request.buses is not None:
+        _validate_buses(request)
+    _resolve_stems(request.stems, current_user.id)
+    db = database.SessionLocal()
+    try:
+        STORAGE.check_quota(db, current_user.id)
+    except QuotaExceeded as e:
+        raise _quota_error(e)
+    finally:
+        db.close()
+    try:
+        return MIX_JOBS.submit(current_user.id, current_user.username, request.dict())
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+@app.post("/mix")
+async def mix_audio(request: MixRequest, current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    _, future = await run_in_threadpool(_submit_mix, request, current_user)
+    try:
+        return await asyncio.wrap_future(future)
+    except (JobCancelled, CancelledError):
+        raise HTTPException(status_code=409, detail="Mix was cancelled")
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Mixing error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/history", response_model=List[MixLog])
-async def get_history(current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
-    history_items = db.query(models.MixHistory).filter(models.MixHistory.user_id == current_user.id).order_by(models.MixHistory.timestamp.desc()).all()
-    
-    result = []
-    for item in history_items:
-        result.append(MixLog(
-            id=item.id,
-            timestamp=item.timestamp,
-            logs=item.logs,
-            output_url=f"/output/{item.output_filename}",
-            settings_summary=item.settings_summary or "Custom Mix"
+def render_preview(request: PreviewRequest, user_id: int) -> bytes:
+    stems_paths = _resolve_stems(request.stems, user_id)
+    mixer = StemMixer(
+        sample_rate=request.sample_rate,
+        stem_cache=STEM_CACHE,
+        executor=MIX_EXECUTOR,
+        max_workers=MIX_MAX_WORKERS,
+        resampler=RESAMPLER,
+        resample_quality="fast",
+        precision="float32"
+    )
+    with recording():
+        audio, _ = mixer.render_preview(
+            stems_paths, request.gains, request.pans, request.start, request.duration, request.mono
+        )
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, request.sample_rate, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+@app.post("/mix/preview")
+async def preview_mix(request: PreviewRequest, current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    # Rendered inline rather than through the job queue: no output file, no history entry
+    if request.sample_rate not in PREVIEW_SAMPLE_RATES:
+        raise HTTPException(status_code=400, detail=f"sample_rate must be one of {PREVIEW_SAMPLE_RATES}")
+    if not 0 < request.duration <= PREVIEW_MAX_SECONDS or request.start < 0:
+        raise HTTPException(status_code=400, detail=f"Preview window must be within 0-{PREVIEW_MAX_SECONDS:g} seconds")
+    return Response(content=await run_in_threadpool(render_preview, request, current_user.id), media_type="audio/wav")
+
+@app.post("/jobs/mix", status_code=202)
+async def submit_mix_job(request: MixRequest, current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    job_id, _ = await run_in_threadpool(_submit_mix, request, current_user)
+    return {"job_id": job_id, "status": JOB_QUEUED}
+
+def _get_job(job_id: str, current_user: auth.CurrentUser, db: Session) -> models.MixJob:
+    job = db.query(models.MixJob).filter(models.MixJob.id == job_id, models.MixJob.user_id == current_user.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}", response_model=MixJobStatus)
+async def get_mix_job(job_id: str, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
+    job = _get_job(job_id, current_user, db)
+    return MixJobStatus(
+        id=job.id,
+        status=job.status,
+        progress=job.progress or 0.0,
+        error=job.error,
+        result=json.loads(job.result) if job.result else None,
+        created_at=job.created_at,
+        updated_at=job.updated_at
+    )
+
+@app.delete("/jobs/{job_id}")
+async def cancel_mix_job(job_id: str, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
+    job = _get_job(job_id, current_user, db)
+    if job.status in FINISHED_STATES or not MIX_JOBS.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return {"status": "cancelling"}
+
+@app.get("/download/{filename}")
+async def download_mix(filename: str, request: Request):
+    # Range-aware alternative to the /output mount, for seeking players and resumable downloads.
+    # Old links to a mix the sweeper has since transcoded get the FLAC.
+    path = STORAGE.mix_path(resolve_download(OUTPUT_DIR, filename).name)
+    if path.is_file():
+        await run_in_threadpool(STORAGE.touch_mix, path.name)
+    return ranged_file_response(path, request)
+
+@app.get("/peaks/{source}/{filename}")
+async def get_peaks(source: str, filename: str, width: int = 0):
+    # width: pixels to draw; the coarsest zoom level with at least that many peaks is returned
+    if source not in PEAK_SOURCES:
+        raise HTTPException(status_code=404, detail="Unknown peak source")
+    audio_path = resolve_download(PEAK_SOURCES[source], filename)
+    if not audio_path.is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    peaks_path = peaks_path_for(str(audio_path))
+    if not os.path.exists(peaks_path) or os.path.getmtime(peaks_path) < os.path.getmtime(audio_path):
+        # Not built yet (upload still settling, or audio from before peaks existed)
+        try:
+            await run_in_threadpool(build_peaks, str(audio_path))
+        except RuntimeError:
+            raise HTTPException(status_code=415, detail="Not a readable audio file")
+    return await run_in_threadpool(load_peaks, peaks_path, width)
+
+def _encode_cursor(timestamp: datetime, item_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{item_id}".encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        timestamp, item_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(item_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/history", response_model=List[MixSummary])
+async def get_history(response: Response, limit: int = 20, cursor: Optional[str] = None, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
+    # Keyset pagination, newest first, over the (user_id, timestamp, id) index. Logs and
+    # metrics are not loaded here; fetch them per item from /history/{id}.
+    # The cursor for the next page is returned in X-Next-Cursor.
+    limit = min(max(limit, 1), HISTORY_PAGE_MAX)
+    query = db.query(
+        models.MixHistory.id,
+        models.MixHistory.timestamp,
+        models.MixHistory.output_filename,
+        models.MixHistory.settings_summary
+    ).filter(models.MixHistory.user_id == current_user.id)
+    
+    if cursor:
+        timestamp, item_id = _decode_cursor(cursor)
+        query = query.filter(or_(
+            models.MixHistory.timestamp < timestamp,
+            and_(models.MixHistory.timestamp == timestamp, models.MixHistory.id < item_id)
         ))
-    return result
+    
+    rows = query.order_by(models.MixHistory.timestamp.desc(), models.MixHistory.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].timestamp, rows[-1].id)
+    
+    return [
+        MixSummary(
+            id=row.id,
+            timestamp=row.timestamp,
+            output_url=f"/download/{row.output_filename}",
+            settings_summary=row.settings_summary or "Custom Mix"
+        )
+        for row in rows
+    ]
+
+@app.get("/history/{item_id}", response_model=MixLog)
+async def get_history_item(item_id: int, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
+    item = db.query(models.MixHistory).filter(models.MixHistory.id == item_id, models.MixHistory.user_id == current_user.id).first()
+    if not item:
+        raise HTTPException(status_code=404, detail="History item not found")
+    return MixLog(
+        id=item.id,
+        timestamp=item.timestamp,
+        logs=item.logs or "",
+        output_url=f"/download/{item.output_filename}",
+        settings_summary=item.settings_summary or "Custom Mix",
+        metrics=json.loads(item.metrics) if item.metrics else None
+    )
 
 @app.delete("/history/{item_id}")
-async def delete_history_item(item_id: int, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
+async def delete_history_item(item_id: int, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: Session = Depends(database.get_db)):
     history_item = db.query(models.MixHistory).filter(models.MixHistory.id == item_id, models.MixHistory.user_id == current_user.id).first()
     if not history_item:
         raise HTTPException(status_code=404, detail="History item not found")
     
+    # The render is shared by every entry with a cache hit on it; it is removed with the last one
     try:
-        file_path = OUTPUT_DIR / history_item.output_filename
-        if file_path.exists():
-            file_path.unlink()
-    except Exception as e:
+        file_removed = RESULT_CACHE.release(db, history_item)
+    except OSError as e:
         print(f"Error deleting file: {e}")
+        file_removed = False
+    return {"status": "deleted", "file_removed": file_removed}
 
-    db.delete(history_item)
-    db.commit()
-    return {"status": "deleted"}
+@app.get("/metrics")
+async def get_metrics(current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    snapshot = METRICS.snapshot()
+    snapshot["jobs"] = {"active": MIX_JOBS.active_count()}
+    snapshot["stem_cache"] = {"hits": STEM_CACHE.hits, "misses": STEM_CACHE.misses}
+    snapshot["result_cache"] = {"hits": RESULT_CACHE.hits, "misses": RESULT_CACHE.misses}
+    snapshot["storage"] = {"last_sweep": STORAGE.last_sweep}
+    snapshot["startup"] = STARTUP
+    return snapshot
 
 @app.get("/")
 def read_root():
@@ -1,5 +1,5 @@
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, DateTime, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Boolean, Column, Integer, String, ForeignKey, DateTime, Text, Float, Index, inspect
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
 from .database import Base
 
@@ -12,6 +12,9 @@ class User(Base):
     hashed_password = Column(String(255))
 
     history = relationship("MixHistory", back_populates="user")
+    jobs = relationship("MixJob", back_populates="user")
+    uploads = relationship("StemUpload", back_populates="user")
+    stem_files = relationship("StemFile", back_populates="user")
 
 class MixHistory(Base):
     __tablename__ = "mix_history"
@@ -19,8 +22,90 @@ class MixHistory(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     timestamp = Column(DateTime, default=datetime.utcnow)
-    output_filename = Column(String(255))
-    logs = Column(Text)
+    output_filename = Column(String(255), index=True) # shared by every entry that reuses a cached render
+    # Large text columns load only when accessed, so history listings stay small
+    logs = deferred(Column(Text))
     settings_summary = Column(String(500)) # e.g. "4 stems, Auto-Gain: On"
+    metrics = deferred(Column(Text, nullable=True)) # JSON stage spans: seconds, bytes, peak RSS per stage
+    cache_key = Column(String(64), nullable=True, index=True) # stem digests + normalized settings, see result_cache
+    result = deferred(Column(Text, nullable=True)) # JSON response fields replayed on a cache hit (gains, loudness)
+    size = Column(BigInteger, nullable=True) # bytes of the render, counted against the user's quota
+    last_accessed = Column(DateTime, nullable=True) # last download or cache hit; falls back to timestamp
 
     user = relationship("User", back_populates="history")
+
+    # Serves the per-user, newest-first keyset pagination of /history
+    __table_args__ = (Index("ix_mix_history_user_timestamp", "user_id", "timestamp", "id"),)
+
+class MixJob(Base):
+    __tablename__ = "mix_jobs"
+
+    id = Column(String(32), primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    status = Column(String(20), default="queued") # queued, running, done, failed, cancelled
+    progress = Column(Float, default=0.0)
+    request = Column(Text) # JSON-encoded MixRequest
+    result = Column(Text, nullable=True) # JSON-encoded /mix response once done
+    error = Column(Text, nullable=True)
+    history_id = Column(Integer, ForeignKey("mix_history.id", ondelete="SET NULL"), nullable=True) # cleared when the entry is deleted
+    worker = Column(String(100), nullable=True) # "host:pid" of the process running the job
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    user = relationship("User", back_populates="jobs")
+
+class StemUpload(Base):
+    __tablename__ = "stem_uploads"
+
+    id = Column(String(32), primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    filename = Column(String(255)) # name the client uploaded under
+    expected_size = Column(BigInteger, nullable=True)
+    received = Column(BigInteger, default=0)
+    status = Column(String(20), default="open") # open, complete, failed
+    digest = Column(String(64), nullable=True, index=True) # sha256 of the finalized content
+    stored_filename = Column(String(255), nullable=True) # content-addressed name in temp_uploads
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    user = relationship("User", back_populates="uploads")
+
+class StemFile(Base):
+    # A user's claim on a content-addressed stem in temp_uploads; the file goes with the last claim
+    __tablename__ = "stem_files"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    filename = Column(String(255), index=True) # <sha256>.<ext>, shared by every user who uploaded the content
+    original_filename = Column(String(255)) # name the client uploaded under
+    size = Column(BigInteger, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed = Column(DateTime, default=datetime.utcnow, index=True) # upload or last mix using it
+
+    user = relationship("User", back_populates="stem_files")
+
+    __table_args__ = (Index("ix_stem_files_user_filename", "user_id", "filename", unique=True),)
+
+def ensure_columns(engine):
+    # create_all skips tables that already exist, so nullable columns added later are added here
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present or not column.nullable or column.primary_key:
+                    continue
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column.type.compile(engine.dialect)}"
+                )
+
+def ensure_indexes(engine):
+    # create_all skips tables that already exist, so indexes added later are created here
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
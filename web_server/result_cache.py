@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from audio_engine.waveform import peaks_path_for
+
+from . import models
+
+# Bump when rendering changes in a way that should invalidate previously cached mixes
+RESULT_CACHE_VERSION = 1
+
+# Levels are compared after rounding, so float noise from the client does not split the cache
+LEVEL_DECIMALS = 4
+
+
+def _levels(values: Mapping[str, float], names: Mapping[str, Any]) -> Dict[str, float]:
+    # Only stems in the request count, and 0 (the default) is the same as absent
+    levels = {name: round(float(value), LEVEL_DECIMALS) for name, value in values.items() if name in names}
+    return {name: value for name, value in sorted(levels.items()) if value != 0.0}
+
+
+def mix_settings(request: Mapping[str, Any], stem_digests: Mapping[str, str],
+                 engine: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    The parts of a mix request that determine the rendered audio, in a
+    canonical form: stems by content digest rather than filename, levels
+    rounded with defaults dropped, and flags that cannot take effect removed.
+    The session_id itself is left out, but the render path is kept: an
+    incremental remix resamples in memory while a streamed mix resamples
+    block by block, and the two differ slightly for resampled stems.
+    """
+    auto_gain = bool(request.get("auto_gain"))
+    if auto_gain:
+        render = "memory"
+    elif request.get("session_id"):
+        render = "session"
+    else:
+        render = "stream"
+    target_lufs = request.get("target_lufs")
+    buses = request.get("buses")
+
+    settings = {
+        "version": RESULT_CACHE_VERSION,
+        "engine": dict(sorted(engine.items())),
+        "render": render,
+        "stems": dict(sorted(stem_digests.items())),
+        "gains": _levels(request.get("gains") or {}, stem_digests),
+        "pans": _levels(request.get("pans") or {}, stem_digests),
+        "auto_gain": auto_gain,
+        "use_cnn": auto_gain and bool(request.get("use_cnn")),
+        "output_format": request.get("output_format", "wav16"),
+        "target_lufs": None if target_lufs is None else round(float(target_lufs), LEVEL_DECIMALS),
+        "true_peak_db": None if target_lufs is None else round(float(request.get("true_peak_db", -1.0)), LEVEL_DECIMALS),
+        "buses": None,
+    }
+    if buses:
+        settings["buses"] = {
+            bus: {stem: round(float(send), LEVEL_DECIMALS) for stem, send in sorted(
+                (spec.items() if isinstance(spec, Mapping) else ((stem, 0.0) for stem in spec))
+            )}
+            for bus, spec in sorted(buses.items())
+        }
+    return settings
+
+
+def cache_key(settings: Mapping[str, Any], bus: Optional[str] = None) -> str:
+    # Bus renders of one request share the settings and differ by bus name
+    canonical = json.dumps(settings, sort_keys=True, separators=(",", ":"))
+    if bus is not None:
+        canonical += f"|bus={bus}"
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class MixResultCache:
+    """
+    Reuses rendered mixes for identical requests.
+
+    A history entry records the cache key of the render it points at. A hit
+    returns the requesting user's own entry. A hit on another user's render
+    gets the requesting user a new entry with their own hard link to the file
+    (a copy where links are unsupported), without the other user's logs or
+    metrics, so no user sees another's file names or processing log. Deleting
+    an entry removes the file only when no entry references it any more; the
+    count of entries per output_filename is the reference count.
+    """
+
+    def __init__(self, output_dir: Path):
+        self.output_dir = Path(output_dir)
+        self.hits = 0
+        self.misses = 0
+        # Serializes linking against releasing, so a hit never links a file that is being unlinked
+        self._lock = threading.Lock()
+
+    def _render_exists(self, entry: models.MixHistory) -> bool:
+        return (self.output_dir / entry.output_filename).exists()
+
+    def lookup(self, db: Session, user_id: int, username: str, keys: List[str]) -> Optional[List[models.MixHistory]]:
+        """
+        Returns one history entry per key, all owned by user_id, or None unless
+        every key has a render on disk.
+        """
+        entries = []
+        with self._lock:
+            for key in keys:
+                candidates = db.query(models.MixHistory).filter(models.MixHistory.cache_key == key)
+                entry = candidates.filter(models.MixHistory.user_id == user_id).order_by(models.MixHistory.id.desc()).first()
+                if entry is None or not self._render_exists(entry):
+                    entry = next((e for e in candidates.order_by(models.MixHistory.id.desc()) if self._render_exists(e)), None)
+                if entry is None:
+                    self.misses += 1
+                    return None
+                entries.append(entry)
+
+            linked = [entry if entry.user_id == user_id else self._link(db, user_id, username, entry) for entry in entries]
+            db.commit()
+        self.hits += 1
+        return linked
+
+    def _alias(self, filename: str, alias: str):
+        # The render (and its peaks) under a second name; hard links share the bytes on disk
+        source = self.output_dir / filename
+        for source_path, alias_path in ((source, self.output_dir / alias),
+                                        (Path(peaks_path_for(str(source))), Path(peaks_path_for(str(self.output_dir / alias))))):
+            if not source_path.exists():
+                continue
+            try:
+                os.link(str(source_path), str(alias_path))
+            except OSError:
+                shutil.copyfile(str(source_path), str(alias_path))
+
+    def _link(self, db: Session, user_id: int, username: str, entry: models.MixHistory) -> models.MixHistory:
+        # A new entry for this user with its own alias of the other user's render
+        alias = f"mix_{username}_{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}{Path(entry.output_filename).suffix}"
+        self._alias(entry.output_filename, alias)
+        linked = models.MixHistory(
+            user_id=user_id,
+            output_filename=alias,
+            logs="Served from the result cache: an identical mix was already rendered.\n",
+            settings_summary=entry.settings_summary,
+            metrics=None,
+            cache_key=entry.cache_key,
+            result=entry.result,
+            size=entry.size
+        )
+        db.add(linked)
+        db.flush()
+        return linked
+
+    def release(self, db: Session, entry: models.MixHistory) -> bool:
+        # Deletes the entry; the render and its peaks go with the last reference. Returns whether they did.
+        filename = entry.output_filename
+        with self._lock:
+            # Jobs keep a reference to the entry they produced; databases created before the
+            # reference was declared ON DELETE SET NULL would reject the delete otherwise
+            db.query(models.MixJob).filter(models.MixJob.history_id == entry.id).update(
+                {"history_id": None}, synchronize_session=False
+            )
+            db.delete(entry)
+            db.commit()
+            remaining = db.query(func.count(models.MixHistory.id)).filter(
+                models.MixHistory.output_filename == filename
+            ).scalar()
+            if remaining:
+                return False
+
+            file_path = self.output_dir / filename
+            for path in (file_path, Path(peaks_path_for(str(file_path)))):
+                if path.exists():
+                    path.unlink()
+        return True
+
+    def replace_render(self, db: Session, filename: str, new_filename: str, size: int) -> int:
+        """
+        Points every entry of a render at a re-encoded copy (e.g. WAV -> FLAC)
+        and removes the original. Cache keys are cleared since the copy no
+        longer has the requested output format. Returns the number of entries
+        moved; with none left the copy is removed instead.
+        """
+        with self._lock:
+            moved = db.query(models.MixHistory).filter(models.MixHistory.output_filename == filename).update(
+                {"output_filename": new_filename, "size": size, "cache_key": None}, synchronize_session=False
+            )
+            db.commit()
+            stale = self.output_dir / (filename if moved else new_filename)
+            if stale.exists():
+                stale.unlink()
+        return moved
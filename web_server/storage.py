@@ -0,0 +1,479 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import soundfile as sf
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from audio_engine.waveform import PEAKS_SUFFIX, peaks_path_for
+
+from . import database, models
+from .result_cache import MixResultCache
+from .uploads import ChunkedUploadManager, content_name
+
+try:
+    import fcntl
+except ImportError:  # No flock (Windows): every worker sweeps
+    fcntl = None
+
+HASH_READ_SIZE = 1024 * 1024
+
+# Last-access times are written at most this often per file, so downloads and mixes rarely write
+TOUCH_INTERVAL_SECONDS = 3600
+TOUCH_MEMORY_ITEMS = 10000
+
+# WAV subtypes FLAC holds losslessly; mixes are written as one of these
+FLAC_SUBTYPES = ("PCM_16", "PCM_24")
+TRANSCODE_BLOCK_FRAMES = 65536
+
+# Rows per query when matching files on disk against the DB
+SWEEP_QUERY_BATCH = 500
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, used: int, quota: int, incoming: int = 0):
+        super().__init__(f"Storage quota exceeded: {used + incoming} of {quota} bytes")
+        self.used = used
+        self.quota = quota
+
+
+class StemNotFound(Exception):
+    # args[0] is the stem name from the mix request
+    pass
+
+
+def _unlink(path: Path) -> int:
+    # Bytes freed, 0 when the file was already gone
+    try:
+        size = path.stat().st_size
+        path.unlink()
+        return size
+    except FileNotFoundError:
+        return 0
+
+
+def _is_bare_name(filename: str) -> bool:
+    return os.path.basename(filename) == filename and not filename.startswith(".")
+
+
+class StorageManager:
+    """
+    Lifecycle of the files in temp_uploads/ and output/.
+
+    Stems are stored once under their content hash, and each user who uploads
+    one gets a StemFile row: users can only mix stems they own, and a stem is
+    deleted with the last owner's row. Stem and mix sizes are counted against a
+    per-user quota. A background sweeper evicts stems nobody has used for
+    stem_ttl_seconds, clears abandoned partial uploads, and re-encodes WAV
+    mixes not downloaded for transcode_after_seconds as FLAC.
+
+    With several workers only one sweeps at a time (flock on .sweep.lock).
+    """
+
+    def __init__(
+        self,
+        upload_dir: Path,
+        output_dir: Path,
+        uploads: ChunkedUploadManager,
+        result_cache: MixResultCache,
+        quota_bytes: int = 2 * 1024 ** 3,
+        stem_ttl_seconds: float = 30 * 24 * 3600,
+        partial_ttl_seconds: float = 24 * 3600,
+        transcode_after_seconds: float = 7 * 24 * 3600,
+        sweep_interval_seconds: float = 3600,
+        on_stored: Optional[Callable[[str, str], None]] = None
+    ):
+        self.upload_dir = Path(upload_dir)
+        self.output_dir = Path(output_dir)
+        self.uploads = uploads
+        self.result_cache = result_cache
+        self.quota_bytes = quota_bytes
+        self.stem_ttl_seconds = stem_ttl_seconds
+        self.partial_ttl_seconds = partial_ttl_seconds
+        self.transcode_after_seconds = transcode_after_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._on_stored = on_stored
+
+        self.last_sweep: Optional[Dict[str, Any]] = None
+        # Serializes claiming a stem against deleting its file (re-entered by store_file -> register)
+        self._lock = threading.RLock()
+        # (kind, owner, name) -> monotonic time of the last last-access write
+        self._touched: Dict[tuple, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def usage(self, db: Session, user_id: int) -> Dict[str, Optional[int]]:
+        stems = db.query(func.coalesce(func.sum(models.StemFile.size), 0)).filter(
+            models.StemFile.user_id == user_id
+        ).scalar()
+        mixes = db.query(func.coalesce(func.sum(models.MixHistory.size), 0)).filter(
+            models.MixHistory.user_id == user_id
+        ).scalar()
+        return {
+            "stems_bytes": int(stems),
+            "mixes_bytes": int(mixes),
+            "used_bytes": int(stems) + int(mixes),
+            "quota_bytes": self.quota_bytes or None,
+        }
+
+    def check_quota(self, db: Session, user_id: int, incoming: int = 0):
+        # A quota of 0 disables the check
+        if not self.quota_bytes:
+            return
+        used = self.usage(db, user_id)["used_bytes"]
+        if used + incoming > self.quota_bytes:
+            raise QuotaExceeded(used, self.quota_bytes, incoming)
+
+    def remaining(self, db: Session, user_id: int) -> Optional[int]:
+        # Bytes the user may still store, None when unlimited
+        if not self.quota_bytes:
+            return None
+        return max(0, self.quota_bytes - self.usage(db, user_id)["used_bytes"])
+
+    def owns(self, db: Session, user_id: int, filename: str) -> bool:
+        return self._owned(db, user_id, filename) is not None
+
+    def _owned(self, db: Session, user_id: int, filename: str) -> Optional[models.StemFile]:
+        return db.query(models.StemFile).filter(
+            models.StemFile.user_id == user_id, models.StemFile.filename == filename
+        ).first()
+
+    def store_upload(self, db: Session, user_id: int, source: BinaryIO, filename: str) -> models.StemFile:
+        """
+        Stores an uploaded stem under its content hash and claims it for the
+        user. The bytes are hashed while they are copied to a scratch file, so
+        a re-upload of a stem already on disk is just discarded.
+        """
+        temp_path = self.uploads.partial_dir / f"{uuid.uuid4().hex}.upload"
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with temp_path.open("wb") as f:
+                for chunk in iter(lambda: source.read(HASH_READ_SIZE), b""):
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            stored = content_name(digest, filename)
+            if self._owned(db, user_id, stored) is None:
+                self.check_quota(db, user_id, size)
+            return self.store_file(db, user_id, temp_path, stored, filename, digest)[0]
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+    def store_file(self, db: Session, user_id: int, source: Path, stored_filename: str, original_filename: str,
+                   digest: str) -> Tuple[models.StemFile, bool]:
+        """
+        Moves a verified file into place under its content name, or drops it
+        when that content is already stored, and claims it for the user. The
+        existence check and the claim happen under the lock the sweeper deletes
+        with. Returns the claim and whether the content was already stored.
+        """
+        with self._lock:
+            stored_path = self.upload_dir / stored_filename
+            deduplicated = stored_path.exists()
+            if deduplicated:
+                _unlink(source)
+            else:
+                os.replace(str(source), str(stored_path))
+            return self.register(db, user_id, stored_filename, original_filename, digest), deduplicated
+
+    def register(self, db: Session, user_id: int, stored_filename: str, original_filename: str,
+                 digest: Optional[str] = None) -> models.StemFile:
+        # Claims a stored stem for the user, or refreshes an existing claim. Raises
+        # StemNotFound when the file is gone, so a claim never outlives its file.
+        stored_path = self.upload_dir / stored_filename
+        with self._lock:
+            if not stored_path.is_file():
+                raise StemNotFound(stored_filename)
+            now = datetime.utcnow()
+            entry = self._owned(db, user_id, stored_filename)
+            if entry is None:
+                entry = models.StemFile(user_id=user_id, filename=stored_filename,
+                                        original_filename=Path(original_filename).name,
+                                        size=stored_path.stat().st_size, created_at=now, last_accessed=now)
+                db.add(entry)
+            else:
+                entry.original_filename = Path(original_filename).name
+                entry.last_accessed = now
+            try:
+                db.commit()
+            except IntegrityError:
+                # The same user stored the same content concurrently
+                db.rollback()
+                entry = self._owned(db, user_id, stored_filename)
+            db.refresh(entry)
+
+        if digest and self._on_stored is not None:
+            self._on_stored(str(stored_path), digest)
+        return entry
+
+    def resolve_stems(self, db: Session, user_id: int, stems: Mapping[str, str]) -> Dict[str, str]:
+        """
+        Maps a mix request's stem names to paths. A stem must be owned by the
+        user; files nobody has claimed (uploaded before stems were tracked)
+        stay usable until the sweeper evicts them. Raises StemNotFound.
+        """
+        filenames = set(stems.values())
+        owned = {row.filename for row in db.query(models.StemFile.filename).filter(
+            models.StemFile.user_id == user_id, models.StemFile.filename.in_(filenames)
+        )}
+        claimed = {row.filename for row in db.query(models.StemFile.filename).filter(
+            models.StemFile.filename.in_(filenames - owned)
+        ).distinct()}
+
+        paths = {}
+        for name, filename in stems.items():
+            path = self.upload_dir / filename
+            if not _is_bare_name(filename) or filename in claimed or not path.is_file():
+                raise StemNotFound(name)
+            paths[name] = str(path)
+
+        due = self._due("stem", user_id, owned)
+        if due:
+            db.query(models.StemFile).filter(
+                models.StemFile.user_id == user_id, models.StemFile.filename.in_(due)
+            ).update({"last_accessed": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        return paths
+
+    def release_stem(self, db: Session, user_id: int, filename: str) -> bool:
+        # Drops the user's claim; the file and its peaks go with the last claim. Returns whether they did.
+        entry = self._owned(db, user_id, filename)
+        if entry is None:
+            raise StemNotFound(filename)
+        db.delete(entry)
+        db.commit()
+        return self._remove_unclaimed_stems(db, [filename])[0] > 0
+
+    def _remove_unclaimed_stems(self, db: Session, filenames: Iterable[str]) -> Tuple[int, int]:
+        # Deletes each stem file no row claims any more; returns (files removed, bytes freed)
+        removed, freed = 0, 0
+        with self._lock:
+            for filename in filenames:
+                claims = db.query(func.count(models.StemFile.id)).filter(
+                    models.StemFile.filename == filename
+                ).scalar()
+                if claims:
+                    continue
+                path = self.upload_dir / filename
+                size = _unlink(path)
+                _unlink(Path(peaks_path_for(str(path))))
+                removed += size > 0
+                freed += size
+        return removed, freed
+
+    def mix_path(self, filename: str) -> Path:
+        # A WAV mix that has since been transcoded is found under its .flac name
+        path = self.output_dir / filename
+        if not path.is_file() and path.suffix.lower() == ".wav":
+            flac_path = path.with_suffix(".flac")
+            if flac_path.is_file():
+                return flac_path
+        return path
+
+    def touch_mix(self, filename: str):
+        # Download or cache hit; keeps the render out of the transcode sweep
+        if not self._due("mix", 0, [filename]):
+            return
+        db = database.SessionLocal()
+        try:
+            db.query(models.MixHistory).filter(models.MixHistory.output_filename == filename).update(
+                {"last_accessed": datetime.utcnow()}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _due(self, kind: str, owner: int, names: Iterable[str]) -> List[str]:
+        # Names whose last-access time was not written within TOUCH_INTERVAL_SECONDS by this worker
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            if len(self._touched) > TOUCH_MEMORY_ITEMS:
+                self._touched.clear()
+            for name in names:
+                key = (kind, owner, name)
+                if now - self._touched.get(key, -TOUCH_INTERVAL_SECONDS) >= TOUCH_INTERVAL_SECONDS:
+                    self._touched[key] = now
+                    due.append(name)
+        return due
+
+    def sweep(self) -> Optional[Dict[str, Any]]:
+        """
+        One pass of the lifecycle rules. Returns counts per rule, or None when
+        another worker holds the sweep lock.
+        """
+        lock_file = open(self.upload_dir / ".sweep.lock", "a")
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return None
+
+            start = time.perf_counter()
+            db = database.SessionLocal()
+            try:
+                evicted, evicted_bytes = self._evict_stale_stems(db)
+                unclaimed, unclaimed_bytes = self._evict_unclaimed_files(db)
+                expired = self.uploads.expire(db, self.partial_ttl_seconds)
+                transcoded, transcoded_bytes = self._transcode_old_mixes(db)
+                self._backfill_mix_sizes(db)
+            finally:
+                db.close()
+
+            stats = {
+                "finished_at": datetime.utcnow().isoformat(),
+                "seconds": time.perf_counter() - start,
+                "evicted_stems": evicted,
+                "evicted_unclaimed_files": unclaimed,
+                "expired_partial_uploads": expired,
+                "transcoded_mixes": transcoded,
+                "freed_bytes": evicted_bytes + unclaimed_bytes + transcoded_bytes,
+            }
+            self.last_sweep = stats
+            return stats
+        finally:
+            lock_file.close()
+
+    def _evict_stale_stems(self, db: Session) -> Tuple[int, int]:
+        if not self.stem_ttl_seconds:
+            return 0, 0
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stem_ttl_seconds)
+        stale = db.query(models.StemFile).filter(models.StemFile.last_accessed < cutoff).all()
+        filenames = {entry.filename for entry in stale}
+        for entry in stale:
+            db.delete(entry)
+        db.commit()
+        return self._remove_unclaimed_stems(db, filenames)
+
+    def _evict_unclaimed_files(self, db: Session) -> Tuple[int, int]:
+        # Stems from before ownership was tracked, and peaks whose audio is gone, once older than the stem TTL
+        if not self.stem_ttl_seconds:
+            return 0, 0
+        cutoff = time.time() - self.stem_ttl_seconds
+        candidates = []
+        with os.scandir(self.upload_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        candidates.append(entry.name)
+                except FileNotFoundError:
+                    continue
+
+        orphan_peaks = [name for name in candidates
+                        if name.endswith(PEAKS_SUFFIX) and not (self.upload_dir / name[:-len(PEAKS_SUFFIX)]).exists()]
+        audio = [name for name in candidates if not name.endswith(PEAKS_SUFFIX)]
+        unclaimed = []
+        for i in range(0, len(audio), SWEEP_QUERY_BATCH):
+            batch = audio[i:i + SWEEP_QUERY_BATCH]
+            claimed = {row.filename for row in db.query(models.StemFile.filename).filter(
+                models.StemFile.filename.in_(batch)
+            )}
+            unclaimed.extend(name for name in batch if name not in claimed)
+
+        removed, freed = self._remove_unclaimed_stems(db, unclaimed)
+        for name in orphan_peaks:
+            freed += _unlink(self.upload_dir / name)
+        return removed, freed
+
+    def _transcode_old_mixes(self, db: Session) -> Tuple[int, int]:
+        # WAV renders whose every entry is older than the cutoff and not downloaded since
+        if not self.transcode_after_seconds:
+            return 0, 0
+        cutoff = datetime.utcnow() - timedelta(seconds=self.transcode_after_seconds)
+        last_used = func.max(func.coalesce(models.MixHistory.last_accessed, models.MixHistory.timestamp))
+        rows = db.query(models.MixHistory.output_filename).filter(
+            models.MixHistory.output_filename.like("%.wav")
+        ).group_by(models.MixHistory.output_filename).having(last_used < cutoff).all()
+
+        transcoded, freed = 0, 0
+        for (filename,) in rows:
+            if self._stop.is_set():
+                break
+            saved = self._transcode(db, filename)
+            if saved is not None:
+                transcoded += 1
+                freed += saved
+        return transcoded, freed
+
+    def _transcode(self, db: Session, filename: str) -> Optional[int]:
+        # Lossless WAV -> FLAC copy that replaces the render for every entry; returns bytes saved
+        wav_path = self.output_dir / filename
+        flac_path = wav_path.with_suffix(".flac")
+        if not wav_path.is_file() or flac_path.exists():
+            return None
+        try:
+            info = sf.info(str(wav_path))
+        except RuntimeError:
+            return None
+        if info.subtype not in FLAC_SUBTYPES:
+            return None
+
+        temp_path = self.output_dir / f".{flac_path.name}.tmp"
+        try:
+            with sf.SoundFile(str(wav_path)) as source, sf.SoundFile(
+                str(temp_path), "w", samplerate=info.samplerate, channels=info.channels,
+                subtype=info.subtype, format="FLAC"
+            ) as target:
+                # int32 round-trips 16- and 24-bit samples exactly
+                for block in source.blocks(blocksize=TRANSCODE_BLOCK_FRAMES, dtype="int32"):
+                    target.write(block)
+            os.replace(str(temp_path), str(flac_path))
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+        wav_size = wav_path.stat().st_size
+        flac_size = flac_path.stat().st_size
+        wav_peaks = Path(peaks_path_for(str(wav_path)))
+        if not self.result_cache.replace_render(db, filename, flac_path.name, flac_size):
+            # Every entry was deleted meanwhile
+            _unlink(wav_peaks)
+            return None
+        if wav_peaks.exists():
+            # Same audio, same peaks; the fresh mtime marks them current for the FLAC
+            flac_peaks = peaks_path_for(str(flac_path))
+            os.replace(str(wav_peaks), flac_peaks)
+            os.utime(flac_peaks)
+        return wav_size - flac_size
+
+    def _backfill_mix_sizes(self, db: Session):
+        # Entries saved before sizes were tracked
+        missing = db.query(models.MixHistory).filter(models.MixHistory.size.is_(None)).limit(SWEEP_QUERY_BATCH).all()
+        for entry in missing:
+            path = self.output_dir / entry.output_filename
+            entry.size = path.stat().st_size if path.is_file() else 0
+        db.commit()
+
+    def start(self):
+        # An interval of 0 disables the background sweeper; sweep() can still be called directly
+        if not self.sweep_interval_seconds or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="auralis-storage-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.sweep_interval_seconds):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Storage sweep failed: {e}")
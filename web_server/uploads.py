@@ -0,0 +1,330 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, Optional, Set, Tuple
+
+import anyio
+import soundfile as sf
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from . import models
+
+UPLOAD_OPEN = "open"
+UPLOAD_COMPLETE = "complete"
+UPLOAD_FAILED = "failed"
+
+HASH_READ_SIZE = 1024 * 1024
+
+# Received bytes are handed to the threadpool for writing and hashing in batches of this size
+WRITE_BATCH_BYTES = 1024 * 1024
+
+
+def content_name(digest: str, filename: str) -> str:
+    # Stored name of an upload: its sha256 plus the client's (lowercased) extension
+    return f"{digest}{Path(filename).suffix.lower()}"
+
+
+class UploadNotFound(Exception):
+    pass
+
+
+class UploadConflict(Exception):
+    # Wrong offset, concurrent append, or finalize before all bytes arrived;
+    # the client should re-sync with the upload status
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+class InvalidUpload(Exception):
+    pass
+
+
+class UploadTooLarge(InvalidUpload):
+    # The upload would exceed the user's storage quota
+    pass
+
+
+class ChunkedUploadManager:
+    """
+    Resumable uploads: init, append chunks at an offset, finalize.
+
+    Chunks are appended to a partial file and hashed as they arrive, so finalize
+    does not re-read the upload. Finalized files are stored under their sha256
+    (content-addressed), so identical stems are kept once no matter how often
+    or under which name they are uploaded.
+    """
+
+    def __init__(self, upload_dir: Path, max_chunk_bytes: int = 64 * 1024 * 1024,
+                 on_stored: Optional[Callable[[str, str], None]] = None):
+        self.upload_dir = Path(upload_dir)
+        self.partial_dir = self.upload_dir / ".partial"
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+        self.max_chunk_bytes = max_chunk_bytes
+        self._on_stored = on_stored
+
+        # upload_id -> (running sha256, bytes hashed so far); rebuilt from disk when missing
+        self._hashers: Dict[str, Tuple[Any, int]] = {}
+        self._busy: Set[str] = set()
+        self._busy_lock = threading.Lock()
+
+    def _partial_path(self, upload_id: str) -> Path:
+        return self.partial_dir / f"{upload_id}.part"
+
+    def _received(self, upload: models.StemUpload) -> int:
+        # The partial file is the source of truth: a dropped connection may have
+        # written bytes after the last recorded offset
+        path = self._partial_path(upload.id)
+        return path.stat().st_size if path.exists() else 0
+
+    def _get(self, db: Session, upload_id: str, user_id: int) -> models.StemUpload:
+        upload = db.query(models.StemUpload).filter(
+            models.StemUpload.id == upload_id, models.StemUpload.user_id == user_id
+        ).first()
+        if upload is None:
+            raise UploadNotFound(upload_id)
+        return upload
+
+    def describe(self, upload: models.StemUpload) -> Dict[str, Any]:
+        info = {
+            "upload_id": upload.id,
+            "status": upload.status,
+            "filename": upload.filename,
+            "size": upload.expected_size,
+            "offset": self._received(upload) if upload.status == UPLOAD_OPEN else upload.received,
+        }
+        if upload.status == UPLOAD_COMPLETE:
+            info.update(digest=upload.digest, stored_filename=upload.stored_filename,
+                        url=f"/static/{upload.stored_filename}")
+        elif upload.status == UPLOAD_FAILED:
+            info["error"] = upload.error
+        return info
+
+    def create(self, db: Session, user_id: int, filename: str, size: Optional[int] = None,
+               digest: Optional[str] = None,
+               may_skip: Optional[Callable[[str], bool]] = None) -> Dict[str, Any]:
+        # may_skip(stored_filename) decides whether a known digest completes without any bytes.
+        # A digest and size are no proof of having the content, so callers that grant access on
+        # completion should allow it only for content the user already has.
+        upload = models.StemUpload(id=uuid.uuid4().hex, user_id=user_id, filename=Path(filename).name,
+                                   expected_size=size, received=0, status=UPLOAD_OPEN)
+
+        # A client that already knows the content hash can skip sending bytes we have
+        if digest:
+            stored = content_name(digest.lower(), upload.filename)
+            stored_path = self.upload_dir / stored
+            if stored_path.exists() and (size is None or stored_path.stat().st_size == size) and (
+                may_skip is None or may_skip(stored)
+            ):
+                upload.status = UPLOAD_COMPLETE
+                upload.digest = digest.lower()
+                upload.stored_filename = stored
+                upload.received = stored_path.stat().st_size
+
+        db.add(upload)
+        db.commit()
+        db.refresh(upload)
+
+        if upload.status == UPLOAD_OPEN:
+            self._partial_path(upload.id).touch()
+            return self.describe(upload)
+        return dict(self.describe(upload), deduplicated=True)
+
+    def status(self, db: Session, upload_id: str, user_id: int) -> Dict[str, Any]:
+        return self.describe(self._get(db, upload_id, user_id))
+
+    def _hasher(self, upload_id: str, received: int):
+        hasher, hashed = self._hashers.get(upload_id, (None, -1))
+        if hasher is not None and hashed == received:
+            return hasher
+
+        # Server restarted or a write was torn: re-hash what is on disk once
+        hasher = hashlib.sha256()
+        with self._partial_path(upload_id).open("rb") as f:
+            for chunk in iter(lambda: f.read(HASH_READ_SIZE), b""):
+                hasher.update(chunk)
+        return hasher
+
+    def _begin_append(self, db: Session, upload_id: str, user_id: int, offset: int):
+        upload = self._get(db, upload_id, user_id)
+        if upload.status != UPLOAD_OPEN:
+            raise UploadConflict(f"Upload is {upload.status}", upload.received)
+        with self._busy_lock:
+            if upload_id in self._busy:
+                raise UploadConflict("Another chunk is being appended to this upload", self._received(upload))
+            received = self._received(upload)
+            if offset != received:
+                raise UploadConflict(f"Expected offset {received}, got {offset}", received)
+            self._busy.add(upload_id)
+        try:
+            return upload, received, self._hasher(upload_id, received), self._partial_path(upload_id).open("ab")
+        except BaseException:
+            self._busy.discard(upload_id)
+            raise
+
+    @staticmethod
+    def _write(f: BinaryIO, hasher, data: bytes):
+        f.write(data)
+        hasher.update(data)
+
+    def _end_append(self, db: Session, upload: models.StemUpload, f: BinaryIO, hasher,
+                    pending: bytes, received: int, rejected: bool):
+        try:
+            if rejected:
+                # Drop the whole rejected chunk so the client can retry from the same offset
+                f.truncate(received)
+                self._hashers.pop(upload.id, None)
+            else:
+                # On a dropped connection every byte received is written and hashed, so the
+                # running hash stays valid for the resume
+                self._write(f, hasher, pending)
+        finally:
+            f.close()
+            received = self._received(upload)
+            if not rejected:
+                self._hashers[upload.id] = (hasher, received)
+            upload.received = received
+            db.commit()
+
+    async def append(self, db: Session, upload_id: str, user_id: int, offset: int,
+                     chunks: AsyncIterator[bytes], max_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Streams a chunk into the partial file. The body is read on the event loop;
+        lookups, writes and hashing run in the threadpool, WRITE_BATCH_BYTES at a time.
+        max_size caps the upload's total size (the user's remaining quota), which
+        matters when the client declared no size.
+        """
+        upload, received, hasher, f = await run_in_threadpool(self._begin_append, db, upload_id, user_id, offset)
+        pending = bytearray()
+        written = 0
+        rejected = False
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                written += len(chunk)
+                if written > self.max_chunk_bytes:
+                    raise InvalidUpload(f"Chunk exceeds {self.max_chunk_bytes} bytes")
+                if upload.expected_size is not None and received + written > upload.expected_size:
+                    raise InvalidUpload("Upload is larger than the declared size")
+                if max_size is not None and received + written > max_size:
+                    raise UploadTooLarge(f"Upload exceeds the {max_size} bytes left in the storage quota")
+                pending += chunk
+                if len(pending) >= WRITE_BATCH_BYTES:
+                    data, pending = bytes(pending), bytearray()
+                    await run_in_threadpool(self._write, f, hasher, data)
+        except InvalidUpload:
+            rejected = True
+            raise
+        finally:
+            # Shielded so a cancelled request still releases the upload and records its offset
+            try:
+                with anyio.CancelScope(shield=True):
+                    await run_in_threadpool(self._end_append, db, upload, f, hasher, bytes(pending), received, rejected)
+            finally:
+                self._busy.discard(upload_id)
+
+        return self.describe(upload)
+
+    def _store(self, source: Path, stored_filename: str, original_filename: str, digest: str) -> bool:
+        # Default placement: keep the first copy of each content; returns whether it was already stored
+        stored_path = self.upload_dir / stored_filename
+        deduplicated = stored_path.exists()
+        if deduplicated:
+            source.unlink()
+        else:
+            os.replace(str(source), str(stored_path))
+        if self._on_stored is not None:
+            self._on_stored(str(stored_path), digest)
+        return deduplicated
+
+    def finalize(self, db: Session, upload_id: str, user_id: int, digest: Optional[str] = None,
+                 store: Optional[Callable[[Path, str, str, str], bool]] = None) -> Dict[str, Any]:
+        # store(partial_path, stored_filename, original_filename, sha256) moves the verified
+        # file into place and returns whether the content was already stored; callers that
+        # track ownership pass one that claims the file in the same step
+        upload = self._get(db, upload_id, user_id)
+        if upload.status == UPLOAD_COMPLETE:
+            return dict(self.describe(upload), deduplicated=False)
+        if upload.status != UPLOAD_OPEN:
+            raise UploadConflict(f"Upload is {upload.status}", upload.received)
+        if upload_id in self._busy:
+            raise UploadConflict("A chunk is still being appended", self._received(upload))
+
+        partial_path = self._partial_path(upload_id)
+        received = self._received(upload)
+        if upload.expected_size is not None and received != upload.expected_size:
+            raise UploadConflict(f"Received {received} of {upload.expected_size} bytes", received)
+
+        actual = self._hasher(upload_id, received).hexdigest()
+        self._hashers.pop(upload_id, None)
+        if digest and digest.lower() != actual:
+            raise InvalidUpload(f"sha256 mismatch: expected {digest.lower()}, got {actual}")
+
+        try:
+            info = sf.info(str(partial_path))
+            if info.frames <= 0:
+                raise RuntimeError("no audio frames")
+        except RuntimeError:
+            partial_path.unlink()
+            upload.status = UPLOAD_FAILED
+            upload.error = "Not a readable audio file"
+            upload.received = received
+            db.commit()
+            raise InvalidUpload(upload.error)
+
+        stored = content_name(actual, upload.filename)
+        deduplicated = (store or self._store)(partial_path, stored, upload.filename, actual)
+
+        upload.status = UPLOAD_COMPLETE
+        upload.digest = actual
+        upload.stored_filename = stored
+        upload.received = received
+        db.commit()
+
+        return dict(
+            self.describe(upload),
+            deduplicated=deduplicated,
+            samplerate=info.samplerate,
+            channels=info.channels,
+            frames=info.frames,
+            format=info.format,
+        )
+
+    def expire(self, db: Session, max_age_seconds: float) -> int:
+        """
+        Removes files in the partial directory untouched for max_age_seconds.
+        Open uploads they belong to are marked failed, so a late chunk gets a
+        409 instead of silently starting over. Returns the number of files removed.
+        """
+        cutoff = time.time() - max_age_seconds
+        stale = []
+        for path in self.partial_dir.iterdir():
+            if path.name.startswith(".") or path.stem in self._busy:
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    stale.append(path)
+            except FileNotFoundError:
+                continue
+
+        upload_ids = [path.stem for path in stale if path.suffix == ".part"]
+        if upload_ids:
+            for upload in db.query(models.StemUpload).filter(
+                models.StemUpload.id.in_(upload_ids), models.StemUpload.status == UPLOAD_OPEN
+            ):
+                upload.status = UPLOAD_FAILED
+                upload.error = "Expired before it was finalized"
+            db.commit()
+
+        for path in stale:
+            self._hashers.pop(path.stem, None)
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        return len(stale)